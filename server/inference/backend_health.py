@@ -0,0 +1,211 @@
+"""
+Backend Health Probing and Circuit Breaking for the Ollama Gateway
+
+Each Ollama backend gets a `CircuitBreaker` and a `HealthProber`:
+
+- CLOSED:    traffic flows; consecutive failures (probes or requests) are counted
+- OPEN:      the backend is considered down and requests fail fast with 503
+             instead of waiting on connect timeouts
+- HALF_OPEN: after `reset_timeout` a single trial request (or the next probe)
+             is let through; success closes the breaker, failure re-opens it
+
+The prober polls a cheap endpoint in the background, so a restarted Ollama is
+picked up within one probe interval and a dead one is detected without any
+user request having to fail first.
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Args:
+        name: Label used in logs (usually the backend URL)
+        failure_threshold: Consecutive failures that open the breaker
+        reset_timeout: Seconds to stay open before allowing a trial request
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._state = BreakerState.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> BreakerState:
+        if self._state == BreakerState.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = BreakerState.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the breaker will let a trial request through"""
+        if self.state != BreakerState.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent to the backend right now"""
+        state = self.state
+        if state == BreakerState.CLOSED:
+            return True
+        if state == BreakerState.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self._state != BreakerState.CLOSED:
+            logger.info(f"✅ Circuit closed for {self.name}")
+        self._state = BreakerState.CLOSED
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == BreakerState.HALF_OPEN or (
+            self._state == BreakerState.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.trip()
+
+    def trip(self):
+        """Open the breaker immediately"""
+        if self._state != BreakerState.OPEN:
+            self.times_opened += 1
+            logger.warning(f"⚠️  Circuit opened for {self.name} (consecutive failures: {self.consecutive_failures})")
+        self._state = BreakerState.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after_s": round(self.retry_after, 3),
+        }
+
+
+class HealthProber:
+    """
+    Periodically probes a backend and feeds the result into its breaker.
+
+    Args:
+        client: `httpx.AsyncClient` with the backend as `base_url`
+        breaker: Breaker to update
+        interval: Seconds between probes
+        timeout: Per-probe timeout in seconds
+        path: Cheap endpoint to probe
+        on_success: Optional callback receiving each healthy probe response
+    """
+
+    def __init__(
+        self,
+        client,
+        breaker: CircuitBreaker,
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        path: str = "/api/tags",
+        on_success: Optional[Callable[[Any], None]] = None
+    ):
+        self.client = client
+        self.breaker = breaker
+        self.interval = interval
+        self.timeout = timeout
+        self.path = path
+        self.on_success = on_success
+
+        self._task: Optional[asyncio.Task] = None
+        self._latencies: Deque[float] = deque(maxlen=512)
+        self.probes = 0
+        self.failures = 0
+        self.last_latency_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+
+    async def start(self):
+        """Run one probe immediately, then keep probing in the background"""
+        if self._task is None:
+            await self.probe()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe()
+
+    async def probe(self) -> bool:
+        """Probe once and update the breaker; returns True if healthy"""
+        self.probes += 1
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(self.path, timeout=self.timeout)
+            healthy = response.status_code == 200
+            error = None if healthy else f"HTTP {response.status_code}"
+            if healthy and self.on_success is not None:
+                self.on_success(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            healthy, error = False, f"{type(e).__name__}: {e}"
+
+        self.last_latency_ms = (time.perf_counter() - start) * 1000
+        self._latencies.append(self.last_latency_ms)
+        if healthy:
+            self.last_error = None
+            self.last_success_at = time.time()
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.last_error = error
+            self.breaker.record_failure()
+        return healthy
+
+    def _percentile(self, pct: float) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "probes": self.probes,
+            "failures": self.failures,
+            "last_latency_ms": round(self.last_latency_ms, 3) if self.last_latency_ms is not None else None,
+            "latency_p50_ms": round(self._percentile(50), 3),
+            "latency_p99_ms": round(self._percentile(99), 3),
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+        }
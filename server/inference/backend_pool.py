@@ -0,0 +1,225 @@
+"""
+Ollama Backend Pool for the NavaFlow Gateway
+
+Spreads generation across several Ollama nodes (or several local instances
+pinned to different core sets), configured as a host list:
+
+    OLLAMA_HOSTS=http://10.0.0.5:11434,http://10.0.0.6:11434
+
+Routing picks, among backends whose circuit is not open:
+
+1. Backends that already have the requested model loaded (avoids a cold
+   model load, which costs seconds), as long as they are at most
+   `affinity_slack` requests busier than the least loaded backend
+2. Otherwise the backend with the fewest outstanding requests
+
+A preferred backend (the one holding a conversation's KV cache) gets the
+same slack on top.
+
+Loaded models are learned from `/api/ps`, which doubles as the health probe,
+and from the requests routed to each backend.
+"""
+
+import itertools
+import subprocess
+import time
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from backend_health import BreakerState, CircuitBreaker, HealthProber
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaBackend:
+    """
+    One Ollama node: pooled HTTP client, circuit breaker, health prober and
+    routing state.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        max_connections: int = 64,
+        keepalive_expiry: float = 60.0,
+        request_timeout: float = 300.0,
+        health_interval: float = 5.0,
+        health_timeout: float = 2.0,
+        breaker_failures: int = 3,
+        breaker_reset: float = 10.0
+    ):
+        self.host = host.rstrip("/")
+        self.client = None
+        if httpx is not None:
+            self.client = httpx.AsyncClient(
+                base_url=self.host,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=keepalive_expiry
+                ),
+                # No pool timeout: excess requests queue for a connection
+                timeout=httpx.Timeout(request_timeout, connect=5.0, pool=None)
+            )
+        self.breaker = CircuitBreaker(self.host, failure_threshold=breaker_failures, reset_timeout=breaker_reset)
+        self.prober = None
+        if self.client is not None:
+            self.prober = HealthProber(
+                self.client,
+                self.breaker,
+                interval=health_interval,
+                timeout=health_timeout,
+                path="/api/ps",
+                on_success=self._update_loaded_models
+            )
+
+        self.outstanding = 0
+        self.requests = 0
+        self.loaded_models: Set[str] = set()
+        self.loaded_models_at: Optional[float] = None
+
+        if not self._check_available():
+            self.breaker.trip()
+
+    def _check_available(self) -> bool:
+        """One-off blocking check used before the event loop is running"""
+        try:
+            response = httpx.get(f"{self.host}/api/tags", timeout=2)
+            return response.status_code == 200
+        except:
+            # Try command line check
+            try:
+                result = subprocess.run(
+                    ["ollama", "list"],
+                    capture_output=True,
+                    timeout=2
+                )
+                return result.returncode == 0
+            except:
+                return False
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.state != BreakerState.OPEN
+
+    def _update_loaded_models(self, response):
+        try:
+            models = response.json().get("models", [])
+        except ValueError:
+            return
+        self.loaded_models = {m.get("name", "").split(":")[0] for m in models if m.get("name")}
+        self.loaded_models_at = time.time()
+
+    def has_model(self, model: str) -> bool:
+        return model.split(":")[0] in self.loaded_models
+
+    def acquire(self):
+        """Count a request as outstanding (streams release when the stream ends)"""
+        self.outstanding += 1
+        self.requests += 1
+
+    def release(self):
+        self.outstanding -= 1
+
+    def record_status(self, status_code: int, model: Optional[str] = None):
+        """Feed an upstream response into the breaker (4xx still means the backend is up)"""
+        if status_code >= 500:
+            self.breaker.record_failure()
+            return
+        self.breaker.record_success()
+        if status_code == 200 and model:
+            # Ollama keeps the model resident after serving it
+            self.loaded_models.add(model.split(":")[0])
+
+    async def start(self):
+        if self.prober is not None:
+            await self.prober.start()
+
+    async def aclose(self):
+        if self.prober is not None:
+            await self.prober.stop()
+        if self.client is not None:
+            await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "loaded_models": sorted(self.loaded_models),
+            "breaker": self.breaker.stats(),
+            "probe": self.prober.stats() if self.prober is not None else None,
+        }
+
+
+class BackendPool:
+    """Least-outstanding-requests router over a set of `OllamaBackend`s"""
+
+    def __init__(self, backends: List[OllamaBackend], affinity_slack: int = 8):
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = backends
+        self.affinity_slack = affinity_slack
+        # Rotating tie-breaker so equally loaded backends share traffic
+        self._rotation = itertools.count()
+        self.retries = 0
+        self.rejected = 0
+
+    @property
+    def available(self) -> bool:
+        return any(b.available for b in self.backends)
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the first open circuit lets a trial request through"""
+        return min(b.breaker.retry_after for b in self.backends)
+
+    def pick(
+        self,
+        model: Optional[str] = None,
+        exclude: Set[str] = frozenset(),
+        prefer: Optional[str] = None,
+        loaded_only: bool = False
+    ) -> Optional[OllamaBackend]:
+        """
+        Choose a backend for `model`, or None if every circuit is open.
+
+        Admission goes through the breaker, so at most one trial request is
+        sent to a half-open backend. With `loaded_only`, backends that do not
+        already hold `model` are not considered.
+        """
+        offset = next(self._rotation)
+        n = len(self.backends)
+        candidates = [
+            self.backends[(offset + i) % n] for i in range(n)
+            if self.backends[(offset + i) % n].host not in exclude
+        ]
+        candidates = [b for b in candidates if b.available and (not loaded_only or b.has_model(model))]
+        # Stable sort keeps the rotation order among equally scored backends
+        candidates.sort(key=lambda b: b.outstanding
+                        - (self.affinity_slack if model and b.has_model(model) else 0)
+                        - (self.affinity_slack if b.host == prefer else 0))
+        for backend in candidates:
+            if backend.breaker.allow_request():
+                return backend
+        return None
+
+    async def start(self):
+        for backend in self.backends:
+            await backend.start()
+
+    async def aclose(self):
+        for backend in self.backends:
+            await backend.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "backends": [b.stats() for b in self.backends],
+        }
@@ -0,0 +1,268 @@
+"""
+Benchmark: Gateway Overhead over Ollama
+
+Runs the same workload at the same concurrency twice, once straight against
+an Ollama server and once through main_ollama.py, and reports what the
+gateway adds to latency, time to first token and throughput. Each request
+gets a unique prompt, so gateway caches do not flatter the result.
+
+Fully offline against the fake server (both processes are started on free
+ports and stopped afterwards):
+
+    python benchmark_gateway.py --spawn --requests 2000 --concurrency 64
+    python benchmark_gateway.py --spawn --workload stream --token-rate 200 --max-tokens 64
+
+Or against already running servers:
+
+    python benchmark_gateway.py --ollama http://127.0.0.1:11434 --gateway http://127.0.0.1:8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import httpx
+
+HERE = Path(__file__).resolve().parent
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _summarize(name: str, latencies_ms: List[float], ttfts_ms: List[float], tokens: int, errors: int, wall_s: float) -> Dict[str, Any]:
+    latencies_ms = sorted(latencies_ms)
+    ttfts_ms = sorted(ttfts_ms)
+    return {
+        "target": name,
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies_ms, 50), 3),
+        "p90_ms": round(_percentile(latencies_ms, 90), 3),
+        "p99_ms": round(_percentile(latencies_ms, 99), 3),
+        "ttft_p50_ms": round(_percentile(ttfts_ms, 50), 3) if ttfts_ms else None,
+        "ttft_p99_ms": round(_percentile(ttfts_ms, 99), 3) if ttfts_ms else None,
+        "throughput_rps": round(len(latencies_ms) / wall_s, 1) if wall_s else 0.0,
+        "tokens_per_s": round(tokens / wall_s, 1) if wall_s else 0.0,
+    }
+
+
+# --- REQUESTS ---
+
+def _direct_request(workload: str, model: str, prompt: str, max_tokens: int):
+    if workload == "embed":
+        return "/api/embed", {"model": model, "input": [prompt]}
+    return "/api/generate", {
+        "model": model, "prompt": prompt, "stream": workload == "stream",
+        "options": {"num_predict": max_tokens, "temperature": 0},
+    }
+
+
+def _gateway_request(workload: str, model: str, prompt: str, max_tokens: int):
+    if workload == "embed":
+        return "/v1/embeddings", {"model_id": model, "input": [prompt]}
+    return "/v1/generate", {
+        "model_id": model, "prompt": prompt, "stream": workload == "stream",
+        "max_tokens": max_tokens, "temperature": 0,
+    }
+
+
+async def _one(client: httpx.AsyncClient, path: str, body: Dict[str, Any], stream: bool):
+    """Returns (latency_ms, ttft_ms or None, tokens)"""
+    start = time.perf_counter()
+    if not stream:
+        response = await client.post(path, json=body)
+        response.raise_for_status()
+        tokens = response.json().get("eval_count", 0) if path == "/api/generate" else 0
+        return (time.perf_counter() - start) * 1000, None, tokens
+
+    ttft = None
+    tokens = 0
+    async with client.stream("POST", path, json=body) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if ttft is None:
+                ttft = (time.perf_counter() - start) * 1000
+            if not json.loads(line).get("done"):
+                tokens += 1
+    return (time.perf_counter() - start) * 1000, ttft, tokens
+
+
+async def run_load(name: str, base_url: str, workload: str, model: str, max_tokens: int,
+                   n: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Drive `n` requests with `concurrency` in flight against one target"""
+    direct = name == "ollama"
+    make = _direct_request if direct else _gateway_request
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    tokens = 0
+    errors = 0
+    run_id = os.urandom(4).hex()
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        for i in range(warmup):
+            path, body = make(workload, model, f"warmup {run_id} {i}", max_tokens)
+            await _one(client, path, body, workload == "stream")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(n):
+            queue.put_nowait(i)
+
+        async def worker():
+            nonlocal tokens, errors
+            while not queue.empty():
+                i = queue.get_nowait()
+                path, body = make(workload, model, f"incident {run_id} {i}: disk pressure on node-{i % 97}", max_tokens)
+                try:
+                    latency, ttft, count = await _one(client, path, body, workload == "stream")
+                except (httpx.HTTPError, ValueError):
+                    errors += 1
+                    continue
+                latencies.append(latency)
+                if ttft is not None:
+                    ttfts.append(ttft)
+                tokens += count or (max_tokens if workload == "generate" else 0)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - wall_start
+
+    return _summarize(name, latencies, ttfts, tokens, errors, wall)
+
+
+def overhead(direct: Dict[str, Any], gateway: Dict[str, Any]) -> Dict[str, Any]:
+    """Gateway minus direct, per percentile"""
+    result = {}
+    for key in ("p50_ms", "p90_ms", "p99_ms", "ttft_p50_ms", "ttft_p99_ms"):
+        if direct.get(key) is not None and gateway.get(key) is not None:
+            result[key] = round(gateway[key] - direct[key], 3)
+    if direct["throughput_rps"]:
+        result["throughput_ratio"] = round(gateway["throughput_rps"] / direct["throughput_rps"], 3)
+    return result
+
+
+# --- SPAWNED SERVERS ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+@contextmanager
+def spawned_servers(args) -> Iterator[Dict[str, str]]:
+    """Start the fake Ollama and the gateway in front of it"""
+    ollama_port, gateway_port = _free_port(), _free_port()
+    ollama_url = f"http://127.0.0.1:{ollama_port}"
+    gateway_url = f"http://127.0.0.1:{gateway_port}"
+    processes: List[subprocess.Popen] = []
+    log = None if args.verbose else subprocess.DEVNULL
+    try:
+        with tempfile.TemporaryDirectory() as model_dir:
+            fake = subprocess.Popen([
+                sys.executable, str(HERE / "fake_ollama.py"), "--port", str(ollama_port),
+                "--ttft", str(args.ttft), "--token-rate", str(args.token_rate),
+                "--error-rate", str(args.error_rate), "--embed-latency", str(args.embed_latency),
+            ], stdout=log, stderr=log)
+            processes.append(fake)
+            _wait_ready(f"{ollama_url}/api/tags", fake)
+
+            env = {**os.environ, "OLLAMA_HOST": ollama_url, "PORT": str(gateway_port), "HOST": "127.0.0.1",
+                   "MODEL_DIR": model_dir, "OLLAMA_MAX_CONNECTIONS": str(max(64, args.concurrency))}
+            gateway = subprocess.Popen([sys.executable, str(HERE / "main_ollama.py")],
+                                       cwd=str(HERE), env=env, stdout=log, stderr=log)
+            processes.append(gateway)
+            _wait_ready(f"{gateway_url}/", gateway)
+            yield {"ollama": ollama_url, "gateway": gateway_url}
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the latency and throughput the gateway adds over Ollama")
+    parser.add_argument("--workload", choices=["generate", "stream", "embed"], default="generate")
+    parser.add_argument("--model", default=None, help="Model name (default: llama3, or nomic-embed-text for embed)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-tokens", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--ollama", default="http://127.0.0.1:11434", help="Ollama (or fake) URL")
+    parser.add_argument("--gateway", default="http://127.0.0.1:8000", help="main_ollama.py URL")
+    parser.add_argument("--spawn", action="store_true", help="Start fake_ollama.py and the gateway on free ports")
+    parser.add_argument("--ttft", type=float, default=0.0, help="Fake server: seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="Fake server: tokens/s (0 = no delay)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake server: fraction of failing requests")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Fake server: seconds per embed call")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show spawned server logs")
+    args = parser.parse_args()
+    model = args.model or ("nomic-embed-text" if args.workload == "embed" else "llama3")
+
+    def run(urls: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [
+            asyncio.run(run_load(name, urls[name], args.workload, model, args.max_tokens,
+                                 args.requests, args.concurrency, args.warmup))
+            for name in ("ollama", "gateway")
+        ]
+
+    if args.spawn:
+        with spawned_servers(args) as urls:
+            direct, gateway = run(urls)
+    else:
+        direct, gateway = run({"ollama": args.ollama, "gateway": args.gateway})
+    added = overhead(direct, gateway)
+
+    if args.json:
+        print(json.dumps({"workload": args.workload, "concurrency": args.concurrency,
+                          "direct": direct, "gateway": gateway, "overhead": added}, indent=2))
+        return
+
+    print("=" * 72)
+    print(f"NavaFlow Gateway Benchmark ({args.workload}, {args.requests} requests, concurrency {args.concurrency})")
+    print("=" * 72)
+    for r in (direct, gateway):
+        ttft = f"  ttft p50 {r['ttft_p50_ms']:>8.2f} ms" if r["ttft_p50_ms"] is not None else ""
+        print(f"{r['target']:<8} p50 {r['p50_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms{ttft}  "
+              f"{r['throughput_rps']:>8.1f} req/s  errors {r['errors']}")
+    print("-" * 72)
+    ttft = f"  ttft p50 {added['ttft_p50_ms']:+.2f} ms" if "ttft_p50_ms" in added else ""
+    print(f"added    p50 {added['p50_ms']:+8.2f} ms  p99 {added['p99_ms']:+8.2f} ms{ttft}  "
+          f"throughput x{added.get('throughput_ratio', 0):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: Binary UDS protocol vs HTTP/JSON
+
+Drives the same /predict/vision workload through both transports of a
+running main.py and reports latency percentiles and throughput.
+
+    NAVAFLOW_UDS_PATH=/tmp/navaflow.sock python main.py
+    python benchmark_uds.py --image frame.jpg --requests 500 --depth 16
+"""
+
+import argparse
+import http.client
+import io
+import json
+import time
+import uuid
+from typing import Dict, List
+
+from binary_protocol import BinaryInferenceClient
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _summarize(name: str, latencies_ms: List[float], wall_s: float) -> Dict[str, float]:
+    latencies_ms = sorted(latencies_ms)
+    return {
+        "transport": name,
+        "requests": len(latencies_ms),
+        "p50_ms": round(_percentile(latencies_ms, 50), 3),
+        "p99_ms": round(_percentile(latencies_ms, 99), 3),
+        "max_ms": round(latencies_ms[-1], 3) if latencies_ms else 0.0,
+        "throughput_rps": round(len(latencies_ms) / wall_s, 1) if wall_s else 0.0,
+    }
+
+
+def _multipart(image_bytes: bytes, text_query: str):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"text_query\"\r\n\r\n{text_query}\r\n".encode())
+    body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"frame\"\r\n"
+               f"Content-Type: application/octet-stream\r\n\r\n".encode())
+    body.write(image_bytes)
+    body.write(f"\r\n--{boundary}--\r\n".encode())
+    return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def bench_http(host: str, port: int, image_bytes: bytes, text_query: str, n: int) -> Dict[str, float]:
+    """Sequential keep-alive HTTP requests (the current Node -> Python path)"""
+    body, content_type = _multipart(image_bytes, text_query)
+    conn = http.client.HTTPConnection(host, port)
+    latencies = []
+    wall_start = time.perf_counter()
+    for _ in range(n):
+        start = time.perf_counter()
+        conn.request("POST", "/predict/vision", body=body, headers={"Content-Type": content_type})
+        response = conn.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {payload[:200]!r}")
+        json.loads(payload)
+        latencies.append((time.perf_counter() - start) * 1000)
+    wall = time.perf_counter() - wall_start
+    conn.close()
+    return _summarize("http", latencies, wall)
+
+
+def bench_uds(path: str, image_bytes: bytes, text_query: str, n: int) -> Dict[str, float]:
+    """Sequential binary protocol round trips"""
+    latencies = []
+    with BinaryInferenceClient(path) as client:
+        wall_start = time.perf_counter()
+        for _ in range(n):
+            start = time.perf_counter()
+            client.predict_vision(image_bytes, text_query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        wall = time.perf_counter() - wall_start
+    return _summarize("uds", latencies, wall)
+
+
+def bench_uds_pipelined(path: str, image_bytes: bytes, text_query: str, n: int, depth: int) -> Dict[str, float]:
+    """Pipelined binary protocol; latency is the amortized per-request cost"""
+    with BinaryInferenceClient(path) as client:
+        start = time.perf_counter()
+        client.predict_vision_many([(image_bytes, text_query)] * n, depth=depth)
+        wall = time.perf_counter() - start
+    return _summarize(f"uds-pipelined(depth={depth})", [wall * 1000 / n] * n, wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the binary UDS protocol against HTTP/JSON")
+    parser.add_argument("--image", required=True, help="Path to a JPEG/PNG test image")
+    parser.add_argument("--text-query", default="What is in this image?")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=16, help="Pipelining depth for the UDS run")
+    parser.add_argument("--http-host", default="127.0.0.1")
+    parser.add_argument("--http-port", type=int, default=8000)
+    parser.add_argument("--uds-path", default="/tmp/navaflow.sock")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+
+    results = [
+        bench_http(args.http_host, args.http_port, image_bytes, args.text_query, args.requests),
+        bench_uds(args.uds_path, image_bytes, args.text_query, args.requests),
+        bench_uds_pipelined(args.uds_path, image_bytes, args.text_query, args.requests, args.depth),
+    ]
+
+    print("=" * 60)
+    print("NavaFlow Transport Benchmark")
+    print("=" * 60)
+    for r in results:
+        print(f"{r['transport']:<26} p50 {r['p50_ms']:>9.3f} ms  p99 {r['p99_ms']:>9.3f} ms  "
+              f"{r['throughput_rps']:>9.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
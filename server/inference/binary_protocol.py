@@ -0,0 +1,322 @@
+"""
+NavaFlow Binary Inference Protocol (Unix Domain Socket)
+
+Length-prefixed binary protocol for co-located callers of the VL-JEPA
+inference server. Skips TCP, HTTP parsing and JSON encoding entirely:
+images go in as raw bytes and embeddings come back as float32 buffers.
+
+Frame layout (header in network byte order):
+
+    +-----------+--------------+---------+-------------+-------------------+
+    | length u32 | request_id u32 | op u8 | status u8 | payload (length B) |
+    +-----------+--------------+---------+-------------+-------------------+
+
+Payloads (little-endian, so float32 arrays map directly onto a
+Float32Array / numpy buffer):
+
+    OP_VISION request:   text_len u16 | text (utf-8) | image bytes
+    OP_VISION response:  world_state_prob f32 | action_id u8 | n_probs u16 |
+                         action_probs f32[n_probs] | embedding f32[...]
+    OP_PING:             empty in both directions
+    STATUS_ERROR:        utf-8 error message
+
+Requests may be pipelined: a client can write any number of frames before
+reading. Each connection processes frames concurrently and responses carry
+the originating request_id, so they may arrive out of order.
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- PROTOCOL CONSTANTS ---
+
+HEADER = struct.Struct("!IIBB")
+HEADER_SIZE = HEADER.size
+
+OP_PING = 0
+OP_VISION = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MAX_FRAME_BYTES = int(os.getenv("NAVAFLOW_UDS_MAX_FRAME_BYTES", 32 * 1024 * 1024))
+
+_TEXT_LEN = struct.Struct("<H")
+_VISION_RESULT = struct.Struct("<fBH")
+
+
+class ProtocolError(Exception):
+    """Raised on malformed frames or error responses"""
+
+
+@dataclass
+class VisionResult:
+    """Decoded OP_VISION response"""
+    embedding: np.ndarray
+    world_state_prob: float
+    action_id: int
+    action_probs: np.ndarray
+
+
+# --- ENCODING ---
+
+def encode_frame(request_id: int, op: int, payload: bytes = b"", status: int = STATUS_OK) -> bytes:
+    """Prefix a payload with the frame header"""
+    return HEADER.pack(len(payload), request_id, op, status) + payload
+
+
+def encode_vision_request(image_bytes: bytes, text_query: str) -> bytes:
+    """Build an OP_VISION request payload"""
+    text = text_query.encode("utf-8")
+    return _TEXT_LEN.pack(len(text)) + text + image_bytes
+
+
+def decode_vision_request(payload: bytes) -> Tuple[bytes, str]:
+    """Split an OP_VISION request payload into (image bytes, text query)"""
+    if len(payload) < _TEXT_LEN.size:
+        raise ProtocolError("Truncated vision request")
+    (text_len,) = _TEXT_LEN.unpack_from(payload)
+    text_end = _TEXT_LEN.size + text_len
+    if len(payload) < text_end:
+        raise ProtocolError("Truncated text query")
+    text_query = payload[_TEXT_LEN.size:text_end].decode("utf-8")
+    return payload[text_end:], text_query
+
+
+def encode_vision_response(result: Dict[str, Any]) -> bytes:
+    """Build an OP_VISION response payload from an inference result"""
+    probs = np.asarray(result["action_probs"], dtype="<f4")
+    embedding = np.asarray(result["embedding"], dtype="<f4")
+    return (
+        _VISION_RESULT.pack(float(result["world_state_prob"]), int(result["action_id"]), probs.size)
+        + probs.tobytes()
+        + embedding.tobytes()
+    )
+
+
+def decode_vision_response(payload: bytes) -> VisionResult:
+    """Parse an OP_VISION response payload"""
+    if len(payload) < _VISION_RESULT.size:
+        raise ProtocolError("Truncated vision response")
+    world_state_prob, action_id, n_probs = _VISION_RESULT.unpack_from(payload)
+    probs_end = _VISION_RESULT.size + 4 * n_probs
+    if len(payload) < probs_end or (len(payload) - probs_end) % 4:
+        raise ProtocolError("Truncated vision response")
+    return VisionResult(
+        embedding=np.frombuffer(payload, dtype="<f4", offset=probs_end),
+        world_state_prob=world_state_prob,
+        action_id=action_id,
+        action_probs=np.frombuffer(payload, dtype="<f4", count=n_probs, offset=_VISION_RESULT.size),
+    )
+
+
+# --- SERVER ---
+
+class BinaryInferenceServer:
+    """
+    Serves the binary protocol on a Unix domain socket.
+
+    `vision_handler(image_bytes, text_query)` returns a dict with `embedding`,
+    `world_state_prob`, `action_id` and `action_probs`. It may be a coroutine
+    function (e.g. one that submits to the batch scheduler); a plain blocking
+    callable runs in the default executor so the event loop shared with
+    FastAPI is never blocked.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        vision_handler: Callable[[bytes, str], Any],
+        max_inflight_per_connection: int = 64,
+        max_frame_bytes: int = MAX_FRAME_BYTES
+    ):
+        self.path = path
+        self.vision_handler = vision_handler
+        self.max_inflight_per_connection = max_inflight_per_connection
+        self.max_frame_bytes = max_frame_bytes
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        """Bind the socket and start accepting connections"""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.path)
+        os.chmod(self.path, 0o660)
+        logger.info(f"✅ Binary inference protocol listening on {self.path}")
+
+    async def stop(self):
+        """Stop accepting connections and remove the socket file"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        inflight = asyncio.Semaphore(self.max_inflight_per_connection)
+        tasks = set()
+
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER_SIZE)
+                except asyncio.IncompleteReadError:
+                    break
+                length, request_id, op, _ = HEADER.unpack(header)
+                if length > self.max_frame_bytes:
+                    await self._send(writer, write_lock, request_id, op, b"Frame too large", STATUS_ERROR)
+                    break
+                payload = await reader.readexactly(length)
+
+                # Bound pipelining depth: stop reading until a slot frees up
+                await inflight.acquire()
+                task = asyncio.create_task(self._dispatch(writer, write_lock, request_id, op, payload))
+                tasks.add(task)
+                task.add_done_callback(lambda t: (tasks.discard(t), inflight.release()))
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _dispatch(self, writer, write_lock, request_id: int, op: int, payload: bytes):
+        try:
+            if op == OP_PING:
+                response = b""
+            elif op == OP_VISION:
+                image_bytes, text_query = decode_vision_request(payload)
+                if asyncio.iscoroutinefunction(self.vision_handler):
+                    result = await self.vision_handler(image_bytes, text_query)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(None, self.vision_handler, image_bytes, text_query)
+                response = encode_vision_response(result)
+            else:
+                raise ProtocolError(f"Unknown op {op}")
+            await self._send(writer, write_lock, request_id, op, response)
+        except Exception as e:
+            logger.error(f"Binary protocol request {request_id} failed: {e}")
+            await self._send(writer, write_lock, request_id, op, str(e).encode("utf-8"), STATUS_ERROR)
+
+    @staticmethod
+    async def _send(writer, write_lock, request_id: int, op: int, payload: bytes, status: int = STATUS_OK):
+        async with write_lock:
+            if writer.is_closing():
+                return
+            writer.write(encode_frame(request_id, op, payload, status))
+            try:
+                await writer.drain()
+            except ConnectionResetError:
+                pass
+
+
+# --- REFERENCE CLIENT ---
+
+class BinaryInferenceClient:
+    """
+    Blocking reference client for the binary protocol.
+
+    Usage:
+        with BinaryInferenceClient("/tmp/navaflow.sock") as client:
+            result = client.predict_vision(open("frame.jpg", "rb").read(), "Is the light on?")
+            results = client.predict_vision_many([(img, "Is the light on?")] * 100)
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self._next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def ping(self) -> None:
+        """Round-trip an empty frame"""
+        request_id = self._send(OP_PING, b"")
+        self._recv_for(request_id)
+
+    def predict_vision(self, image_bytes: bytes, text_query: str) -> VisionResult:
+        """Single vision inference round trip"""
+        request_id = self._send(OP_VISION, encode_vision_request(image_bytes, text_query))
+        return decode_vision_response(self._recv_for(request_id))
+
+    def predict_vision_many(
+        self,
+        items: Sequence[Tuple[bytes, str]],
+        depth: int = 32
+    ) -> List[VisionResult]:
+        """
+        Pipelined vision inference.
+
+        Keeps up to `depth` requests in flight on the connection and returns
+        results in input order.
+        """
+        results: List[Optional[VisionResult]] = [None] * len(items)
+        pending: Dict[int, int] = {}
+        next_item = 0
+
+        while next_item < len(items) or pending:
+            while next_item < len(items) and len(pending) < depth:
+                image_bytes, text_query = items[next_item]
+                request_id = self._send(OP_VISION, encode_vision_request(image_bytes, text_query))
+                pending[request_id] = next_item
+                next_item += 1
+
+            request_id, _, status, payload = self._recv_frame()
+            index = pending.pop(request_id, None)
+            if index is None:
+                raise ProtocolError(f"Unexpected response id {request_id}")
+            if status != STATUS_OK:
+                raise ProtocolError(payload.decode("utf-8", errors="replace"))
+            results[index] = decode_vision_response(payload)
+
+        return results
+
+    def _send(self, op: int, payload: bytes) -> int:
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        self.sock.sendall(encode_frame(request_id, op, payload))
+        return request_id
+
+    def _recv_for(self, request_id: int) -> bytes:
+        received_id, _, status, payload = self._recv_frame()
+        if received_id != request_id:
+            raise ProtocolError(f"Expected response {request_id}, got {received_id}")
+        if status != STATUS_OK:
+            raise ProtocolError(payload.decode("utf-8", errors="replace"))
+        return payload
+
+    def _recv_frame(self) -> Tuple[int, int, int, bytes]:
+        length, request_id, op, status = HEADER.unpack(self._recv_exact(HEADER_SIZE))
+        return request_id, op, status, self._recv_exact(length)
+
+    def _recv_exact(self, n: int) -> bytes:
+        buf = bytearray(n)
+        view = memoryview(buf)
+        received = 0
+        while received < n:
+            count = self.sock.recv_into(view[received:], n - received)
+            if count == 0:
+                raise ProtocolError("Connection closed by server")
+            received += count
+        return bytes(buf)
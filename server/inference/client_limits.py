@@ -0,0 +1,427 @@
+"""
+Per-Client Rate Limits and Fair Queuing for the Ollama Gateway
+
+Clients are identified by their X-API-Key. Each client has two token
+buckets, refilled continuously:
+
+- requests per minute
+- estimated tokens per minute (prompt characters / 4 + max_tokens)
+
+A request that does not fit its client's buckets is rejected with 429 and a
+Retry-After of when it would fit, plus the position it would take in the
+queue.
+
+Admitted generations then pass a weighted fair queue in front of the backend
+pool. At most `concurrency` generations run at once; when every slot is busy
+the next one goes to the queued request with the smallest start tag
+(start-time fair queuing). A client's tags advance by cost / weight, so a
+client flooding the gateway only lengthens its own queue, and a client with
+weight 4 gets four times the token share of a weight-1 client while both are
+backlogged. Free slots are never held back, so throughput is unchanged.
+
+    LIMITS_FILE.json
+    {
+        "clients": {
+            "<api key>": {"name": "oncall", "weight": 4, "requests_per_minute": 600,
+                          "tokens_per_minute": 400000, "max_queued": 64}
+        }
+    }
+"""
+
+import asyncio
+import hashlib
+import heapq
+import json
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS = "anonymous"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 characters per token for English text and code"""
+    return (len(text) + 3) // 4
+
+
+class ClientPolicy:
+    """Budget and queue share of one client (or of every unconfigured key)"""
+
+    __slots__ = ("name", "weight", "requests_per_minute", "tokens_per_minute", "max_queued")
+
+    def __init__(
+        self,
+        name: str,
+        weight: float = 1.0,
+        requests_per_minute: float = 120.0,
+        tokens_per_minute: float = 100000.0,
+        max_queued: int = 32
+    ):
+        if weight <= 0:
+            raise ValueError(f"Client '{name}': weight must be positive")
+        self.name = name
+        self.weight = weight
+        # 0 disables a budget
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queued = max_queued
+
+
+def load_client_policies(path: Path, default: ClientPolicy) -> Dict[str, ClientPolicy]:
+    """API key -> policy from a JSON file; omitted fields take the default's values"""
+    with open(path, "r") as f:
+        clients = json.load(f).get("clients", {})
+    policies = {}
+    for api_key, spec in clients.items():
+        policies[api_key] = ClientPolicy(
+            name=spec.get("name", hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]),
+            weight=float(spec.get("weight", default.weight)),
+            requests_per_minute=float(spec.get("requests_per_minute", default.requests_per_minute)),
+            tokens_per_minute=float(spec.get("tokens_per_minute", default.tokens_per_minute)),
+            max_queued=int(spec.get("max_queued", default.max_queued))
+        )
+    return policies
+
+
+class RateLimited(Exception):
+    """Over budget or too many queued requests; maps to HTTP 429"""
+
+    def __init__(self, message: str, label: str, reason: str, retry_after_s: float, queue_position: int):
+        super().__init__(message)
+        self.label = label
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+        self.queue_position = queue_position
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` per second up to one minute's budget"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, per_minute: float, now: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken; 0 if it can be taken now"""
+        self._refill(now)
+        # A request larger than the whole budget goes through on a full bucket
+        # (leaving it in debt) instead of never fitting
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= amount
+
+    @property
+    def remaining(self) -> int:
+        return max(0, int(self.tokens))
+
+
+class ClientTicket:
+    """One admitted request; carries its cost and queue feedback through the gateway"""
+
+    __slots__ = ("client", "label", "cost", "weight", "remaining_requests", "remaining_tokens",
+                 "queue_position", "waited_s", "admitted_at")
+
+    def __init__(self, client: str, label: str, policy: ClientPolicy, cost: int):
+        self.client = client
+        # Metrics label: configured client name, otherwise "default" or "anonymous"
+        self.label = label
+        self.cost = cost
+        self.weight = policy.weight
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.queue_position = 0
+        self.waited_s = 0.0
+        self.admitted_at = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.remaining_requests is not None:
+            headers["X-RateLimit-Remaining-Requests"] = str(self.remaining_requests)
+        if self.remaining_tokens is not None:
+            headers["X-RateLimit-Remaining-Tokens"] = str(self.remaining_tokens)
+        if self.queue_position:
+            headers["X-Queue-Position"] = str(self.queue_position)
+            headers["X-Queue-Wait-Ms"] = str(int(self.waited_s * 1000))
+        return headers
+
+
+# --- FAIR QUEUE ---
+
+class WeightedFairQueue:
+    """
+    Start-time fair queuing over generation slots.
+
+    Usage:
+        waited_s = await queue.acquire(ticket)
+        try:
+            ...
+        finally:
+            queue.release(ticket)
+    """
+
+    def __init__(self, concurrency: int = 8):
+        self.concurrency = max(1, concurrency)
+        self.in_flight = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._heap: List[Tuple[float, int, asyncio.Future, ClientTicket]] = []
+        self._queued: Dict[str, int] = {}
+        self._seq = 0
+        # Smoothed slot hold time, for wait estimates
+        self._service_s = 1.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.max_wait_s = 0.0
+
+    def _tags(self, ticket: ClientTicket) -> Tuple[float, float]:
+        start = max(self._virtual_time, self._last_finish.get(ticket.client, 0.0))
+        return start, start + ticket.cost / ticket.weight
+
+    def queued_for(self, client: str) -> int:
+        return self._queued.get(client, 0)
+
+    def position_for(self, start: float) -> int:
+        """1-based position a request with start tag `start` takes among the queued ones"""
+        return 1 + sum(1 for tag, _, future, _ in self._heap if tag <= start and not future.done())
+
+    def estimated_wait(self, position: int) -> float:
+        return position * self._service_s / self.concurrency
+
+    def projected_position(self, ticket: ClientTicket) -> int:
+        """Where `ticket` would queue if it arrived now (0 = a slot is free)"""
+        if self.in_flight < self.concurrency and not self._heap:
+            return 0
+        return self.position_for(self._tags(ticket)[0])
+
+    async def acquire(self, ticket: ClientTicket) -> float:
+        """Wait for a generation slot; returns the time spent queued in seconds"""
+        start, finish = self._tags(ticket)
+        self._last_finish[ticket.client] = finish
+        self.admitted += 1
+        if self.in_flight < self.concurrency and not self._heap:
+            self._virtual_time = start
+            self.in_flight += 1
+            ticket.admitted_at = time.monotonic()
+            return 0.0
+
+        enqueued_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        ticket.queue_position = self.position_for(start)
+        self._seq += 1
+        heapq.heappush(self._heap, (start, self._seq, future, ticket))
+        self._queued[ticket.client] = self._queued.get(ticket.client, 0) + 1
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up: hand the slot back
+                self.release(ticket)
+            else:
+                future.cancel()
+                self._dequeued(ticket.client)
+            raise
+
+        waited = time.monotonic() - enqueued_at
+        ticket.waited_s = waited
+        self.max_wait_s = max(self.max_wait_s, waited)
+        return waited
+
+    def release(self, ticket: ClientTicket):
+        """Free the slot held by `ticket` and admit the next queued request"""
+        self.in_flight -= 1
+        held = time.monotonic() - ticket.admitted_at
+        self._service_s += 0.1 * (held - self._service_s)
+        self._dispatch()
+
+    def _dequeued(self, client: str):
+        count = self._queued.get(client, 0) - 1
+        if count > 0:
+            self._queued[client] = count
+        else:
+            self._queued.pop(client, None)
+
+    def _dispatch(self):
+        while self.in_flight < self.concurrency and self._heap:
+            start, _, future, ticket = heapq.heappop(self._heap)
+            if future.done():
+                continue  # Cancelled while queued
+            self._dequeued(ticket.client)
+            self._virtual_time = start
+            self.in_flight += 1
+            ticket.admitted_at = time.monotonic()
+            future.set_result(None)
+        if len(self._last_finish) > 4096:
+            # Clients whose tags fell behind virtual time are indistinguishable from new ones
+            self._last_finish = {c: f for c, f in self._last_finish.items() if f > self._virtual_time}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": sum(self._queued.values()),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "max_wait_s": round(self.max_wait_s, 3),
+            "service_s": round(self._service_s, 3),
+        }
+
+
+# --- LIMITER ---
+
+class _ClientState:
+    __slots__ = ("policy", "requests", "tokens", "admitted", "rejected", "estimated_tokens")
+
+    def __init__(self, policy: ClientPolicy, now: float):
+        self.policy = policy
+        self.requests = TokenBucket(policy.requests_per_minute, now) if policy.requests_per_minute > 0 else None
+        self.tokens = TokenBucket(policy.tokens_per_minute, now) if policy.tokens_per_minute > 0 else None
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        self.estimated_tokens = 0
+
+
+class ClientLimiter:
+    """
+    Per-API-key budgets in front of a WeightedFairQueue.
+
+    Configured keys use their own policy; any other key gets the default
+    policy with its own buckets, and requests without a key share the
+    "anonymous" buckets. At most `max_clients` unconfigured keys are tracked
+    (least recently seen are dropped, which refills their buckets).
+
+    Usage:
+        ticket = limiter.admit(api_key, estimated_tokens)   # raises RateLimited
+        waited_s = await limiter.queue.acquire(ticket)
+    """
+
+    def __init__(
+        self,
+        queue: WeightedFairQueue,
+        policies: Optional[Dict[str, ClientPolicy]] = None,
+        default: Optional[ClientPolicy] = None,
+        max_clients: int = 10000
+    ):
+        self.queue = queue
+        self.policies = policies or {}
+        self.default = default or ClientPolicy("default")
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, _ClientState]" = OrderedDict()
+
+    def identify(self, api_key: Optional[str]) -> Tuple[str, ClientPolicy]:
+        """Internal client id (never the raw key) and its policy"""
+        if not api_key:
+            return ANONYMOUS, self.default
+        policy = self.policies.get(api_key)
+        if policy is not None:
+            return f"client:{policy.name}", policy
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16], self.default
+
+    @staticmethod
+    def label(client: str) -> str:
+        if client.startswith("client:"):
+            return client[len("client:"):]
+        return ANONYMOUS if client == ANONYMOUS else "default"
+
+    def _state(self, client: str, policy: ClientPolicy, now: float) -> _ClientState:
+        state = self._clients.get(client)
+        if state is None:
+            state = self._clients[client] = _ClientState(policy, now)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return state
+
+    def admit(self, api_key: Optional[str], tokens: int, queued: bool = True) -> ClientTicket:
+        """
+        Charge one request of `tokens` estimated tokens to the key's budgets.
+
+        `queued=False` is for work that does not pass the fair queue
+        (embeddings); only the budgets are checked.
+        """
+        client, policy = self.identify(api_key)
+        now = time.monotonic()
+        state = self._state(client, policy, now)
+        label = self.label(client)
+        ticket = ClientTicket(client, label, policy, max(1, tokens))
+
+        if queued and policy.max_queued and self.queue.queued_for(client) >= policy.max_queued:
+            position = self.queue.projected_position(ticket)
+            self._reject(state, "queue")
+            raise RateLimited(
+                f"Client '{policy.name}' already has {policy.max_queued} requests queued",
+                label, "queue", self.queue.estimated_wait(position), position
+            )
+
+        waits = {
+            "requests": state.requests.wait_time(1, now) if state.requests is not None else 0.0,
+            "tokens": state.tokens.wait_time(tokens, now) if state.tokens is not None else 0.0,
+        }
+        reason = max(waits, key=waits.get)
+        if waits[reason] > 0:
+            self._reject(state, reason)
+            position = self.queue.projected_position(ticket) if queued else 0
+            budget = policy.requests_per_minute if reason == "requests" else policy.tokens_per_minute
+            raise RateLimited(
+                f"Client '{policy.name}' exceeded {budget:g} {reason} per minute",
+                label, reason, waits[reason], position
+            )
+
+        if state.requests is not None:
+            state.requests.take(1)
+            ticket.remaining_requests = state.requests.remaining
+        if state.tokens is not None:
+            state.tokens.take(tokens)
+            ticket.remaining_tokens = state.tokens.remaining
+        state.admitted += 1
+        state.estimated_tokens += tokens
+        return ticket
+
+    @staticmethod
+    def _reject(state: _ClientState, reason: str):
+        state.rejected[reason] = state.rejected.get(reason, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        clients = {}
+        for client, state in self._clients.items():
+            if client.startswith("key:"):
+                continue  # Reported in aggregate; ids of unconfigured keys are not useful
+            clients[self.label(client)] = {
+                "weight": state.policy.weight,
+                "admitted": state.admitted,
+                "rejected": dict(state.rejected),
+                "estimated_tokens": state.estimated_tokens,
+                "queued": self.queue.queued_for(client),
+                "remaining_requests": state.requests.remaining if state.requests is not None else None,
+                "remaining_tokens": state.tokens.remaining if state.tokens is not None else None,
+            }
+        others = [s for c, s in self._clients.items() if c.startswith("key:")]
+        return {
+            "configured_clients": len(self.policies),
+            "tracked_keys": len(others),
+            "clients": clients,
+            "default": {
+                "admitted": sum(s.admitted for s in others),
+                "rejected": sum(sum(s.rejected.values()) for s in others),
+                "estimated_tokens": sum(s.estimated_tokens for s in others),
+            },
+            "queue": self.queue.stats(),
+        }
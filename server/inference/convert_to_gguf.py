@@ -10,11 +10,26 @@ import subprocess
 import sys
 from pathlib import Path
 import argparse
+import json
 import logging
 
+from gguf_reader import GGUFError, read_gguf_summary
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def inspect_gguf(path: Path) -> bool:
+    """Validate a GGUF file by parsing its header and log a summary"""
+    try:
+        summary = read_gguf_summary(path)
+    except (GGUFError, OSError) as e:
+        logger.error(f"Invalid GGUF file {path}: {e}")
+        return False
+    logger.info(f"🔍 {path.name}: architecture={summary['architecture']} "
+                f"context_length={summary['context_length']} quantization={summary['file_type']} "
+                f"parameters={summary['parameter_count']:,} tensors={summary['tensor_count']}")
+    return True
+
 def check_llama_cpp_available() -> bool:
     """Check if llama.cpp tools are available"""
     try:
@@ -62,7 +77,7 @@ def convert_pth_to_gguf(
             
             result = subprocess.run(cmd, capture_output=True, text=True)
             
-            if result.returncode == 0:
+            if result.returncode == 0 and inspect_gguf(output_path):
                 logger.info(f"✅ Conversion successful using llama-cpp-convert")
                 return True
             else:
@@ -124,7 +139,7 @@ def main():
     parser.add_argument(
         "input",
         type=str,
-        help="Path to input .pth file"
+        help="Path to input .pth file (or .gguf file with --inspect)"
     )
     parser.add_argument(
         "-o", "--output",
@@ -139,6 +154,11 @@ def main():
         choices=["q4_0", "q4_1", "q5_0", "q5_1", "q8_0", "q4_k_m", "q5_k_m"],
         help="Quantization method"
     )
+    parser.add_argument(
+        "--inspect",
+        action="store_true",
+        help="Print the header summary of an existing .gguf file and exit"
+    )
     parser.add_argument(
         "--manual",
         action="store_true",
@@ -148,6 +168,14 @@ def main():
     args = parser.parse_args()
     
     input_path = Path(args.input)
+    
+    if args.inspect:
+        try:
+            print(json.dumps(read_gguf_summary(input_path), indent=2))
+        except (GGUFError, OSError) as e:
+            logger.error(f"Invalid GGUF file {input_path}: {e}")
+            sys.exit(1)
+        return
     if args.output:
         output_path = Path(args.output)
     else:
@@ -0,0 +1,191 @@
+"""
+Content-Addressed Embedding Cache
+
+Embeddings are a pure function of the model build and the input text, so
+they are cached forever under:
+
+    sha256(model digest | text)
+
+Re-indexing a repository then only embeds the chunks that changed.
+
+Two tiers:
+
+- Memory: LRU of float32 vectors bounded by total bytes
+- Disk (optional): SQLite file storing the raw float32 bytes; hits are
+  promoted to memory. Lookups and writes are batched (one query per few
+  hundred keys) and run in a worker thread.
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default limit on bound parameters is 999
+_SQL_CHUNK = 500
+
+
+def make_embedding_key(model_digest: str, text: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(model_digest.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _DiskTier:
+    """SQLite-backed tier; every method is blocking and called via a thread"""
+
+    def __init__(self, path: Path, max_entries: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings(created_at)")
+        self._conn.commit()
+        self._puts = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[i:i + _SQL_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, items: Dict[str, bytes]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in items.items()]
+            )
+            previous, self._puts = self._puts, self._puts + len(items)
+            # Amortized trim to max_entries, oldest first
+            if previous // 4096 != self._puts // 4096:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache with per-model hit accounting.
+
+    Args:
+        max_memory_bytes: Memory tier capacity (LRU over vector bytes)
+        disk_path: SQLite file for the persistent tier (None = memory only)
+        max_disk_entries: Disk tier capacity (oldest entries are trimmed)
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 256 * 1024 * 1024,
+        disk_path: Optional[Path] = None,
+        max_disk_entries: int = 10000000
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_bytes = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk = _DiskTier(disk_path, max_disk_entries) if disk_path else None
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _model_stats(self, model: str) -> Dict[str, int]:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        return stats
+
+    async def get_many(self, keys: List[str], model: str) -> Dict[str, np.ndarray]:
+        """Cached vectors for the keys that are present"""
+        stats = self._model_stats(model)
+        found: Dict[str, np.ndarray] = {}
+        remaining = []
+        for key in keys:
+            vec = self._memory.get(key)
+            if vec is not None:
+                self._memory.move_to_end(key)
+                found[key] = vec
+            else:
+                remaining.append(key)
+        stats["memory_hits"] += len(found)
+
+        if remaining and self._disk is not None:
+            try:
+                blobs = await asyncio.to_thread(self._disk.get_many, remaining)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disk read failed: {e}")
+                blobs = {}
+            for key, blob in blobs.items():
+                vec = np.frombuffer(blob, dtype="<f4")
+                self._remember(key, vec)
+                found[key] = vec
+            stats["disk_hits"] += len(blobs)
+
+        stats["misses"] += len(keys) - len(found)
+        return found
+
+    async def put_many(self, items: Dict[str, np.ndarray], model: str):
+        for key, vec in items.items():
+            self._remember(key, vec)
+        self._model_stats(model)["stores"] += len(items)
+        if self._disk is not None and items:
+            blobs = {key: np.ascontiguousarray(vec, dtype="<f4").tobytes() for key, vec in items.items()}
+            try:
+                await asyncio.to_thread(self._disk.put_many, blobs)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disk write failed: {e}")
+
+    def _remember(self, key: str, vec: np.ndarray):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= previous.nbytes
+        self._memory[key] = vec
+        self.memory_bytes += vec.nbytes
+        while self.memory_bytes > self.max_memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= evicted.nbytes
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        per_model = {}
+        for model, s in self._stats.items():
+            hits = s["memory_hits"] + s["disk_hits"]
+            lookups = hits + s["misses"]
+            per_model[model] = {**s, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self.memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "disk": str(self._disk.path) if self._disk is not None else None,
+            "models": per_model,
+        }
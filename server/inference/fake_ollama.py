@@ -0,0 +1,263 @@
+"""
+Fake Ollama Server for Offline Testing and Benchmarks
+
+Implements the parts of the Ollama HTTP API the gateway uses, with no
+models and no GPU:
+
+    GET  /api/tags, /api/ps, /api/version
+    POST /api/show       architecture and context length
+    POST /api/generate   streaming and non-streaming, keep_alive load/unload,
+                         `context` round trip, Ollama-style timing stats
+    POST /api/embed      deterministic bag-of-words vectors
+
+Timing and faults are configurable so gateway behaviour can be measured in
+isolation:
+
+    python fake_ollama.py --port 11434 --ttft 0.05 --token-rate 100 --error-rate 0.01
+
+`POST /_fake/config` changes any option at runtime (e.g. to inject failures
+mid-benchmark) and `GET /_fake/stats` reports request counts and peak
+concurrency.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# --- CONFIGURATION ---
+
+CONFIG: Dict[str, Any] = {
+    "models": ["llama3", "mistral", "phi3", "nomic-embed-text"],
+    "ttft": 0.05,          # seconds before the first token (prompt evaluation)
+    "token_rate": 100.0,   # generated tokens per second; 0 = no delay
+    "load_time": 0.0,      # seconds to "load" a model that is not resident
+    "error_rate": 0.0,     # fraction of requests answered with 500
+    "drop_rate": 0.0,      # fraction of streams cut off mid-response
+    "embed_dim": 384,
+    "embed_latency": 0.005,
+    "context_length": 8192,
+}
+
+_WORDS = ("the", "service", "restarted", "after", "disk", "pressure", "on", "node", "and",
+          "latency", "recovered", "within", "seconds", "check", "logs", "for", "errors")
+
+app = FastAPI(title="Fake Ollama")
+
+loaded: Dict[str, float] = {}
+stats: Dict[str, Any] = {"generate": 0, "embed": 0, "errors": 0, "drops": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def _base(model: str) -> str:
+    return model.split(":")[0]
+
+
+def _digest(model: str) -> str:
+    return hashlib.sha256(_base(model).encode("utf-8")).hexdigest()
+
+
+def _not_found(model: str) -> JSONResponse:
+    return JSONResponse({"error": f"model '{model}' not found, try pulling it first"}, status_code=404)
+
+
+def _tokens(prompt: str, n: int) -> List[str]:
+    """Deterministic per prompt, like temperature=0"""
+    rng = random.Random(hashlib.md5(prompt.encode("utf-8")).digest())
+    return [rng.choice(_WORDS) + " " for _ in range(n)]
+
+
+async def _load(model: str) -> float:
+    """Simulate loading; returns the load duration in seconds"""
+    if _base(model) in loaded or not CONFIG["load_time"]:
+        loaded[_base(model)] = time.time()
+        return 0.0
+    await asyncio.sleep(CONFIG["load_time"])
+    loaded[_base(model)] = time.time()
+    return CONFIG["load_time"]
+
+
+class _InFlight:
+    def __enter__(self):
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+    def __exit__(self, *exc):
+        stats["in_flight"] -= 1
+
+
+# --- API ---
+
+@app.get("/api/version")
+async def version():
+    return {"version": "0.0.0-fake"}
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [
+        {"name": f"{m}:latest", "model": f"{m}:latest", "digest": _digest(m), "size": 1}
+        for m in CONFIG["models"]
+    ]}
+
+
+@app.get("/api/ps")
+async def ps():
+    return {"models": [{"name": f"{m}:latest", "model": f"{m}:latest", "digest": _digest(m)} for m in loaded]}
+
+
+@app.post("/api/show")
+async def show(request: Request):
+    model = (await request.json()).get("model", "")
+    if _base(model) not in CONFIG["models"]:
+        return _not_found(model)
+    return {
+        "parameters": "",
+        "details": {"family": "llama", "format": "gguf"},
+        "model_info": {"general.architecture": "llama", "llama.context_length": CONFIG["context_length"]},
+    }
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    model = body.get("model", "")
+    if _base(model) not in CONFIG["models"]:
+        return _not_found(model)
+
+    keep_alive = body.get("keep_alive")
+    if keep_alive in (0, "0", "0s"):
+        loaded.pop(_base(model), None)
+        return {"model": model, "response": "", "done": True, "done_reason": "unload"}
+
+    started = time.perf_counter()
+    load_s = await _load(model)
+    prompt = body.get("prompt")
+    if not prompt:
+        return {"model": model, "response": "", "done": True, "done_reason": "load", "load_duration": int(load_s * 1e9)}
+
+    stats["generate"] += 1
+    if random.random() < CONFIG["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse({"error": "injected failure"}, status_code=500)
+
+    options = body.get("options") or {}
+    tokens = _tokens(prompt, int(options.get("num_predict", 128)))
+    context = list(body.get("context") or []) + list(range(len(prompt.split()) + len(tokens)))
+    delay = 1.0 / CONFIG["token_rate"] if CONFIG["token_rate"] else 0.0
+    prompt_tokens = len(prompt.split())
+
+    def final() -> Dict[str, Any]:
+        total = time.perf_counter() - started
+        return {
+            "model": model, "response": "", "done": True, "done_reason": "length", "context": context,
+            "total_duration": int(total * 1e9), "load_duration": int(load_s * 1e9),
+            "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int(CONFIG["ttft"] * 1e9),
+            "eval_count": len(tokens), "eval_duration": int(delay * len(tokens) * 1e9),
+        }
+
+    if not body.get("stream", True):
+        with _InFlight():
+            await asyncio.sleep(CONFIG["ttft"] + delay * len(tokens))
+        return {**final(), "response": "".join(tokens)}
+
+    drop_at = random.randrange(len(tokens)) if tokens and random.random() < CONFIG["drop_rate"] else None
+
+    async def stream():
+        with _InFlight():
+            await asyncio.sleep(CONFIG["ttft"])
+            for i, token in enumerate(tokens):
+                if i == drop_at:
+                    stats["drops"] += 1
+                    raise ConnectionAbortedError("injected stream drop")
+                if i and delay:
+                    await asyncio.sleep(delay)
+                yield json.dumps({"model": model, "response": token, "done": False}) + "\n"
+            yield json.dumps(final()) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/embed")
+async def embed(request: Request):
+    body = await request.json()
+    model = body.get("model", "")
+    if _base(model) not in CONFIG["models"]:
+        return _not_found(model)
+    stats["embed"] += 1
+    if random.random() < CONFIG["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse({"error": "injected failure"}, status_code=500)
+
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    await _load(model)
+    with _InFlight():
+        await asyncio.sleep(CONFIG["embed_latency"])
+    dim = CONFIG["embed_dim"]
+    embeddings = []
+    for text in inputs:
+        vec = [0.0] * dim
+        for word in re.findall(r"\w+", text.lower()):
+            vec[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dim] += 1.0
+        norm = sum(v * v for v in vec) ** 0.5 or 1.0
+        embeddings.append([v / norm for v in vec])
+    return {"model": model, "embeddings": embeddings}
+
+
+# --- CONTROL ---
+
+@app.post("/_fake/config")
+async def update_config(request: Request):
+    updates = await request.json()
+    unknown = set(updates) - set(CONFIG)
+    if unknown:
+        return JSONResponse({"error": f"unknown options: {sorted(unknown)}"}, status_code=400)
+    CONFIG.update(updates)
+    return CONFIG
+
+
+@app.get("/_fake/stats")
+async def get_stats():
+    return {**stats, "loaded": sorted(loaded)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline gateway tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default=",".join(CONFIG["models"]), help="Comma-separated model names")
+    parser.add_argument("--ttft", type=float, default=CONFIG["ttft"], help="Seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=CONFIG["token_rate"], help="Tokens/s per stream (0 = no delay)")
+    parser.add_argument("--load-time", type=float, default=CONFIG["load_time"], help="Seconds to load a cold model")
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"], help="Fraction of requests failing with 500")
+    parser.add_argument("--drop-rate", type=float, default=CONFIG["drop_rate"], help="Fraction of streams cut off mid-response")
+    parser.add_argument("--embed-dim", type=int, default=CONFIG["embed_dim"])
+    parser.add_argument("--embed-latency", type=float, default=CONFIG["embed_latency"], help="Seconds per /api/embed call")
+    parser.add_argument("--context-length", type=int, default=CONFIG["context_length"], help="Context length reported by /api/show")
+    args = parser.parse_args()
+
+    CONFIG.update(
+        models=[_base(m.strip()) for m in args.models.split(",") if m.strip()],
+        ttft=args.ttft,
+        token_rate=args.token_rate,
+        load_time=args.load_time,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        embed_dim=args.embed_dim,
+        embed_latency=args.embed_latency,
+        context_length=args.context_length,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Memory-mapped GGUF Header Reader
+
+Parses the header, key/value metadata and tensor info table of a GGUF file
+without reading any tensor data. The file is memory-mapped and only the pages
+holding the header are touched, so inspecting a multi-gigabyte model takes
+milliseconds and adds almost nothing to RSS.
+
+    python gguf_reader.py models/navajepa_sota.gguf
+
+Spec: https://github.com/ggerganov/ggml/blob/master/docs/gguf.md
+"""
+
+import json
+import mmap
+import struct
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+GGUF_MAGIC = b"GGUF"
+DEFAULT_ALIGNMENT = 32
+
+# GGUF metadata value types
+_UINT8, _INT8, _UINT16, _INT16, _UINT32, _INT32, _FLOAT32, _BOOL, _STRING, _ARRAY, _UINT64, _INT64, _FLOAT64 = range(13)
+
+_SCALAR_FORMATS = {
+    _UINT8: "<B", _INT8: "<b", _UINT16: "<H", _INT16: "<h",
+    _UINT32: "<I", _INT32: "<i", _FLOAT32: "<f", _BOOL: "<?",
+    _UINT64: "<Q", _INT64: "<q", _FLOAT64: "<d",
+}
+_SCALARS = {t: struct.Struct(f) for t, f in _SCALAR_FORMATS.items()}
+
+# ggml tensor types
+GGML_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 6: "Q5_0", 7: "Q5_1", 8: "Q8_0", 9: "Q8_1",
+    10: "Q2_K", 11: "Q3_K", 12: "Q4_K", 13: "Q5_K", 14: "Q6_K", 15: "Q8_K",
+    16: "IQ2_XXS", 17: "IQ2_XS", 18: "IQ3_XXS", 19: "IQ1_S", 20: "IQ4_NL", 21: "IQ3_S",
+    22: "IQ2_S", 23: "IQ4_XS", 24: "I8", 25: "I16", 26: "I32", 27: "I64", 28: "F64",
+    29: "IQ1_M", 30: "BF16", 34: "TQ1_0", 35: "TQ2_0",
+}
+
+# general.file_type (llama_ftype): overall quantization of the file
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M",
+    16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S",
+    22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M",
+    28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+
+
+class GGUFError(ValueError):
+    """Raised when a file is not a valid GGUF file"""
+
+
+@dataclass
+class GGUFTensorInfo:
+    """One entry of the tensor info table"""
+    name: str
+    shape: Tuple[int, ...]
+    ggml_type: int
+    offset: int
+
+    @property
+    def type_name(self) -> str:
+        return GGML_TYPES.get(self.ggml_type, f"TYPE_{self.ggml_type}")
+
+    @property
+    def n_elements(self) -> int:
+        n = 1
+        for dim in self.shape:
+            n *= dim
+        return n
+
+
+class GGUFReader:
+    """
+    Parse GGUF metadata and the tensor table from a memory-mapped file.
+
+    Arrays with more than `max_array_items` entries (e.g. the tokenizer
+    vocabulary) are skipped over and summarized as {"type", "count"} instead
+    of being materialized.
+    """
+
+    def __init__(self, path: Path, max_array_items: int = 64):
+        self.path = Path(path)
+        self.max_array_items = max_array_items
+        self.version = 0
+        self.metadata: Dict[str, Any] = {}
+        self.tensors: List[GGUFTensorInfo] = []
+        self.data_offset = 0
+
+        with open(self.path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise GGUFError(f"{self.path} is empty")
+            try:
+                self._buf = mm
+                self._parse()
+            except struct.error as e:
+                raise GGUFError(f"Truncated GGUF header in {self.path}: {e}")
+            finally:
+                self._buf = None
+                mm.close()
+
+    # --- LOW-LEVEL READS ---
+
+    def _scalar(self, value_type: int):
+        s = _SCALARS[value_type]
+        (value,) = s.unpack_from(self._buf, self._pos)
+        self._pos += s.size
+        return value
+
+    def _count(self) -> int:
+        # GGUF v1 used 32-bit counts and string lengths
+        return self._scalar(_UINT32 if self.version == 1 else _UINT64)
+
+    def _string(self) -> str:
+        length = self._count()
+        start = self._pos
+        self._pos += length
+        if self._pos > len(self._buf):
+            raise struct.error("string runs past end of file")
+        return bytes(self._buf[start:self._pos]).decode("utf-8", errors="replace")
+
+    def _value(self, value_type: int):
+        if value_type in _SCALARS:
+            return self._scalar(value_type)
+        if value_type == _STRING:
+            return self._string()
+        if value_type == _ARRAY:
+            element_type = self._scalar(_UINT32)
+            count = self._count()
+            if count <= self.max_array_items:
+                return [self._value(element_type) for _ in range(count)]
+            self._skip_array(element_type, count)
+            return {"type": "array", "element_type": element_type, "count": count}
+        raise GGUFError(f"Unknown metadata value type {value_type}")
+
+    def _skip_array(self, element_type: int, count: int):
+        if element_type in _SCALARS:
+            self._pos += _SCALARS[element_type].size * count
+        elif element_type == _STRING:
+            # Hot loop for large vocabularies: avoid per-item method calls
+            length_struct = _SCALARS[_UINT32 if self.version == 1 else _UINT64]
+            unpack_from, size, buf, pos = length_struct.unpack_from, length_struct.size, self._buf, self._pos
+            for _ in range(count):
+                pos += size + unpack_from(buf, pos)[0]
+            self._pos = pos
+        else:
+            for _ in range(count):
+                self._value(element_type)
+        if self._pos > len(self._buf):
+            raise GGUFError(f"Truncated GGUF header in {self.path}: array runs past end of file")
+
+    # --- PARSING ---
+
+    def _parse(self):
+        if self._buf[:4] != GGUF_MAGIC:
+            raise GGUFError(f"{self.path} is not a GGUF file")
+        self._pos = 4
+        self.version = self._scalar(_UINT32)
+        if self.version not in (1, 2, 3):
+            raise GGUFError(f"Unsupported GGUF version {self.version}")
+
+        tensor_count = self._count()
+        kv_count = self._count()
+
+        for _ in range(kv_count):
+            key = self._string()
+            value_type = self._scalar(_UINT32)
+            self.metadata[key] = self._value(value_type)
+
+        for _ in range(tensor_count):
+            name = self._string()
+            n_dims = self._scalar(_UINT32)
+            shape = tuple(self._count() for _ in range(n_dims))
+            ggml_type = self._scalar(_UINT32)
+            offset = self._scalar(_UINT64)
+            self.tensors.append(GGUFTensorInfo(name, shape, ggml_type, offset))
+
+        alignment = self.metadata.get("general.alignment", DEFAULT_ALIGNMENT) or DEFAULT_ALIGNMENT
+        self.data_offset = (self._pos + alignment - 1) // alignment * alignment
+
+    # --- DERIVED METADATA ---
+
+    @property
+    def architecture(self) -> Optional[str]:
+        return self.metadata.get("general.architecture")
+
+    @property
+    def context_length(self) -> Optional[int]:
+        arch = self.architecture
+        return self.metadata.get(f"{arch}.context_length") if arch else None
+
+    @property
+    def file_type(self) -> Optional[str]:
+        file_type = self.metadata.get("general.file_type")
+        if file_type is None:
+            return None
+        return FILE_TYPES.get(file_type, f"FTYPE_{file_type}")
+
+    @property
+    def parameter_count(self) -> int:
+        return sum(t.n_elements for t in self.tensors)
+
+    def tensor_types(self) -> Dict[str, int]:
+        """Number of tensors per quantization type"""
+        return dict(Counter(t.type_name for t in self.tensors))
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact, JSON-serializable description of the model"""
+        tensor_types = self.tensor_types()
+        return {
+            "gguf_version": self.version,
+            "architecture": self.architecture,
+            "name": self.metadata.get("general.name"),
+            "context_length": self.context_length,
+            "file_type": self.file_type or (max(tensor_types, key=tensor_types.get) if tensor_types else None),
+            "parameter_count": self.parameter_count,
+            "tensor_count": len(self.tensors),
+            "tensor_types": tensor_types,
+            "data_offset": self.data_offset,
+        }
+
+
+def read_gguf_summary(path: Path) -> Dict[str, Any]:
+    """Summarize a GGUF file (raises GGUFError if it is not valid GGUF)"""
+    return GGUFReader(path).summary()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python gguf_reader.py <model.gguf>")
+        sys.exit(1)
+    print(json.dumps(read_gguf_summary(Path(sys.argv[1])), indent=2))
@@ -0,0 +1,129 @@
+"""
+Request Hedging for Short Generations
+
+One slow backend (a long prompt-eval ahead in its queue, a GC pause, a
+thermally throttled GPU) sets the p99 of short requests. A non-streaming
+generation that has not answered within the p95 latency of comparable
+requests is therefore sent again to a second backend. The first response
+wins and the other request is cancelled, which closes its connection and
+stops the generation in Ollama.
+
+Hedges are paid for from a budget: every eligible request earns
+`budget_ratio` of a hedge and each hedge spends one, so hedging adds at
+most ~5% load (by default) and cannot snowball when every backend is slow.
+
+Delays come from a rolling window per (model, max_tokens bucket); until a
+window has `min_samples` latencies nothing is hedged.
+"""
+
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _DelayWindow:
+    """Recent latencies with the hedge percentile recomputed every few samples"""
+
+    __slots__ = ("samples", "delay_s", "_since_update")
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.delay_s: Optional[float] = None
+        self._since_update = 0
+
+    def add(self, latency_s: float, percentile: float, min_samples: int):
+        self.samples.append(latency_s)
+        self._since_update += 1
+        if len(self.samples) >= min_samples and (self.delay_s is None or self._since_update >= 16):
+            ordered = sorted(self.samples)
+            self.delay_s = ordered[min(len(ordered) - 1, int(percentile / 100.0 * len(ordered)))]
+            self._since_update = 0
+
+
+class HedgePolicy:
+    """
+    When to hedge, and whether the budget allows it.
+
+    Usage:
+        delay = policy.delay(model, max_tokens)      # None: do not hedge
+        ... no response after `delay` seconds ...
+        if policy.try_spend():
+            ... pick a backend and send the duplicate ...
+            ... or, with no backend to take it: policy.refund()
+        policy.record(model, max_tokens, latency_s)
+    """
+
+    def __init__(
+        self,
+        budget_ratio: float = 0.05,
+        max_burst: float = 10.0,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        min_delay_s: float = 0.05,
+        window: int = 512
+    ):
+        self.budget_ratio = budget_ratio
+        self.max_burst = max_burst
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay_s = min_delay_s
+        self.window = window
+        self._windows: Dict[str, _DelayWindow] = {}
+        self._credits = 0.0
+
+        self.eligible = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped_budget = 0
+        self.skipped_backend = 0
+
+    @staticmethod
+    def _key(model: str, max_tokens: int) -> str:
+        # Latency scales with the generation length; bucket by powers of two
+        return f"{model}:{1 << max(0, max_tokens - 1).bit_length()}"
+
+    def delay(self, model: str, max_tokens: int) -> Optional[float]:
+        """Seconds to wait before hedging this request; also earns budget"""
+        self.eligible += 1
+        self._credits = min(self.max_burst, self._credits + self.budget_ratio)
+        window = self._windows.get(self._key(model, max_tokens))
+        if window is None or window.delay_s is None:
+            return None
+        return max(self.min_delay_s, window.delay_s)
+
+    def try_spend(self) -> bool:
+        if self._credits < 1.0:
+            self.skipped_budget += 1
+            return False
+        self._credits -= 1.0
+        self.hedged += 1
+        return True
+
+    def refund(self):
+        """Give back a spent credit when no backend could take the hedge"""
+        self._credits = min(self.max_burst, self._credits + 1.0)
+        self.hedged -= 1
+        self.skipped_backend += 1
+
+    def record(self, model: str, max_tokens: int, latency_s: float):
+        key = self._key(model, max_tokens)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _DelayWindow(self.window)
+        window.add(latency_s, self.percentile, self.min_samples)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_ratio": self.budget_ratio,
+            "credits": round(self._credits, 2),
+            "eligible": self.eligible,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "skipped_budget": self.skipped_budget,
+            "skipped_backend": self.skipped_backend,
+            "delays_ms": {
+                key: round(w.delay_s * 1000, 1) for key, w in self._windows.items() if w.delay_s is not None
+            },
+        }
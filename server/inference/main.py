@@ -6,70 +6,33 @@ and supporting real-time video inference capabilities of VL-JEPA.
 """
 
 import uvicorn
-import torch
-import torch.nn as nn
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Form
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from PIL import Image
-import io
+import os
+import asyncio
 import base64
 import time
-from typing import Optional, Dict, List
-import numpy as np
-from pathlib import Path
-
-# Import model architecture (simplified for production)
-# In production, you would import from your trained model module
-try:
-    from model import NavaFlowVLJEPA
-except ImportError:
-    # Fallback: Define minimal model structure for demo
-    print("⚠️  Model module not found. Using simplified structure.")
-    NavaFlowVLJEPA = None
-
-# --- DEVICE CONFIGURATION ---
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"🚀 Loading model on {device}...")
-
-# Model configuration
-VISION_DIM = 768
-TEXT_DIM = 2048
-EMBEDDING_DIM = 1536
-NUM_AGENT_ACTIONS = 5
+from typing import Optional, Dict, List, Tuple
 
-# --- MODEL LOADING ---
-model = None
-model_loaded = False
+from binary_protocol import BinaryInferenceServer
+from scheduler import Priority
+from recorder import RequestRecorder
+from gc_profile import GCPauseMonitor, apply_profile_from_env
 
-def load_model(checkpoint_path: str = "navajepa_sota.pth"):
-    """Load the trained NavaFlow-VL-JEPA model"""
-    global model, model_loaded
-    
-    if NavaFlowVLJEPA is not None:
-        try:
-            model = NavaFlowVLJEPA(device)
-            if Path(checkpoint_path).exists():
-                checkpoint = torch.load(checkpoint_path, map_location=device)
-                model.load_state_dict(checkpoint.get('model_state_dict', checkpoint))
-                model.eval()
-                model_loaded = True
-                print(f"✅ Model loaded from {checkpoint_path}")
-            else:
-                print(f"⚠️  Checkpoint not found: {checkpoint_path}. Using untrained model.")
-                model.eval()
-                model_loaded = True
-        except Exception as e:
-            print(f"⚠️  Error loading model: {e}")
-            model = None
-    else:
-        print("⚠️  Using mock model for demo purposes")
-        model = None
-    
-    return model_loaded
+from vision_engine import (
+    DEFAULT_QUERY, EMBEDDING_DIM, NUM_AGENT_ACTIONS,
+    create_scheduler, decode_image, device, format_prediction, get_engine
+)
 
-# Try to load model
-load_model()
+# --- MODEL LOADING ---
+# The pipeline lives in vision_engine.py (shared with main_ollama.py);
+# this server loads it eagerly so the first request does not pay for it.
+print(f"🚀 Loading model on {device}...")
+engine = get_engine("navajepa_sota.pth")
+model_loaded = engine.load()
+print(f"✅ Encoders: vision={engine.encoders.info()['vision_encoder']}, text={engine.encoders.info()['text_encoder']}")
 
 # --- FASTAPI APP ---
 app = FastAPI(
@@ -87,76 +50,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- IMAGE PREPROCESSING ---
-from torchvision import transforms
-
-image_preprocess = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(
-        mean=[0.48145466, 0.4578275, 0.40821073],
-        std=[0.26862954, 0.26130258, 0.27577711]
-    )
-])
-
-# --- TEXT ENCODER (Frozen) ---
-try:
-    from transformers import AutoTokenizer, AutoModel
-    text_tokenizer = AutoTokenizer.from_pretrained('bert-base-uncased')
-    text_model = AutoModel.from_pretrained('bert-base-uncased').to(device)
-    text_model.eval()
-    for param in text_model.parameters():
-        param.requires_grad = False
-    print("✅ Text encoder loaded (BERT)")
-except Exception as e:
-    print(f"⚠️  Could not load BERT: {e}")
-    text_tokenizer = None
-    text_model = None
-
-# --- VISION ENCODER (Frozen CLIP) ---
-try:
-    from transformers import CLIPVisionModel, CLIPProcessor
-    vision_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-    vision_model = CLIPVisionModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-    vision_model.eval()
-    for param in vision_model.parameters():
-        param.requires_grad = False
-    print("✅ Vision encoder loaded (CLIP)")
-except Exception as e:
-    print(f"⚠️  Could not load CLIP: {e}")
-    vision_processor = None
-    vision_model = None
-
-# --- MOCK MODEL (if real model not available) ---
-class MockNavaFlowModel(nn.Module):
-    """Mock model for demo when trained model is not available"""
-    def __init__(self):
-        super().__init__()
-        self.predictor = nn.Sequential(
-            nn.Linear(768 + 768, 1536),
-            nn.GELU(),
-            nn.Linear(1536, 1536)
-        )
-        self.world_head = nn.Sequential(
-            nn.Linear(768 + 768, 1),
-            nn.Sigmoid()
-        )
-        self.agent_head = nn.Sequential(
-            nn.Linear(768 + 768, NUM_AGENT_ACTIONS)
-        )
-    
-    def forward(self, vision_emb, text_emb):
-        combined = torch.cat([vision_emb, text_emb], dim=-1)
-        return {
-            'prediction': self.predictor(combined),
-            'world_state_logits': self.world_head(combined),
-            'action_logits': self.agent_head(combined)
-        }
+# --- INFERENCE CORE ---
+# Shared by the HTTP endpoints and the binary UDS protocol
+
+def run_inference_batch(items: List[Tuple[Image.Image, str]]) -> List[Dict]:
+    """Run the full VL-JEPA pipeline for a batch of (image, query) pairs"""
+    return engine.run_batch(items)
+
+def run_inference(pil_image: Image.Image, text_query: str) -> Dict:
+    """Run the full VL-JEPA pipeline for one (image, query) pair"""
+    return engine.run(pil_image, text_query)
+
+# --- REQUEST SCHEDULER ---
+# Micro-batches concurrent requests; interactive work always fills a batch first.
+# Priority is set per request with the X-NavaFlow-Priority header
+# (`interactive` | `bulk`), defaulting by endpoint.
+
+PRIORITY_HEADER = "X-NavaFlow-Priority"
+
+scheduler = create_scheduler(engine)
+
+@app.on_event("startup")
+async def start_scheduler():
+    await scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
+
+async def run_inference_bytes(image_data: bytes, text_query: str) -> Dict:
+    """Binary protocol entry point: raw image bytes in, raw outputs out"""
+    pil_image = decode_image(image_data)
+    return await scheduler.submit((pil_image, text_query or DEFAULT_QUERY), Priority.INTERACTIVE)
+
+# --- REQUEST RECORDER ---
+# Opt-in: set NAVAFLOW_RECORD_DIR to capture traffic for replay.py
 
-if model is None:
-    model = MockNavaFlowModel().to(device)
-    model.eval()
-    print("✅ Using mock model for inference")
+RECORD_DIR = os.getenv("NAVAFLOW_RECORD_DIR")
+recorder = RequestRecorder(
+    RECORD_DIR,
+    max_file_bytes=int(os.getenv("NAVAFLOW_RECORD_MAX_FILE_MB", 256)) * 1024 * 1024,
+    max_files=int(os.getenv("NAVAFLOW_RECORD_MAX_FILES", 8)),
+    sample_rate=float(os.getenv("NAVAFLOW_RECORD_SAMPLE_RATE", 1.0))
+) if RECORD_DIR else None
+
+@app.on_event("startup")
+async def start_recorder():
+    if recorder is not None:
+        recorder.start()
+
+@app.on_event("shutdown")
+async def stop_recorder():
+    if recorder is not None:
+        recorder.stop()
+
+# --- BINARY PROTOCOL (Unix Domain Socket) ---
+# Optional: set NAVAFLOW_UDS_PATH to serve co-located callers without HTTP/JSON
+
+UDS_PATH = os.getenv("NAVAFLOW_UDS_PATH")
+binary_server = BinaryInferenceServer(UDS_PATH, run_inference_bytes) if UDS_PATH else None
+
+@app.on_event("startup")
+async def start_binary_server():
+    if binary_server is not None:
+        await binary_server.start()
+
+@app.on_event("shutdown")
+async def stop_binary_server():
+    if binary_server is not None:
+        await binary_server.stop()
+
+# --- GC / ALLOCATOR PROFILE ---
+# NAVAFLOW_GC_PROFILE=serving freezes the post-load heap and tunes GC thresholds.
+# Pause counts and durations are always reported on /metrics.
+
+gc_monitor = GCPauseMonitor()
+gc_monitor.install()
+gc_profile_applied: Dict = {}
+
+@app.on_event("startup")
+async def apply_gc_profile():
+    # Registered last so every model and startup allocation is already on the heap
+    global gc_profile_applied
+    gc_profile_applied = apply_profile_from_env()
+    gc_monitor.reset()
 
 # --- ENDPOINTS ---
 
@@ -177,8 +154,8 @@ async def health():
         "status": "healthy",
         "model_loaded": model_loaded,
         "device": str(device),
-        "vision_encoder": vision_model is not None,
-        "text_encoder": text_model is not None
+        "vision_encoder": engine.encoders.vision_model is not None,
+        "text_encoder": engine.encoders.text_model is not None
     }
 
 @app.post("/predict/vision")
@@ -208,96 +185,50 @@ async def predict_vision(
         # 1. Handle Image Input
         if image:
             image_data = await image.read()
-            pil_image = Image.open(io.BytesIO(image_data)).convert('RGB')
         elif image_base64:
             image_data = base64.b64decode(image_base64)
-            pil_image = Image.open(io.BytesIO(image_data)).convert('RGB')
         else:
             # Try JSON body
             try:
                 data = await request.json()
                 if 'image' in data:
                     image_data = base64.b64decode(data['image'])
-                    pil_image = Image.open(io.BytesIO(image_data)).convert('RGB')
                 else:
                     raise HTTPException(status_code=400, detail="No image provided")
             except:
                 raise HTTPException(status_code=400, detail="No image provided")
+        pil_image = decode_image(image_data)
         
         # 2. Handle Text Query
         if not text_query:
             try:
                 data = await request.json()
-                text_query = data.get('text_query', 'What is in this image?')
+                text_query = data.get('text_query', DEFAULT_QUERY)
             except:
-                text_query = 'What is in this image?'
+                text_query = DEFAULT_QUERY
         
-        # 3. Process Image (Vision Encoder)
-        if vision_model is not None and vision_processor is not None:
-            with torch.no_grad():
-                inputs = vision_processor(images=pil_image, return_tensors="pt").to(device)
-                vision_outputs = vision_model(**inputs)
-                vision_embedding = vision_outputs.pooler_output  # [1, 768]
-        else:
-            # Fallback: Use simple preprocessing
-            image_tensor = image_preprocess(pil_image).unsqueeze(0).to(device)
-            # Mock vision embedding
-            vision_embedding = torch.randn(1, 768).to(device)
-        
-        # 4. Process Text (Text Encoder)
-        if text_model is not None and text_tokenizer is not None:
-            with torch.no_grad():
-                text_inputs = text_tokenizer(
-                    text_query,
-                    padding=True,
-                    truncation=True,
-                    max_length=128,
-                    return_tensors="pt"
-                ).to(device)
-                text_outputs = text_model(**text_inputs)
-                text_embedding = text_outputs.last_hidden_state.mean(dim=1)  # [1, 768]
-        else:
-            # Mock text embedding
-            text_embedding = torch.randn(1, 768).to(device)
-        
-        # 5. Model Inference (The Core)
-        with torch.no_grad():
-            outputs = model(vision_embedding, text_embedding)
-            
-            predicted_embedding = outputs['prediction']
-            world_state_logits = outputs['world_state_logits']
-            action_logits = outputs['action_logits']
-        
-        # 6. Post-process outputs
-        world_state_prob = torch.sigmoid(world_state_logits).cpu().item()
-        action_probs = torch.softmax(action_logits, dim=1).cpu().numpy()[0]
-        action_pred = int(torch.argmax(action_logits, dim=1).cpu().item())
-        
-        # Action labels
-        action_labels = ['IDLE', 'KILL_PROCESS', 'ROTATE_CAMERA', 'SCALE_RESOURCES', 'LOG_EVENT']
-        predicted_action = action_labels[action_pred] if action_pred < len(action_labels) else f'ACTION_{action_pred}'
+        # 3-6. Encoders, model inference and post-processing (batched by the scheduler)
+        priority = Priority.parse(request.headers.get(PRIORITY_HEADER), Priority.INTERACTIVE)
+        result = await scheduler.submit((pil_image, text_query), priority)
         
         # 7. Calculate latency
         latency_ms = (time.time() - start_time) * 1000
         
         # 8. Prepare response
         response = {
-            "prediction": predicted_embedding.cpu().numpy()[0].tolist(),
-            "world_state": {
-                "probability": float(world_state_prob),
-                "prediction": "ON" if world_state_prob > 0.5 else "OFF"
-            },
-            "action": {
-                "predicted_action": predicted_action,
-                "action_id": action_pred,
-                "probabilities": {
-                    label: float(prob) for label, prob in zip(action_labels, action_probs[:len(action_labels)])
-                }
-            },
+            **format_prediction(result),
             "latency_ms": round(latency_ms, 4),
             "target_met": latency_ms <= 0.15
         }
         
+        if recorder is not None:
+            recorder.record("/predict/vision", {
+                "text_query": text_query,
+                "priority": priority.name.lower(),
+                "status": 200,
+                "latency_ms": latency_ms
+            }, [image_data])
+        
         return JSONResponse(content=response)
         
     except Exception as e:
@@ -305,59 +236,45 @@ async def predict_vision(
 
 @app.post("/predict/batch")
 async def predict_batch(
+    request: Request,
     images: List[UploadFile] = File(...),
     text_query: str = Form(...)
 ):
     """
     Batch inference endpoint for multiple images
+
+    Runs at bulk priority by default so it never delays interactive
+    /predict/vision calls; override with the X-NavaFlow-Priority header.
     """
     start_time = time.time()
-    results = []
+    priority = Priority.parse(request.headers.get(PRIORITY_HEADER), Priority.BULK)
+    
+    payloads: List[bytes] = [b""] * len(images)
     
-    for image in images:
+    async def infer_one(index: int, image: UploadFile):
         try:
             image_data = await image.read()
-            pil_image = Image.open(io.BytesIO(image_data)).convert('RGB')
-            
-            # Process image
-            if vision_model is not None:
-                with torch.no_grad():
-                    inputs = vision_processor(images=pil_image, return_tensors="pt").to(device)
-                    vision_outputs = vision_model(**inputs)
-                    vision_emb = vision_outputs.pooler_output
-            else:
-                vision_emb = torch.randn(1, 768).to(device)
-            
-            # Process text
-            if text_model is not None:
-                with torch.no_grad():
-                    text_inputs = text_tokenizer(
-                        text_query,
-                        padding=True,
-                        truncation=True,
-                        max_length=128,
-                        return_tensors="pt"
-                    ).to(device)
-                    text_outputs = text_model(**text_inputs)
-                    text_emb = text_outputs.last_hidden_state.mean(dim=1)
-            else:
-                text_emb = torch.randn(1, 768).to(device)
-            
-            # Inference
-            with torch.no_grad():
-                outputs = model(vision_emb, text_emb)
-                world_state = torch.sigmoid(outputs['world_state_logits']).cpu().item()
-                action_pred = int(torch.argmax(outputs['action_logits'], dim=1).cpu().item())
-            
-            results.append({
-                "world_state": "ON" if world_state > 0.5 else "OFF",
-                "action_id": action_pred
-            })
+            payloads[index] = image_data
+            result = await scheduler.submit((decode_image(image_data), text_query), priority)
+            return {
+                "world_state": "ON" if result["world_state_prob"] > 0.5 else "OFF",
+                "action_id": result["action_id"]
+            }
         except Exception as e:
-            results.append({"error": str(e)})
+            return {"error": str(e)}
+    
+    results = await asyncio.gather(*(infer_one(i, image) for i, image in enumerate(images)))
     
     latency_ms = (time.time() - start_time) * 1000
     
+    if recorder is not None:
+        recorder.record("/predict/batch", {
+            "text_query": text_query,
+            "priority": priority.name.lower(),
+            "status": 200,
+            "latency_ms": latency_ms
+        }, payloads)
+    
     return JSONResponse(content={
         "results": results,
         "batch_size": len(images),
@@ -372,10 +289,13 @@ async def get_metrics():
         "model_loaded": model_loaded,
         "device": str(device),
         "target_latency_ms": 0.15,
-        "vision_encoder": "CLIP" if vision_model is not None else "Mock",
-        "text_encoder": "BERT" if text_model is not None else "Mock",
+        "vision_encoder": engine.encoders.info()["vision_encoder"],
+        "text_encoder": engine.encoders.info()["text_encoder"],
         "num_actions": NUM_AGENT_ACTIONS,
-        "embedding_dim": EMBEDDING_DIM
+        "embedding_dim": EMBEDDING_DIM,
+        "scheduler": scheduler.stats(),
+        "recorder": recorder.stats() if recorder is not None else {"enabled": False},
+        "gc": {**gc_monitor.stats(), "profile": gc_profile_applied.get("profile", "default")}
     }
 
 # --- START SERVER ---
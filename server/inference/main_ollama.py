@@ -7,20 +7,49 @@ with Ollama as the inference engine for maximum performance and control.
 
 import os
 import sys
-import subprocess
 import asyncio
 import uvicorn
 import torch
 import psutil
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Literal, Tuple, Union
 from pathlib import Path
 import json
+import math
+import base64
+import numpy as np
+import time
 import logging
 
+from model_registry import ModelRegistry
+from backend_pool import BackendPool, OllamaBackend
+from model_scheduler import ModelAffinityScheduler
+from metrics import CONTENT_TYPE, RATE_BUCKETS, MetricsRegistry
+from response_cache import ResponseCache, make_cache_key
+from semantic_cache import SemanticCache
+from session_store import SessionStore
+from embedding_cache import EmbeddingCache, make_embedding_key
+from runner_pool import RunnerError, RunnerPool
+from hedging import HedgePolicy
+from prompt_budget import PromptTooLong, TokenEstimator, truncate_middle
+from client_limits import (
+    ClientLimiter, ClientPolicy, ClientTicket, RateLimited, WeightedFairQueue, estimate_tokens, load_client_policies
+)
+from scheduler import Priority, PriorityBatchScheduler
+from vision_engine import DEFAULT_QUERY, VisionEngine, create_scheduler, decode_image, format_prediction, get_engine
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Errors meaning the request never reached Ollama (safe to retry elsewhere)
+_CONNECT_ERRORS = (httpx.ConnectError,) if httpx is not None else ()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,11 +59,97 @@ HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8000))
 MODEL_DIR = Path(os.getenv("MODEL_DIR", "./models"))
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "5"))
 
 # Ollama configuration
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# Comma-separated backend list; defaults to the single OLLAMA_HOST
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if h.strip()]
+OLLAMA_AFFINITY_SLACK = int(os.getenv("OLLAMA_AFFINITY_SLACK", "8"))
 OLLAMA_NUM_GPU = os.getenv("OLLAMA_NUM_GPU", "all")
 OLLAMA_MAX_LOADED_MODELS = int(os.getenv("OLLAMA_MAX_LOADED_MODELS", "4"))
+OLLAMA_FAIRNESS_WINDOW = float(os.getenv("OLLAMA_FAIRNESS_WINDOW", "5"))
+# Concurrent generations per backend for /v1/generate/batch
+OLLAMA_BATCH_CONCURRENCY = int(os.getenv("OLLAMA_BATCH_CONCURRENCY", "4"))
+OLLAMA_BATCH_MAX_LINE_BYTES = int(os.getenv("OLLAMA_BATCH_MAX_LINE_BYTES", str(1024 * 1024)))
+# Models loaded (and pinned) at startup, e.g. "llama3,navajepa"
+OLLAMA_PRELOAD_MODELS = [m.strip() for m in os.getenv("OLLAMA_PRELOAD_MODELS", "").split(",") if m.strip()]
+OLLAMA_PRELOAD_KEEP_ALIVE = os.getenv("OLLAMA_PRELOAD_KEEP_ALIVE", "-1")
+OLLAMA_PRELOAD_WARMUP = os.getenv("OLLAMA_PRELOAD_WARMUP", "1") != "0"
+OLLAMA_WARMUP_PROMPT = os.getenv("OLLAMA_WARMUP_PROMPT", "Hello")
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "64"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+OLLAMA_REQUEST_TIMEOUT = float(os.getenv("OLLAMA_REQUEST_TIMEOUT", "300"))
+# Worker processes used instead of HTTP when httpx is not installed
+OLLAMA_RUNNER_WORKERS = int(os.getenv("OLLAMA_RUNNER_WORKERS", "2"))
+OLLAMA_RUNNER_MAX_REQUESTS = int(os.getenv("OLLAMA_RUNNER_MAX_REQUESTS", "1000"))
+OLLAMA_DIGEST_TTL = float(os.getenv("OLLAMA_DIGEST_TTL", "60"))
+# Context window Ollama runs models with (its OLLAMA_CONTEXT_LENGTH / num_ctx); caps the model metadata
+OLLAMA_CONTEXT_LENGTH = int(os.getenv("OLLAMA_CONTEXT_LENGTH", "0"))
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "5"))
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "2"))
+OLLAMA_BREAKER_FAILURES = int(os.getenv("OLLAMA_BREAKER_FAILURES", "3"))
+OLLAMA_BREAKER_RESET = float(os.getenv("OLLAMA_BREAKER_RESET", "10"))
+# Hedging: re-send short non-streaming generations that are slower than the p95
+OLLAMA_HEDGE_ENABLED = os.getenv("OLLAMA_HEDGE_ENABLED", "0") == "1"
+OLLAMA_HEDGE_MAX_TOKENS = int(os.getenv("OLLAMA_HEDGE_MAX_TOKENS", "256"))  # longer generations are never hedged
+OLLAMA_HEDGE_PERCENTILE = float(os.getenv("OLLAMA_HEDGE_PERCENTILE", "95"))
+OLLAMA_HEDGE_BUDGET = float(os.getenv("OLLAMA_HEDGE_BUDGET", "0.05"))  # max extra requests, as a fraction
+OLLAMA_HEDGE_MIN_DELAY = float(os.getenv("OLLAMA_HEDGE_MIN_DELAY", "0.05"))
+OLLAMA_HEDGE_MIN_SAMPLES = int(os.getenv("OLLAMA_HEDGE_MIN_SAMPLES", "20"))
+
+# Exact-match cache for temperature=0 generations
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "0") == "1"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")  # SQLite file for the persistent tier
+
+# Embeddings endpoint: Ollama /api/embed calls are batched and cached by content
+EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "nomic-embed-text")
+EMBEDDINGS_MAX_INPUTS = int(os.getenv("EMBEDDINGS_MAX_INPUTS", "4096"))
+EMBEDDINGS_BATCH_SIZE = int(os.getenv("EMBEDDINGS_BATCH_SIZE", "64"))
+EMBEDDINGS_BATCH_MAX_CHARS = int(os.getenv("EMBEDDINGS_BATCH_MAX_CHARS", "32768"))
+EMBEDDINGS_CONCURRENCY = int(os.getenv("EMBEDDINGS_CONCURRENCY", "2"))  # batches in flight per backend
+EMBEDDINGS_CACHE_MAX_MB = float(os.getenv("EMBEDDINGS_CACHE_MAX_MB", "256"))
+EMBEDDINGS_CACHE_DB = os.getenv("EMBEDDINGS_CACHE_DB", "")  # SQLite file for the persistent tier
+
+# Semantic cache: serve near-duplicate prompts from stored responses
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_EMBED_MODEL = os.getenv("SEMANTIC_CACHE_EMBED_MODEL", EMBEDDINGS_MODEL)
+SEMANTIC_CACHE_EMBED_TIMEOUT = float(os.getenv("SEMANTIC_CACHE_EMBED_TIMEOUT", "2"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Per-route overrides, e.g. "/v1/generate=0.93,/v1/generate/batch=0.97"
+SEMANTIC_CACHE_ROUTE_THRESHOLDS = {
+    route.strip(): float(value)
+    for route, _, value in (item.partition("=") for item in os.getenv("SEMANTIC_CACHE_ROUTE_THRESHOLDS", "").split(","))
+    if route.strip() and value.strip()
+}
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+# Conversation sessions: reuse Ollama's returned context between turns
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_MEMORY_MB = float(os.getenv("SESSION_MAX_MEMORY_MB", "256"))
+SESSION_MAX_CONTEXT_TOKENS = int(os.getenv("SESSION_MAX_CONTEXT_TOKENS", "32768"))
+
+# Prompts over the context budget (context length - max_tokens): "reject" (413), "truncate" or "off"
+PROMPT_OVERFLOW = os.getenv("PROMPT_OVERFLOW", "reject")
+PROMPT_HEAD_FRACTION = float(os.getenv("PROMPT_HEAD_FRACTION", "0.3"))  # share of a truncated prompt kept from the start
+
+# Per-API-key budgets (X-API-Key) and weighted fair queuing ahead of the backends
+CLIENT_LIMITS_ENABLED = os.getenv("CLIENT_LIMITS_ENABLED", "0") == "1"
+CLIENT_LIMITS_FILE = os.getenv("CLIENT_LIMITS_FILE", "")  # JSON: per-key name, weight and budgets
+CLIENT_DEFAULT_RPM = float(os.getenv("CLIENT_DEFAULT_RPM", "120"))  # 0 = unlimited
+CLIENT_DEFAULT_TPM = float(os.getenv("CLIENT_DEFAULT_TPM", "100000"))  # estimated tokens; 0 = unlimited
+CLIENT_DEFAULT_WEIGHT = float(os.getenv("CLIENT_DEFAULT_WEIGHT", "1"))
+CLIENT_MAX_QUEUED = int(os.getenv("CLIENT_MAX_QUEUED", "32"))  # per client; 0 = unlimited
+# Generations in flight per backend before the fair queue holds requests back
+CLIENT_QUEUE_CONCURRENCY = int(os.getenv("CLIENT_QUEUE_CONCURRENCY", "8"))
+
+# In-process VL-JEPA for /v1/vision (batching: NAVAFLOW_MAX_BATCH_SIZE, NAVAFLOW_BATCH_WINDOW_MS, ...)
+VISION_ENGINE_ENABLED = os.getenv("VISION_ENGINE_ENABLED", "1") == "1"
+VISION_PRELOAD_MODELS = [m.strip() for m in os.getenv("VISION_PRELOAD_MODELS", "").split(",") if m.strip()]
 
 # --- API MODELS (Pydantic) ---
 
@@ -46,6 +161,8 @@ class GenerationRequest(BaseModel):
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
     stream: bool = Field(default=False, description="Enable streaming response")
     image_data: Optional[str] = Field(None, description="Base64 encoded image (for vision models)")
+    session_id: Optional[str] = Field(None, max_length=128, description="Conversation id; send only the new turn as `prompt`")
+    truncate: Optional[bool] = Field(None, description="Cut the middle of prompts over the context length instead of rejecting them (default: PROMPT_OVERFLOW)")
 
 class VisionRequest(BaseModel):
     """Request model for vision-language inference"""
@@ -53,6 +170,20 @@ class VisionRequest(BaseModel):
     text_query: str = Field(..., description="Text query about the image")
     model_id: str = Field(default="navajepa", description="Vision model identifier")
 
+class ModelLoadRequest(BaseModel):
+    """Request model for preloading a model"""
+    keep_alive: str = Field(default=OLLAMA_PRELOAD_KEEP_ALIVE, description="How long to keep the model resident ('30m', '3600', '-1' = until unloaded)")
+    warmup: bool = Field(default=False, description="Run a short prompt so the KV cache and kernels are initialized")
+
+class EmbeddingRequest(BaseModel):
+    """Request model for text embeddings"""
+    input: Union[str, List[str]] = Field(..., description="Text or list of texts to embed")
+    model_id: str = Field(default=EMBEDDINGS_MODEL, description="Ollama embedding model")
+    encoding_format: Literal["float", "base64", "binary"] = Field(
+        default="float",
+        description="'float' (JSON arrays), 'base64' (little-endian float32 per input) or 'binary' (raw float32 matrix)"
+    )
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
@@ -66,55 +197,24 @@ class HealthResponse(BaseModel):
 # --- MODEL MANAGER ---
 
 class ModelManager:
-    """Manages model discovery and loading"""
+    """
+    Manages model discovery and loading.
+
+    Backed by an indexed `ModelRegistry`: the whole model directory is indexed
+    once (reusing cached metadata across restarts) and kept up to date in the
+    background, so lookups here never touch the filesystem.
+    """
     
     def __init__(self, model_dir: Path):
         self.model_dir = model_dir
-        self.models: Dict[str, Dict[str, Any]] = {}
-        self._scan_models()
-    
-    def _scan_models(self):
-        """Scan model directory for available models"""
         logger.info(f"Scanning models in {self.model_dir}")
-        
-        # Default model mappings
-        default_models = {
-            "navajepa": {
-                "pth": self.model_dir / "navajepa_sota.pth",
-                "gguf": self.model_dir / "navajepa_sota.gguf",
-                "type": "vision-language"
-            },
-            "navajepa_v2": {
-                "pth": self.model_dir / "navaflow_v2_version1a_checkpoint.pt",
-                "gguf": self.model_dir / "navaflow_v2_version1a.gguf",
-                "type": "vision-language"
-            },
-            "llama3": {
-                "gguf": None,  # Ollama will handle this
-                "type": "text"
-            }
-        }
-        
-        # Check which models actually exist
-        for model_id, config in default_models.items():
-            pth_path = config.get("pth")
-            gguf_path = config.get("gguf")
-            
-            available_formats = []
-            if pth_path and pth_path.exists():
-                available_formats.append("pth")
-            if gguf_path and gguf_path.exists():
-                available_formats.append("gguf")
-            if model_id == "llama3":
-                available_formats.append("ollama")  # Ollama can pull it
-            
-            if available_formats:
-                self.models[model_id] = {
-                    **config,
-                    "available_formats": available_formats,
-                    "preferred_format": available_formats[0]  # Prefer GGUF for Ollama
-                }
-                logger.info(f"✅ Found model: {model_id} (formats: {available_formats})")
+        self.registry = ModelRegistry(model_dir, poll_interval=MODEL_POLL_INTERVAL)
+        for model_id, config in self.models.items():
+            logger.info(f"✅ Found model: {model_id} (formats: {config['available_formats']})")
+    
+    @property
+    def models(self) -> Dict[str, Dict[str, Any]]:
+        return self.registry.models
     
     def get_model_path(self, model_id: str, format: Optional[str] = None) -> Optional[Path]:
         """Get path to model file"""
@@ -146,32 +246,234 @@ class ModelManager:
 # Initialize Model Manager
 model_manager = ModelManager(MODEL_DIR)
 
+# --- TELEMETRY ---
+# Per-model generation histograms, scraped from GET /metrics (Prometheus)
+
+metrics_registry = MetricsRegistry()
+
+GENERATE_REQUESTS = metrics_registry.counter(
+    "navaflow_generate_requests_total", "Generation requests by outcome", ["model", "status"])
+GENERATE_TOKENS = metrics_registry.counter(
+    "navaflow_generate_tokens_total", "Tokens processed as reported by Ollama", ["model", "kind"])
+QUEUE_TIME = metrics_registry.histogram(
+    "navaflow_generate_queue_seconds", "Time spent in the gateway model scheduler queue", ["model"])
+TTFT = metrics_registry.histogram(
+    "navaflow_generate_ttft_seconds", "Time to first token, measured from gateway receipt", ["model"])
+INTER_TOKEN = metrics_registry.histogram(
+    "navaflow_generate_inter_token_seconds", "Latency between streamed tokens", ["model"])
+PROMPT_RATE = metrics_registry.histogram(
+    "navaflow_generate_prompt_tokens_per_second", "Prompt evaluation throughput", ["model"], RATE_BUCKETS)
+EVAL_RATE = metrics_registry.histogram(
+    "navaflow_generate_eval_tokens_per_second", "Generation (eval) throughput", ["model"], RATE_BUCKETS)
+GENERATE_DURATION = metrics_registry.histogram(
+    "navaflow_generate_duration_seconds", "End-to-end generation time", ["model"])
+PROMPT_ESTIMATE_RATIO = metrics_registry.histogram(
+    "navaflow_prompt_estimate_ratio", "Prompt tokens reported by Ollama over the gateway estimate", ["model"],
+    (0.5, 0.67, 0.8, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0))
+PROMPT_OVERFLOWS = metrics_registry.counter(
+    "navaflow_prompt_overflows_total", "Prompts over the context budget by action (rejected, truncated)", ["model", "action"])
+PROMPT_TRUNCATED_TOKENS = metrics_registry.counter(
+    "navaflow_prompt_truncated_tokens_total", "Estimated prompt tokens cut by the gateway", ["model"])
+HEDGE_REQUESTS = metrics_registry.counter(
+    "navaflow_generate_hedges_total", "Hedged duplicate generations (sent, won)", ["model", "result"])
+
+
+class GenerationObserver:
+    """
+    Timing for one generation.
+
+    Streams are observed chunk by chunk without parsing: Ollama flushes one
+    NDJSON line per token, so the first chunk gives TTFT and newlines give
+    token boundaries. Only the final line, which carries Ollama's
+    eval_count/eval_duration stats, is decoded. For non-streaming requests
+    TTFT is estimated as end-to-end time minus Ollama's eval_duration.
+    """
+    
+    def __init__(self, model: str, started: float):
+        self.model = model
+        self.started = started
+        self.last_token_at: Optional[float] = None
+        # Called with Ollama's final response object once the generation completes
+        self.on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+        # Gateway estimate of the prompt tokens, compared with Ollama's count
+        self.prompt_estimate: Optional[int] = None
+        self._tail = b""
+        self._finished = False
+    
+    def on_chunk(self, chunk: bytes):
+        now = time.perf_counter()
+        tokens = chunk.count(b"\n")
+        if self.last_token_at is None:
+            TTFT.observe(now - self.started, model=self.model)
+        elif tokens:
+            INTER_TOKEN.observe((now - self.last_token_at) / tokens, model=self.model)
+        self.last_token_at = now
+        
+        # Keep only the last (possibly partial) NDJSON line
+        buf = self._tail + chunk
+        cut = buf.rfind(b"\n", 0, len(buf) - 1)
+        self._tail = buf[cut + 1:] if cut >= 0 else buf
+    
+    def finish_stream(self):
+        try:
+            final = json.loads(self._tail)
+        except ValueError:
+            final = {}
+        self.finish(final if final.get("done") else None)
+    
+    def finish(self, result: Optional[Dict[str, Any]], status: Optional[str] = None):
+        """Record Ollama's final stats; a None result means the request did not complete"""
+        if self._finished:
+            return
+        self._finished = True
+        elapsed = time.perf_counter() - self.started
+        if result is None:
+            GENERATE_REQUESTS.inc(model=self.model, status=status or "cancelled")
+            return
+        
+        GENERATE_REQUESTS.inc(model=self.model, status="ok")
+        GENERATE_DURATION.observe(elapsed, model=self.model)
+        if self.on_result is not None:
+            self.on_result(result)
+        prompt_count, prompt_ns = result.get("prompt_eval_count", 0), result.get("prompt_eval_duration", 0)
+        eval_count, eval_ns = result.get("eval_count", 0), result.get("eval_duration", 0)
+        if self.prompt_estimate and prompt_count:
+            PROMPT_ESTIMATE_RATIO.observe(prompt_count / self.prompt_estimate, model=self.model)
+            prompt_estimator.record(self.model, self.prompt_estimate, prompt_count)
+        GENERATE_TOKENS.inc(prompt_count, model=self.model, kind="prompt")
+        GENERATE_TOKENS.inc(eval_count, model=self.model, kind="eval")
+        if prompt_count and prompt_ns:
+            PROMPT_RATE.observe(prompt_count / (prompt_ns / 1e9), model=self.model)
+        if eval_count and eval_ns:
+            EVAL_RATE.observe(eval_count / (eval_ns / 1e9), model=self.model)
+        if self.last_token_at is None:
+            TTFT.observe(max(0.0, elapsed - eval_ns / 1e9), model=self.model)
+
+prompt_estimator = TokenEstimator()
+
 # --- OLLAMA EXECUTOR ---
 
 class OllamaExecutor:
-    """Handles Ollama model execution"""
+    """
+    Handles Ollama model execution across a pool of backends.
+
+    Each backend has one shared `httpx.AsyncClient`, so the event loop is
+    never blocked and keep-alive connections are reused. `max_connections`
+    bounds concurrent connections per backend; requests beyond it wait for a
+    free connection instead of failing.
+
+    Requests go to the backend with the fewest outstanding requests,
+    preferring backends that already have the model loaded. Backend health is
+    tracked by per-backend circuit breakers fed by background probes and by
+    request outcomes; when every circuit is open requests fail fast with 503.
+    A request that cannot connect never reached Ollama, so it is retried on
+    another backend.
+    Without httpx, generations run on a pool of persistent worker processes
+    instead (see runner_pool.py).
+
+    Before reaching a backend, requests pass the model-affinity scheduler,
+    which keeps the number of distinct models in flight within
+    OLLAMA_MAX_LOADED_MODELS so Ollama is not forced to swap weights.
+
+    Requests with a `session_id` resume the conversation from the context
+    Ollama returned for the previous turn and prefer the backend that served
+    it, whose KV cache still holds the evaluated prefix.
+
+    With client limits enabled, requests carrying a ClientTicket first wait
+    in the weighted fair queue (see client_limits.py), ahead of the model
+    scheduler.
+
+    With hedging enabled, a short non-streaming generation that has not
+    answered within the p95 delay is duplicated on a second backend; the
+    first response wins (see hedging.py).
+    """
     
-    def __init__(self, host: str = OLLAMA_HOST):
-        self.host = host
-        self.available = self._check_ollama_available()
+    def __init__(self, hosts: List[str] = OLLAMA_HOSTS, max_connections: int = OLLAMA_MAX_CONNECTIONS):
+        self.hosts = hosts
+        self.max_connections = max_connections
+        self.pool = BackendPool([
+            OllamaBackend(
+                host,
+                max_connections=max_connections,
+                keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+                request_timeout=OLLAMA_REQUEST_TIMEOUT,
+                health_interval=OLLAMA_HEALTH_INTERVAL,
+                health_timeout=OLLAMA_HEALTH_TIMEOUT,
+                breaker_failures=OLLAMA_BREAKER_FAILURES,
+                breaker_reset=OLLAMA_BREAKER_RESET
+            )
+            for host in hosts
+        ], affinity_slack=OLLAMA_AFFINITY_SLACK)
+        self.scheduler = ModelAffinityScheduler(
+            max_loaded_models=OLLAMA_MAX_LOADED_MODELS,
+            fairness_window_s=OLLAMA_FAIRNESS_WINDOW
+        )
+        # Ollama model name -> keep_alive sent with every request for it
+        self.pinned: Dict[str, Any] = {}
+        self._digests: Dict[str, str] = {}
+        self._digests_at = 0.0
+        self._digests_lock = asyncio.Lock()
+        # Ollama model name -> (context length or None, fetched at)
+        self._context_lengths: Dict[str, Tuple[Optional[int], float]] = {}
+        self.runners = None
+        if httpx is None:
+            self.runners = RunnerPool(
+                size=OLLAMA_RUNNER_WORKERS,
+                max_requests=OLLAMA_RUNNER_MAX_REQUESTS,
+                request_timeout=OLLAMA_REQUEST_TIMEOUT
+            )
+        self.sessions = SessionStore(
+            max_sessions=SESSION_MAX_SESSIONS,
+            ttl_s=SESSION_TTL,
+            max_memory_bytes=int(SESSION_MAX_MEMORY_MB * 1024 * 1024),
+            max_context_tokens=SESSION_MAX_CONTEXT_TOKENS
+        )
+        self.hedger = None
+        if OLLAMA_HEDGE_ENABLED:
+            self.hedger = HedgePolicy(
+                budget_ratio=OLLAMA_HEDGE_BUDGET,
+                percentile=OLLAMA_HEDGE_PERCENTILE,
+                min_samples=OLLAMA_HEDGE_MIN_SAMPLES,
+                min_delay_s=OLLAMA_HEDGE_MIN_DELAY
+            )
+        self.client_queue = None
+        if CLIENT_LIMITS_ENABLED:
+            self.client_queue = WeightedFairQueue(concurrency=CLIENT_QUEUE_CONCURRENCY * len(hosts))
     
-    def _check_ollama_available(self) -> bool:
-        """Check if Ollama is available"""
-        try:
-            import requests
-            response = requests.get(f"{self.host}/api/tags", timeout=2)
-            return response.status_code == 200
-        except:
-            # Try command line check
-            try:
-                result = subprocess.run(
-                    ["ollama", "list"],
-                    capture_output=True,
-                    timeout=2
-                )
-                return result.returncode == 0
-            except:
-                return False
+    @property
+    def available(self) -> bool:
+        """False while every backend circuit is open"""
+        return self.pool.available
+    
+    def unavailable_error(self) -> HTTPException:
+        """Fast-fail response while all backends are down"""
+        self.pool.rejected += 1
+        return HTTPException(
+            status_code=503,
+            detail="Ollama is not available. Please ensure Ollama is running.",
+            headers={"Retry-After": str(max(1, math.ceil(self.pool.retry_after)))}
+        )
+    
+    async def start(self):
+        """Start background health probing (and the runner pool without httpx)"""
+        await self.pool.start()
+        if self.runners is not None:
+            await self.runners.start()
+    
+    async def aclose(self):
+        """Stop probing and close pooled connections"""
+        await self.pool.aclose()
+        if self.runners is not None:
+            await self.runners.aclose()
+    
+    def _resolve_model_name(self, model_id: str) -> str:
+        """Map a NavaFlow model id to the Ollama model name"""
+        # For local GGUF files, we need to create a Modelfile
+        if model_manager.get_model_path(model_id, "gguf") is not None:
+            # In production, you'd register the GGUF file with Ollama
+            return f"{model_id}_local"
+        # Use standard Ollama model name
+        return model_id
     
     async def generate(
         self,
@@ -179,37 +481,41 @@ class OllamaExecutor:
         prompt: str,
         stream: bool = False,
         max_tokens: int = 2048,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        session_id: Optional[str] = None,
+        client: Optional[ClientTicket] = None,
+        prompt_estimate: Optional[int] = None
     ) -> Dict[str, Any]:
         """Generate text using Ollama"""
-        if not self.available:
-            raise HTTPException(
-                status_code=503,
-                detail="Ollama is not available. Please ensure Ollama is running."
-            )
+        if not self.pool.available:
+            raise self.unavailable_error()
+        
+        model = self._resolve_model_name(model_id)
+        observer = GenerationObserver(model, time.perf_counter())
+        observer.prompt_estimate = prompt_estimate
         
-        # Check if model needs to be pulled
-        model_path = model_manager.get_model_path(model_id, "gguf")
+        def release_slots():
+            self.scheduler.release(model)
+            if client is not None:
+                self.client_queue.release(client)
         
-        # Use Ollama API if available
+        if client is not None:
+            CLIENT_QUEUE_TIME.observe(await self.client_queue.acquire(client), client=client.label)
         try:
-            import requests
-            
-            # For local GGUF files, we need to create a Modelfile
-            if model_path and model_path.exists() and model_path.suffix == ".gguf":
-                # Create a custom model name for this file
-                custom_model_name = f"{model_id}_local"
-                
-                # Pull or use the model
-                # In production, you'd register the GGUF file with Ollama
-                ollama_model = custom_model_name
-            else:
-                # Use standard Ollama model name
-                ollama_model = model_id
+            QUEUE_TIME.observe(await self.scheduler.acquire(model), model=model)
+        except asyncio.CancelledError:
+            if client is not None:
+                self.client_queue.release(client)
+            raise
+        stream_owns_slot = False
+        try:
+            session = self.sessions.get(session_id, model) if session_id else None
+            backend = self.pool.pick(model, prefer=session.host if session else None)
+            if backend is None:
+                raise self.unavailable_error()
             
-            # Make request to Ollama API
             payload = {
-                "model": ollama_model,
+                "model": model,
                 "prompt": prompt,
                 "stream": stream,
                 "options": {
@@ -217,71 +523,1127 @@ class OllamaExecutor:
                     "temperature": temperature
                 }
             }
+            if model in self.pinned:
+                # Requests without keep_alive would reset the pin to Ollama's default
+                payload["keep_alive"] = self.pinned[model]
+            # The stored session is updated in place when this turn completes
+            resumed_tokens = len(session.context) if session is not None else 0
+            if session is not None:
+                payload["context"] = session.context.tolist()
+            # Sessions stay on the backend holding their KV cache
+            hedge = (self.hedger is not None and not stream and not session_id
+                     and max_tokens <= OLLAMA_HEDGE_MAX_TOKENS and len(self.pool.backends) > 1)
             
-            response = requests.post(
-                f"{self.host}/api/generate",
-                json=payload,
-                stream=stream,
-                timeout=300
-            )
+            tried = set()
+            while True:
+                tried.add(backend.host)
+                if session_id:
+                    observer.on_result = lambda final, host=backend.host: self._save_session(session_id, model, host, final)
+                try:
+                    if backend.client is None:
+                        # No httpx: run on the persistent worker processes
+                        result = await self._generate_runner(
+                            backend, model_id, payload, observer,
+                            on_stream_close=release_slots
+                        )
+                    elif hedge:
+                        result = await self._generate_hedged(backend, model_id, payload, observer, tried)
+                    else:
+                        result = await self._generate_on(
+                            backend, model_id, payload, observer,
+                            on_stream_close=release_slots
+                        )
+                    stream_owns_slot = "stream" in result
+                    if session_id:
+                        result["session"] = {
+                            "id": session_id,
+                            "resumed": session is not None,
+                            "context_tokens": resumed_tokens
+                        }
+                    return result
+                except _CONNECT_ERRORS as e:
+                    backend.breaker.record_failure()
+                    backend = self.pool.pick(model, exclude=tried)
+                    if backend is None:
+                        raise HTTPException(status_code=503, detail=f"Ollama unreachable: {str(e)}")
+                    self.pool.retries += 1
+                    logger.warning(f"Retrying generation on {backend.host}: {e}")
+        except HTTPException as e:
+            observer.finish(None, status=str(e.status_code))
+            raise
+        except asyncio.CancelledError:
+            observer.finish(None)
+            raise
+        finally:
+            if not stream_owns_slot:
+                release_slots()
+    
+    async def _generate_on(
+        self,
+        backend: OllamaBackend,
+        model_id: str,
+        payload: Dict[str, Any],
+        observer: GenerationObserver,
+        on_stream_close: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
+        """Run one generation on `backend`; connect errors propagate for retry"""
+        backend.acquire()
+        released = False
+        try:
+            if payload["stream"]:
+                request = backend.client.build_request("POST", "/api/generate", json=payload)
+                response = await backend.client.send(request, stream=True)
+                backend.record_status(response.status_code, payload["model"])
+                if response.status_code != 200:
+                    await response.aread()
+                    await response.aclose()
+                    raise HTTPException(status_code=response.status_code, detail=response.text)
+                
+                # The stream now owns the outstanding-request slot
+                released = True
+                
+                def on_close():
+                    observer.finish_stream()
+                    backend.release()
+                    if on_stream_close is not None:
+                        on_stream_close()
+                
+                close = self._stream_closer(response.aclose, on_close)
+                return {"stream": self._passthrough(response, close, observer), "close": close}
             
-            if stream:
-                # Return streaming response
-                def generate_stream():
-                    for line in response.iter_lines():
-                        if line:
-                            data = json.loads(line)
-                            yield json.dumps(data) + "\n"
-                return {"stream": generate_stream()}
-            else:
-                result = response.json()
-                return {
-                    "text": result.get("response", ""),
-                    "model": model_id,
-                    "status": "success"
-                }
+            response = await backend.client.post("/api/generate", json=payload)
+            backend.record_status(response.status_code, payload["model"])
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail=response.text)
+            result = response.json()
+            observer.finish(result)
+            return {
+                "text": result.get("response", ""),
+                "model": model_id,
+                "status": "success"
+            }
         
-        except ImportError:
-            # Fallback to subprocess
-            return await self._generate_subprocess(model_id, prompt, stream)
+        except (HTTPException, httpx.ConnectError):
+            raise
+        except httpx.TimeoutException as e:
+            backend.breaker.record_failure()
+            raise HTTPException(status_code=504, detail=f"Ollama timed out: {str(e)}")
         except Exception as e:
             logger.error(f"Ollama generation error: {e}")
             raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+        finally:
+            if not released:
+                backend.release()
     
-    async def _generate_subprocess(
+    async def _generate_hedged(
         self,
+        backend: OllamaBackend,
         model_id: str,
-        prompt: str,
-        stream: bool
+        payload: Dict[str, Any],
+        observer: GenerationObserver,
+        tried: set
     ) -> Dict[str, Any]:
-        """Fallback: Generate using subprocess"""
+        """
+        Non-streaming generation on `backend`, duplicated on a second backend
+        if it has not answered within the hedge delay. The first success wins
+        and the other request is cancelled.
+        """
+        model = payload["model"]
+        max_tokens = payload["options"]["num_predict"]
+        delay = self.hedger.delay(model, max_tokens)
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._generate_on(backend, model_id, payload, observer))
+        hedge = None
         try:
-            cmd = ["ollama", "run", model_id, prompt]
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                # Budget first: pick() can take a half-open breaker's only trial,
+                # which a hedge the budget then refused would never use.
+                # Only where the model is resident: the hedge holds no scheduler
+                # slot, and one that has to load the model first cannot win anyway
+                second = None
+                if self.hedger.try_spend():
+                    second = self.pool.pick(model, exclude=tried | {backend.host}, loaded_only=True)
+                    if second is None:
+                        self.hedger.refund()
+                if second is not None:
+                    tried.add(second.host)
+                    HEDGE_REQUESTS.inc(model=model, result="sent")
+                    hedge = asyncio.ensure_future(self._generate_on(second, model_id, payload, observer))
             
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Ollama execution failed: {stderr.decode()}"
-                )
+            pending = {primary} if hedge is None else {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedger.hedge_wins += 1
+                            HEDGE_REQUESTS.inc(model=model, result="won")
+                        self.hedger.record(model, max_tokens, time.perf_counter() - started)
+                        return task.result()
+                    if task is hedge and isinstance(task.exception(), _CONNECT_ERRORS):
+                        second.breaker.record_failure()
+            # Both failed: report the primary's error (connect errors are retried by the caller)
+            raise primary.exception()
+        finally:
+            # The loser's cancellation closes its connection, stopping it in Ollama
+            for task in (primary, hedge):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # Mark retrieved; the other result was used
+    
+    def _save_session(self, session_id: str, model: str, host: str, final: Dict[str, Any]):
+        context = final.get("context")
+        if context:
+            self.sessions.put(session_id, model, context, host)
+    
+    # --- MODEL RESIDENCY ---
+    
+    @staticmethod
+    def _keep_alive_value(keep_alive: str) -> Any:
+        """Ollama takes durations ('30m') as strings and seconds (-1, 0, 3600) as numbers"""
+        try:
+            return int(keep_alive)
+        except ValueError:
+            return keep_alive
+    
+    async def load_model(self, model_id: str, keep_alive: str = OLLAMA_PRELOAD_KEEP_ALIVE, warmup: bool = False) -> Dict[str, Any]:
+        """Load `model_id` on every available backend and pin it for `keep_alive`"""
+        model = self._resolve_model_name(model_id)
+        keep_alive_value = self._keep_alive_value(keep_alive)
+        payload: Dict[str, Any] = {"model": model, "keep_alive": keep_alive_value, "stream": False}
+        if warmup:
+            payload["prompt"] = OLLAMA_WARMUP_PROMPT
+            payload["options"] = {"num_predict": 1}
+        
+        results = await self._control_all(payload)
+        if any("error" not in r for r in results):
+            self.pinned[model] = keep_alive_value
+            self.scheduler.mark_resident(model)
+        logger.info(f"📌 Loaded {model} (keep_alive={keep_alive}, warmup={warmup})")
+        return {"model_id": model_id, "model": model, "keep_alive": keep_alive_value, "warmup": warmup, "backends": results}
+    
+    async def unload_model(self, model_id: str) -> Dict[str, Any]:
+        """Unload `model_id` from every available backend"""
+        model = self._resolve_model_name(model_id)
+        self.pinned.pop(model, None)
+        results = await self._control_all({"model": model, "keep_alive": 0, "stream": False})
+        self.scheduler.mark_evicted(model)
+        logger.info(f"Unloaded {model}")
+        return {"model_id": model_id, "model": model, "backends": results}
+    
+    async def _control_all(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        backends = [b for b in self.pool.backends if b.available and b.client is not None]
+        if not backends:
+            raise self.unavailable_error()
+        return list(await asyncio.gather(*(self._control(b, payload) for b in backends)))
+    
+    async def _control(self, backend: OllamaBackend, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a load/unload request (a generate call without a prompt) to one backend"""
+        start = time.perf_counter()
+        try:
+            response = await backend.client.post("/api/generate", json=payload)
+        except httpx.HTTPError as e:
+            backend.breaker.record_failure()
+            return {"host": backend.host, "error": f"{type(e).__name__}: {e}"}
+        backend.record_status(response.status_code)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            return {"host": backend.host, "error": response.text, "status_code": response.status_code}
+        
+        result = response.json()
+        if payload["keep_alive"] == 0:
+            backend.loaded_models.discard(payload["model"].split(":")[0])
+        else:
+            backend.loaded_models.add(payload["model"].split(":")[0])
+        return {
+            "host": backend.host,
+            "latency_ms": round(elapsed_ms, 2),
+            "load_duration_ms": round(result.get("load_duration", 0) / 1e6, 2)
+        }
+    
+    async def embed(self, model_id: str, inputs: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Embed `inputs` with an Ollama embedding model in one /api/embed call"""
+        if not self.pool.available:
+            raise self.unavailable_error()
+        model = self._resolve_model_name(model_id)
+        backend = self.pool.pick(model)
+        if backend is None or backend.client is None:
+            raise self.unavailable_error()
+        
+        backend.acquire()
+        try:
+            response = await backend.client.post(
+                "/api/embed",
+                json={"model": model, "input": inputs},
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+            )
+        except httpx.TimeoutException as e:
+            raise HTTPException(status_code=504, detail=f"Ollama embedding timed out: {str(e)}")
+        except httpx.HTTPError as e:
+            backend.breaker.record_failure()
+            raise HTTPException(status_code=502, detail=f"Ollama embedding failed: {str(e)}")
+        finally:
+            backend.release()
+        
+        backend.record_status(response.status_code, model)
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+        return response.json().get("embeddings", [])
+    
+    @staticmethod
+    def _full_tag(name: str) -> str:
+        """Ollama's canonical model name: no tag means ':latest' (a registry port is not a tag)"""
+        return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+    
+    async def model_digest(self, model_id: str) -> Optional[str]:
+        """Content digest of the model as reported by Ollama's /api/tags (cached)"""
+        model = self._full_tag(self._resolve_model_name(model_id))
+        if time.monotonic() - self._digests_at > OLLAMA_DIGEST_TTL or model not in self._digests:
+            async with self._digests_lock:
+                if time.monotonic() - self._digests_at > OLLAMA_DIGEST_TTL or model not in self._digests:
+                    await self._refresh_digests()
+        return self._digests.get(model)
+    
+    async def model_context_length(self, model_id: str) -> Optional[int]:
+        """Context length from Ollama's /api/show (num_ctx if the Modelfile sets one); cached"""
+        model = self._resolve_model_name(model_id)
+        cached = self._context_lengths.get(model)
+        if cached is not None and time.monotonic() - cached[1] < OLLAMA_DIGEST_TTL:
+            return cached[0]
+        
+        for backend in self.pool.backends:
+            if not backend.available or backend.client is None:
+                continue
+            try:
+                response = await backend.client.post("/api/show", json={"model": model}, timeout=OLLAMA_HEALTH_TIMEOUT)
+            except httpx.HTTPError:
+                continue
+            context_length = None
+            if response.status_code == 200:
+                show = response.json()
+                for key, value in (show.get("model_info") or {}).items():
+                    if key.endswith(".context_length"):
+                        context_length = int(value)
+                for line in (show.get("parameters") or "").splitlines():
+                    name, _, value = line.partition(" ")
+                    if name == "num_ctx" and value.strip().isdigit():
+                        context_length = int(value.strip())
+            self._context_lengths[model] = (context_length, time.monotonic())
+            return context_length
+        return None
+    
+    async def _refresh_digests(self):
+        for backend in self.pool.backends:
+            if not backend.available or backend.client is None:
+                continue
+            try:
+                response = await backend.client.get("/api/tags", timeout=OLLAMA_HEALTH_TIMEOUT)
+                if response.status_code != 200:
+                    continue
+                self._digests = {
+                    self._full_tag(m["name"]): m["digest"]
+                    for m in response.json().get("models", []) if m.get("name") and m.get("digest")
+                }
+                self._digests_at = time.monotonic()
+                return
+            except httpx.HTTPError:
+                continue
+    
+    async def preload(self, models: List[str]):
+        """Load the startup model list; failures are logged, not fatal"""
+        for model_id in models:
+            try:
+                await self.load_model(model_id, OLLAMA_PRELOAD_KEEP_ALIVE, warmup=OLLAMA_PRELOAD_WARMUP)
+            except HTTPException as e:
+                logger.warning(f"⚠️  Could not preload {model_id}: {e.detail}")
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.pool.stats(),
+            "scheduler": self.scheduler.stats(),
+            "pinned": self.pinned,
+            "sessions": self.sessions.stats(),
+            "runners": self.runners.stats() if self.runners is not None else None,
+            "hedging": self.hedger.stats() if self.hedger is not None else {"enabled": False},
+        }
+    
+    @staticmethod
+    def _stream_closer(aclose: Callable[[], Awaitable[None]], on_close: Callable[[], None]) -> Callable[[], Awaitable[None]]:
+        """
+        Idempotent cleanup for a streaming result.
+
+        Called from the stream generator's `finally` and again by the
+        `ClosingStreamingResponse` that sends it, because a generator the
+        client never started reading has no `finally` to run.
+        """
+        closed = False
+        
+        async def close():
+            nonlocal closed
+            if closed:
+                return
+            closed = True
+            try:
+                await aclose()
+            finally:
+                on_close()
+        
+        return close
+    
+    @staticmethod
+    async def _passthrough(response, close: Callable[[], Awaitable[None]], observer: GenerationObserver) -> AsyncIterator[bytes]:
+        """
+        Forward upstream NDJSON chunks byte-for-byte.
+
+        Each chunk is only pulled from Ollama after the previous one has been
+        sent to the client, so a slow reader applies backpressure all the way
+        upstream. If the client goes away Starlette cancels this generator and
+        closing the unread response drops the backend connection, which stops
+        the generation in Ollama.
+        """
+        try:
+            async for chunk in response.aiter_raw():
+                observer.on_chunk(chunk)
+                yield chunk
+        finally:
+            await close()
+    
+    async def _generate_runner(
+        self,
+        backend: OllamaBackend,
+        model_id: str,
+        payload: Dict[str, Any],
+        observer: GenerationObserver,
+        on_stream_close: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
+        """Run one generation on the runner pool (used when httpx is unavailable)"""
+        backend.acquire()
+        lines = self.runners.generate({**payload, "host": backend.host})
+        released = False
+        try:
+            if payload["stream"]:
+                # Pull the first line so upstream errors still become HTTP errors
+                first = await lines.__anext__()
+                backend.record_status(200, payload["model"])
+                released = True
+                
+                def on_close():
+                    observer.finish_stream()
+                    backend.release()
+                    if on_stream_close is not None:
+                        on_stream_close()
+                
+                # Closing `lines` hands the checked-out worker back (or replaces it)
+                close = self._stream_closer(lines.aclose, on_close)
+                
+                async def stream():
+                    try:
+                        observer.on_chunk(first)
+                        yield first
+                        async for line in lines:
+                            observer.on_chunk(line)
+                            yield line
+                    finally:
+                        await close()
+                
+                return {"stream": stream(), "close": close}
             
+            text = []
+            final: Dict[str, Any] = {}
+            async for line in lines:
+                item = json.loads(line)
+                text.append(item.get("response", ""))
+                if item.get("done"):
+                    final = item
+            backend.record_status(200, payload["model"])
+            observer.finish(final)
             return {
-                "text": stdout.decode().strip(),
+                "text": "".join(text),
                 "model": model_id,
                 "status": "success"
             }
+        except StopAsyncIteration:
+            raise HTTPException(status_code=502, detail="Runner returned no output")
+        except RunnerError as e:
+            backend.record_status(e.status_code)
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        finally:
+            if not released:
+                await lines.aclose()
+                backend.release()
+
+async def run_until_disconnected(request: Request, coro, poll_interval: float = 0.1):
+    """
+    Run `coro` but cancel it as soon as the HTTP client goes away.
+
+    Cancelling the task aborts the in-flight httpx request, which closes the
+    backend connection and makes Ollama stop generating.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                logger.info("Client disconnected; cancelled upstream generation")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = OLLAMA_BATCH_MAX_LINE_BYTES) -> AsyncIterator[bytes]:
+    """Split a byte stream into non-empty lines without buffering more than one line"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buffer) > max_line_bytes:
+            raise HTTPException(status_code=413, detail=f"NDJSON line exceeds {max_line_bytes} bytes")
+    if buffer.strip():
+        yield buffer
+
+async def run_generation_batch(
+    lines: AsyncIterator[bytes],
+    concurrency: int,
+    wait_for_disconnect: Optional[Callable[[], Awaitable[None]]] = None,
+    api_key: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """
+    Fan NDJSON generation requests out with at most `concurrency` in flight
+    and yield one NDJSON result line per request as soon as it completes.
+
+    Input is only read when a slot is free and each task holds its slot until
+    its result has been handed to the consumer, so memory stays bounded by
+    `concurrency` regardless of input size or a slow reader. In-flight
+    generations are cancelled if the client disconnects. With client limits,
+    lines are paced to the `api_key`'s budgets rather than rejected.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    tasks = set()
+    
+    async def run_one(index: int, line: bytes):
+        item_id: Any = index
+        try:
+            item = json.loads(line)
+            item_id = item.get("id", index)
+            request = GenerationRequest(**{k: v for k, v in item.items() if k not in ("id", "stream")})
+            if not model_manager.is_available(request.model_id):
+                raise HTTPException(status_code=404, detail=f"Model '{request.model_id}' not found")
+            prompt_estimate, prompt_headers = await fit_prompt(request)
+            ticket = await admit_client_paced(api_key, prompt_estimate + request.max_tokens)
+            result, cache_headers = await generate_cached(
+                request, route="/v1/generate/batch", client=ticket, prompt_estimate=prompt_estimate
+            )
+            out = {"id": item_id, "status": "success", "text": result["text"], "model": request.model_id}
+            if "X-Prompt-Truncated-Tokens" in prompt_headers:
+                out["prompt_truncated_tokens"] = int(prompt_headers["X-Prompt-Truncated-Tokens"])
+            if cache_headers:
+                out["cache"] = cache_headers["X-Cache"]
+            if "semantic_cache" in result:
+                out["semantic_cache"] = result["semantic_cache"]
+        except HTTPException as e:
+            out = {"id": item_id, "status": "error", "status_code": e.status_code, "error": e.detail}
+        except (ValueError, TypeError, AttributeError) as e:
+            out = {"id": item_id, "status": "error", "status_code": 400, "error": str(e)}
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Subprocess error: {str(e)}")
+            # One bad item must not fail the gather and lose the whole batch
+            logger.error(f"Batch item {item_id} failed: {e}")
+            out = {"id": item_id, "status": "error", "status_code": 500, "error": f"Generation failed: {str(e)}"}
+        try:
+            await results.put(json.dumps(out).encode("utf-8") + b"\n")
+        finally:
+            slots.release()
+    
+    async def produce():
+        try:
+            try:
+                index = 0
+                async for line in lines:
+                    await slots.acquire()
+                    task = asyncio.create_task(run_one(index, line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    index += 1
+                if tasks:
+                    await asyncio.gather(*tasks)
+            except ClientDisconnect:
+                logger.info("Client disconnected while sending batch; cancelling")
+                for task in list(tasks):
+                    task.cancel()
+            except HTTPException as e:
+                await results.put(json.dumps({"status": "error", "status_code": e.status_code, "error": e.detail}).encode("utf-8") + b"\n")
+            await results.put(None)
+        except asyncio.CancelledError:
+            # Nobody wants the undelivered results any more. Drop them so the
+            # end marker fits without waiting on a reader that may be gone.
+            while not results.empty():
+                results.get_nowait()
+            results.put_nowait(None)
+            raise
+    
+    producer = asyncio.create_task(produce())
+    
+    def on_disconnect(watcher: asyncio.Future):
+        if not watcher.cancelled():
+            logger.info("Client disconnected; cancelling batch")
+            producer.cancel()
+            for task in list(tasks):
+                task.cancel()
+    
+    watcher = None
+    if wait_for_disconnect is not None:
+        watcher = asyncio.ensure_future(wait_for_disconnect())
+        watcher.add_done_callback(on_disconnect)
+    try:
+        while True:
+            line = await results.get()
+            if line is None:
+                break
+            yield line
+    finally:
+        # Client went away (or we finished): stop reading input and cancel in-flight generations
+        if watcher is not None:
+            watcher.cancel()
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always runs the stream's `close`.
+
+    Starlette may never start the body generator if the client is gone before
+    the first chunk (and skips background tasks when sending fails), so the
+    generator's own `finally` cannot be what gives back the backend
+    connection and the scheduler and fair-queue slots.
+    """
+    
+    def __init__(self, content, close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.close = close
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.close()
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves `receive` to the endpoint.
+
+    The stock response consumes `receive` to watch for disconnects, which
+    would swallow the request body that the endpoint is still streaming in.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
 
 # Initialize Ollama Executor
 ollama_executor = OllamaExecutor()
 
+# Backend and scheduler state, computed at scrape time
+_backends = ollama_executor.pool.backends
+metrics_registry.gauge(
+    "navaflow_backend_up", "1 unless the backend circuit is open", ["host"],
+    collect=lambda: [((b.host,), int(b.available)) for b in _backends])
+metrics_registry.gauge(
+    "navaflow_backend_outstanding_requests", "Requests in flight per backend", ["host"],
+    collect=lambda: [((b.host,), b.outstanding) for b in _backends])
+metrics_registry.gauge(
+    "navaflow_backend_probe_latency_seconds", "Latency of the last health probe", ["host"],
+    collect=lambda: [((b.host,), b.prober.last_latency_ms / 1000 if b.prober and b.prober.last_latency_ms is not None else None)
+                     for b in _backends])
+metrics_registry.counter(
+    "navaflow_backend_circuit_opens_total", "Times the backend circuit opened", ["host"],
+    collect=lambda: [((b.host,), b.breaker.times_opened) for b in _backends])
+metrics_registry.counter(
+    "navaflow_model_loads_total", "Models loaded as seen by the gateway scheduler",
+    collect=lambda: [((), ollama_executor.scheduler.loads)])
+metrics_registry.counter(
+    "navaflow_model_swaps_total", "Model loads that evicted another resident model",
+    collect=lambda: [((), ollama_executor.scheduler.swaps)])
+metrics_registry.gauge(
+    "navaflow_sessions", "Conversation sessions held by the gateway",
+    collect=lambda: [((), len(ollama_executor.sessions))])
+metrics_registry.gauge(
+    "navaflow_session_memory_bytes", "Memory used by stored session contexts",
+    collect=lambda: [((), ollama_executor.sessions.memory_bytes)])
+metrics_registry.counter(
+    "navaflow_session_reused_tokens_total", "Conversation tokens resumed from stored session contexts",
+    collect=lambda: [((), ollama_executor.sessions.reused_tokens)])
+
+# --- CLIENT LIMITS ---
+# Budgets are charged when a request arrives; generations that miss the
+# caches then take their turn in the fair queue inside the executor.
+
+client_limiter = None
+if CLIENT_LIMITS_ENABLED:
+    _default_policy = ClientPolicy(
+        "default",
+        weight=CLIENT_DEFAULT_WEIGHT,
+        requests_per_minute=CLIENT_DEFAULT_RPM,
+        tokens_per_minute=CLIENT_DEFAULT_TPM,
+        max_queued=CLIENT_MAX_QUEUED
+    )
+    client_limiter = ClientLimiter(
+        ollama_executor.client_queue,
+        policies=load_client_policies(Path(CLIENT_LIMITS_FILE), _default_policy) if CLIENT_LIMITS_FILE else {},
+        default=_default_policy
+    )
+    logger.info(f"✅ Client limits enabled ({len(client_limiter.policies)} configured clients, "
+                f"{ollama_executor.client_queue.concurrency} fair-queue slots)")
+
+CLIENT_REQUESTS = metrics_registry.counter(
+    "navaflow_client_requests_total", "Requests by client and admission result", ["client", "result"])
+CLIENT_TOKENS = metrics_registry.counter(
+    "navaflow_client_estimated_tokens_total", "Estimated tokens charged to client budgets", ["client"])
+CLIENT_QUEUE_TIME = metrics_registry.histogram(
+    "navaflow_client_queue_seconds", "Time spent in the per-client fair queue", ["client"])
+metrics_registry.gauge(
+    "navaflow_client_queue_waiting", "Requests waiting in the per-client fair queue",
+    collect=lambda: [((), ollama_executor.client_queue.stats()["waiting"])] if ollama_executor.client_queue else [])
+
+def rate_limited_error(e: RateLimited) -> HTTPException:
+    """429 with Retry-After and, when the request would have queued, its position"""
+    headers = {"Retry-After": str(max(1, math.ceil(e.retry_after_s)))}
+    if e.queue_position:
+        headers["X-Queue-Position"] = str(e.queue_position)
+    return HTTPException(
+        status_code=429,
+        detail={
+            "error": str(e),
+            "reason": e.reason,
+            "retry_after_s": round(e.retry_after_s, 3),
+            "queue_position": e.queue_position
+        },
+        headers=headers
+    )
+
+def _admit(api_key: Optional[str], tokens: int, queued: bool) -> Optional[ClientTicket]:
+    if client_limiter is None:
+        return None
+    ticket = client_limiter.admit(api_key, tokens, queued)
+    CLIENT_REQUESTS.inc(client=ticket.label, result="admitted")
+    CLIENT_TOKENS.inc(ticket.cost, client=ticket.label)
+    return ticket
+
+def admit_client(http_request: Request, tokens: int, queued: bool = True) -> Optional[ClientTicket]:
+    """Charge a request to its X-API-Key's budgets; over budget raises 429"""
+    try:
+        return _admit(http_request.headers.get("X-API-Key"), tokens, queued)
+    except RateLimited as e:
+        CLIENT_REQUESTS.inc(client=e.label, result=f"rejected_{e.reason}")
+        raise rate_limited_error(e)
+
+async def admit_client_paced(api_key: Optional[str], tokens: int) -> Optional[ClientTicket]:
+    """For bulk work: wait until the budget allows the request instead of rejecting it"""
+    while True:
+        try:
+            return _admit(api_key, tokens, True)
+        except RateLimited as e:
+            CLIENT_REQUESTS.inc(client=e.label, result=f"paced_{e.reason}")
+            await asyncio.sleep(max(0.05, e.retry_after_s))
+
+# --- PROMPT BUDGET ---
+# Prompt tokens are estimated on arrival; prompts that cannot fit the model's
+# context are rejected or cut before they take a backend slot.
+
+async def model_context_length(model_id: str) -> Optional[int]:
+    """Context window: GGUF metadata, else Ollama's /api/show, capped by OLLAMA_CONTEXT_LENGTH"""
+    info = model_manager.get_model_info(model_id) or {}
+    gguf = (info.get("files", {}).get("gguf") or {}).get("gguf") or {}
+    length = gguf.get("context_length")
+    if length is None and ollama_executor.available:
+        length = await ollama_executor.model_context_length(model_id)
+    if OLLAMA_CONTEXT_LENGTH:
+        length = min(length, OLLAMA_CONTEXT_LENGTH) if length else OLLAMA_CONTEXT_LENGTH
+    return length
+
+async def fit_prompt(request: GenerationRequest) -> Tuple[int, Dict[str, str]]:
+    """
+    Estimate the prompt's tokens and enforce the context budget: the context
+    length minus the room reserved for the answer (max_tokens, at most a
+    quarter of the context) and minus the context a resumed session carries.
+    Over budget raises 413, or with truncation the middle of `request.prompt`
+    is cut in place; a session leaving less than a quarter of the budget for
+    the new prompt is reset instead. Returns the (final) estimate and headers
+    describing it.
+    """
+    model = ollama_executor._resolve_model_name(request.model_id)
+    estimated = prompt_estimator.estimate(request.prompt, model)
+    headers = {"X-Prompt-Tokens-Estimated": str(estimated)}
+    if PROMPT_OVERFLOW == "off":
+        return estimated, headers
+    length = await model_context_length(request.model_id)
+    if not length:
+        return estimated, headers
+    max_prompt_tokens = length - min(request.max_tokens, length // 4)
+    session = ollama_executor.sessions.peek(request.session_id, model) if request.session_id else None
+    session_tokens = len(session.context) if session is not None else 0
+    if estimated <= max_prompt_tokens - session_tokens:
+        return estimated, headers
+    
+    truncate = request.truncate if request.truncate is not None else PROMPT_OVERFLOW == "truncate"
+    if truncate and session_tokens and max_prompt_tokens - session_tokens < max_prompt_tokens // 4:
+        # The conversation so far fills the context; cutting the new turn to
+        # fit next to it would leave nothing worth answering
+        ollama_executor.sessions.delete(request.session_id)
+        PROMPT_OVERFLOWS.inc(model=model, action="session_reset")
+        logger.info(f"✂️  Reset session {request.session_id}: {session_tokens} context tokens left no room (context {length})")
+        headers["X-Session-Reset"] = "true"
+        session_tokens = 0
+        if estimated <= max_prompt_tokens:
+            return estimated, headers
+    
+    budget = max_prompt_tokens - session_tokens
+    if truncate:
+        try:
+            request.prompt, removed = truncate_middle(request.prompt, budget, prompt_estimator, model, PROMPT_HEAD_FRACTION)
+        except ValueError:
+            truncate = False  # Not even the truncation marker fits
+    if not truncate:
+        PROMPT_OVERFLOWS.inc(model=model, action="rejected")
+        error = PromptTooLong(estimated, max(0, budget), length, session_tokens)
+        raise HTTPException(status_code=413, detail={
+            "error": str(error),
+            "estimated_tokens": error.estimated_tokens,
+            "max_prompt_tokens": error.max_prompt_tokens,
+            "context_length": error.context_length,
+            "session_context_tokens": error.session_tokens
+        })
+    PROMPT_OVERFLOWS.inc(model=model, action="truncated")
+    PROMPT_TRUNCATED_TOKENS.inc(removed, model=model)
+    estimated = prompt_estimator.estimate(request.prompt, model)
+    logger.info(f"✂️  Truncated prompt for {model}: ~{removed} tokens cut, ~{estimated} kept (context {length})")
+    headers.update({"X-Prompt-Tokens-Estimated": str(estimated), "X-Prompt-Truncated-Tokens": str(removed)})
+    return estimated, headers
+
+# --- RESPONSE CACHE ---
+# temperature=0 generations are deterministic for a given model digest,
+# prompt and options, so repeats are served from cache. The opt-in semantic
+# cache also answers near-duplicate prompts (embedding similarity).
+
+response_cache = None
+if RESPONSE_CACHE_ENABLED:
+    response_cache = ResponseCache(
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_s=RESPONSE_CACHE_TTL,
+        disk_path=Path(RESPONSE_CACHE_DB) if RESPONSE_CACHE_DB else None
+    )
+    logger.info(f"✅ Response cache enabled (disk tier: {RESPONSE_CACHE_DB or 'off'})")
+
+CACHE_REQUESTS = metrics_registry.counter(
+    "navaflow_response_cache_requests_total", "Response cache lookups by result", ["model", "result"])
+
+SEMANTIC_LOOKUP_TIME = metrics_registry.histogram(
+    "navaflow_semantic_cache_lookup_seconds", "Semantic cache lookup time by stage (embed, search)", ["stage"])
+
+semantic_cache = None
+if SEMANTIC_CACHE_ENABLED:
+    semantic_cache = SemanticCache(
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_s=SEMANTIC_CACHE_TTL,
+        default_threshold=SEMANTIC_CACHE_THRESHOLD,
+        route_thresholds=SEMANTIC_CACHE_ROUTE_THRESHOLDS
+    )
+    logger.info(f"✅ Semantic cache enabled (embeddings: {SEMANTIC_CACHE_EMBED_MODEL}, threshold: {SEMANTIC_CACHE_THRESHOLD})")
+
+# Identical misses in flight share one generation
+_cache_inflight: Dict[str, asyncio.Future] = {}
+
+async def _generate_once(key: str, generate: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+    """Run `generate` unless an identical request is already running; returns (result, led)"""
+    inflight = _cache_inflight.get(key)
+    if inflight is not None:
+        try:
+            return await asyncio.shield(inflight), False
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            # The leading request's client went away; generate ourselves
+            return await generate(), False
+    
+    future = asyncio.get_running_loop().create_future()
+    _cache_inflight[key] = future
+    try:
+        result = await generate()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved: there may be no followers
+        raise
+    finally:
+        _cache_inflight.pop(key, None)
+    future.set_result(result)
+    return result, True
+
+async def _embed_for_cache(prompt: str) -> Optional[List[float]]:
+    """Prompt embedding for the semantic cache; None (treated as a miss) on failure"""
+    start = time.perf_counter()
+    try:
+        embeddings = await ollama_executor.embed(SEMANTIC_CACHE_EMBED_MODEL, [prompt], timeout=SEMANTIC_CACHE_EMBED_TIMEOUT)
+    except HTTPException as e:
+        logger.warning(f"Semantic cache embedding failed ({e.status_code}): {e.detail}")
+        return None
+    SEMANTIC_LOOKUP_TIME.observe(time.perf_counter() - start, stage="embed")
+    return embeddings[0] if embeddings else None
+
+async def generate_cached(
+    request: GenerationRequest,
+    route: str = "/v1/generate",
+    client: Optional[ClientTicket] = None,
+    prompt_estimate: Optional[int] = None
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Non-streaming generation through the response caches.
+
+    temperature=0 requests try the exact-match cache first; with the semantic
+    cache enabled, a request can then be answered with the stored response to
+    a similar enough prompt (threshold per `route`). Returns the result and
+    the cache-status headers (X-Cache: HIT/MISS/BYPASS, X-Cache-Tier and Age
+    on hits, X-Cache-Similarity on semantic hits).
+    """
+    async def generate():
+        return await ollama_executor.generate(
+            model_id=request.model_id,
+            prompt=request.prompt,
+            stream=False,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+            session_id=request.session_id,
+            client=client,
+            prompt_estimate=prompt_estimate
+        )
+    
+    if request.session_id:
+        # The answer depends on the conversation so far, not just the prompt
+        return await generate(), {}
+    
+    exact = response_cache is not None and request.temperature == 0
+    if not exact and semantic_cache is None:
+        if response_cache is None:
+            return await generate(), {}
+        # Sampling: not reproducible, never cached
+        CACHE_REQUESTS.inc(model=request.model_id, result="bypass")
+        return await generate(), {"X-Cache": "BYPASS"}
+    
+    digest = await ollama_executor.model_digest(request.model_id)
+    if digest is None:
+        # Unknown model build: entries could outlive a re-pull
+        CACHE_REQUESTS.inc(model=request.model_id, result="bypass")
+        return await generate(), {"X-Cache": "BYPASS"}
+    
+    key = None
+    if exact:
+        key = make_cache_key(digest, request.prompt, {"num_predict": request.max_tokens, "temperature": 0})
+        value, tier, age = await response_cache.get(key, request.model_id)
+        if value is not None:
+            CACHE_REQUESTS.inc(model=request.model_id, result=f"hit_{tier}")
+            return value, {"X-Cache": "HIT", "X-Cache-Tier": tier, "Age": str(int(age))}
+    
+    embedding = None
+    # Temperature too: a sampled answer must never be served as a deterministic one
+    namespace = f"{digest}:{request.max_tokens}:{request.temperature}"
+    if semantic_cache is not None:
+        embedding = await _embed_for_cache(request.prompt)
+        if embedding is not None:
+            start = time.perf_counter()
+            match = semantic_cache.lookup(namespace, embedding, route)
+            SEMANTIC_LOOKUP_TIME.observe(time.perf_counter() - start, stage="search")
+            if match is not None:
+                CACHE_REQUESTS.inc(model=request.model_id, result="hit_semantic")
+                result = {
+                    **match.value,
+                    # Auditability: which stored prompt answered this one
+                    "semantic_cache": {
+                        "matched_prompt": match.prompt,
+                        "similarity": round(match.similarity, 4),
+                        "age_s": round(match.age_s, 1)
+                    }
+                }
+                return result, {
+                    "X-Cache": "HIT",
+                    "X-Cache-Tier": "semantic",
+                    "X-Cache-Similarity": f"{match.similarity:.4f}",
+                    "Age": str(int(match.age_s))
+                }
+    
+    CACHE_REQUESTS.inc(model=request.model_id, result="miss")
+    if key is not None:
+        result, led = await _generate_once(key, generate)
+        if led:
+            await response_cache.put(key, request.model_id, result)
+    else:
+        result, led = await generate(), True
+    if led and embedding is not None:
+        semantic_cache.add(namespace, embedding, request.prompt, result)
+    return result, {"X-Cache": "MISS"}
+
+# --- EMBEDDINGS ---
+# Inputs are deduplicated, served from the content-addressed cache where
+# possible, and the rest sent to Ollama in batches spread over the backends.
+
+embedding_cache = EmbeddingCache(
+    max_memory_bytes=int(EMBEDDINGS_CACHE_MAX_MB * 1024 * 1024),
+    disk_path=Path(EMBEDDINGS_CACHE_DB) if EMBEDDINGS_CACHE_DB else None
+)
+
+EMBED_INPUTS = metrics_registry.counter(
+    "navaflow_embedding_inputs_total", "Embedding inputs by source (cache or ollama)", ["model", "source"])
+EMBED_BATCH_SIZE = metrics_registry.histogram(
+    "navaflow_embedding_batch_size", "Inputs per Ollama /api/embed call", ["model"], (1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+def plan_embedding_batches(texts: List[str], max_inputs: int, max_chars: int) -> List[List[str]]:
+    """
+    Pack texts into batches of at most `max_inputs` texts and `max_chars`
+    characters. Texts are packed longest first, so each batch holds inputs of
+    similar length and large batches of short chunks are not held back by one
+    long input.
+    """
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    chars = 0
+    for text in sorted(texts, key=len, reverse=True):
+        if batch and (len(batch) >= max_inputs or chars + len(text) > max_chars):
+            batches.append(batch)
+            batch, chars = [], 0
+        batch.append(text)
+        chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+async def embed_texts(model_id: str, texts: List[str]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Embedding matrix (float32, one row per input) and per-source counts"""
+    unique = list(dict.fromkeys(texts))
+    vectors: Dict[str, np.ndarray] = {}
+    
+    digest = await ollama_executor.model_digest(model_id)
+    keys = {text: make_embedding_key(digest, text) for text in unique} if digest is not None else {}
+    if keys:
+        found = await embedding_cache.get_many(list(keys.values()), model_id)
+        vectors = {text: found[key] for text, key in keys.items() if key in found}
+    missing = [text for text in unique if text not in vectors]
+    
+    batches = plan_embedding_batches(missing, EMBEDDINGS_BATCH_SIZE, EMBEDDINGS_BATCH_MAX_CHARS)
+    slots = asyncio.Semaphore(EMBEDDINGS_CONCURRENCY * len(ollama_executor.pool.backends))
+    
+    async def run(batch: List[str]):
+        async with slots:
+            embeddings = await ollama_executor.embed(model_id, batch)
+        if len(embeddings) != len(batch):
+            raise HTTPException(status_code=502, detail=f"Ollama returned {len(embeddings)} embeddings for {len(batch)} inputs")
+        EMBED_BATCH_SIZE.observe(len(batch), model=model_id)
+        for text, embedding in zip(batch, embeddings):
+            vectors[text] = np.asarray(embedding, dtype=np.float32)
+    
+    tasks = [asyncio.ensure_future(run(batch)) for batch in batches]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # One failed batch fails the request; stop the rest
+        for task in tasks:
+            task.cancel()
+    
+    if keys and missing:
+        await embedding_cache.put_many({keys[text]: vectors[text] for text in missing}, model_id)
+    
+    counts = {"inputs": len(texts), "unique": len(unique), "cached": len(unique) - len(missing), "batches": len(batches)}
+    EMBED_INPUTS.inc(counts["cached"], model=model_id, source="cache")
+    EMBED_INPUTS.inc(len(missing), model=model_id, source="ollama")
+    try:
+        return np.stack([vectors[text] for text in texts]), counts
+    except ValueError:
+        raise HTTPException(status_code=502, detail="Ollama returned embeddings of different sizes")
+
+# --- VISION ENGINE ---
+# VL-JEPA runs in-process from the model's .pth checkpoint, loaded on first
+# use. The frozen encoders are shared by every checkpoint, and requests are
+# micro-batched by the same priority scheduler main.py uses.
+
+PRIORITY_HEADER = "X-NavaFlow-Priority"
+
+vision_schedulers: Dict[str, PriorityBatchScheduler] = {}
+_vision_load_lock = asyncio.Lock()
+
+VISION_REQUESTS = metrics_registry.counter(
+    "navaflow_vision_requests_total", "Vision requests by outcome", ["model", "status"])
+VISION_DURATION = metrics_registry.histogram(
+    "navaflow_vision_duration_seconds", "End-to-end vision inference time, including batching", ["model"])
+metrics_registry.gauge(
+    "navaflow_vision_queued", "Vision requests waiting for a batch", ["priority"],
+    collect=lambda: [((priority,), sum(s.queue_depths()[priority] for s in vision_schedulers.values()))
+                     for priority in ("interactive", "bulk")])
+
+async def vision_runtime(checkpoint: Path) -> Tuple[VisionEngine, PriorityBatchScheduler]:
+    """Engine and batch scheduler for a checkpoint; the first call loads it (in a worker thread)"""
+    engine = get_engine(str(checkpoint))
+    scheduler = vision_schedulers.get(engine.checkpoint_path)
+    if scheduler is not None:
+        return engine, scheduler
+    async with _vision_load_lock:
+        scheduler = vision_schedulers.get(engine.checkpoint_path)
+        if scheduler is None:
+            logger.info(f"👁  Loading vision engine for {checkpoint.name}...")
+            await asyncio.get_running_loop().run_in_executor(None, engine.load)
+            scheduler = create_scheduler(engine)
+            await scheduler.start()
+            vision_schedulers[engine.checkpoint_path] = scheduler
+            info = engine.info()
+            logger.info(f"✅ Vision engine ready in {info['load_seconds']}s "
+                        f"(model: {'VL-JEPA' if engine.model_loaded else 'mock'}, "
+                        f"encoders: {info['vision_encoder']}/{info['text_encoder']})")
+    return engine, scheduler
+
+def vision_checkpoint(model_id: str) -> Path:
+    """The .pth checkpoint behind a vision-language model, or an HTTP error"""
+    model_info = model_manager.get_model_info(model_id)
+    if model_info is None:
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found")
+    if model_info.get("type") != "vision-language":
+        raise HTTPException(status_code=400, detail=f"Model '{model_id}' is not a vision-language model")
+    if not VISION_ENGINE_ENABLED:
+        raise HTTPException(status_code=501, detail="In-process vision inference is disabled (VISION_ENGINE_ENABLED=0)")
+    checkpoint = model_manager.get_model_path(model_id, "pth")
+    if checkpoint is None:
+        raise HTTPException(
+            status_code=501,
+            detail=f"Model '{model_id}' has no PyTorch checkpoint; VL-JEPA inference needs the .pth file"
+        )
+    return checkpoint
+
+async def preload_vision(model_ids: List[str]):
+    for model_id in model_ids:
+        try:
+            await vision_runtime(vision_checkpoint(model_id))
+        except HTTPException as e:
+            logger.warning(f"⚠️  Not preloading vision model {model_id}: {e.detail}")
+
+def vision_stats() -> Dict[str, Any]:
+    engines = {}
+    for checkpoint, scheduler in vision_schedulers.items():
+        info = get_engine(checkpoint).info()
+        info["checkpoint"] = Path(checkpoint).name
+        engines[info["checkpoint"]] = {**info, "scheduler": scheduler.stats()}
+    return {"enabled": VISION_ENGINE_ENABLED, "engines": engines}
+
 # --- FASTAPI APP ---
 
 app = FastAPI(
@@ -299,6 +1661,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def watch_model_dir():
+    await model_manager.registry.start()
+
+@app.on_event("startup")
+async def start_health_probes():
+    await ollama_executor.start()
+
+@app.on_event("startup")
+async def preload_models():
+    if OLLAMA_PRELOAD_MODELS:
+        # Run in the background so the server starts taking traffic immediately
+        asyncio.create_task(ollama_executor.preload(OLLAMA_PRELOAD_MODELS))
+    if VISION_PRELOAD_MODELS and VISION_ENGINE_ENABLED:
+        asyncio.create_task(preload_vision(VISION_PRELOAD_MODELS))
+
+@app.on_event("shutdown")
+async def close_ollama_client():
+    await ollama_executor.aclose()
+    await model_manager.registry.stop()
+    if response_cache is not None:
+        response_cache.close()
+    embedding_cache.close()
+    for scheduler in vision_schedulers.values():
+        await scheduler.stop()
+
 # --- API ENDPOINTS ---
 
 @app.get("/")
@@ -338,6 +1726,25 @@ async def health_check():
         ollama_available=ollama_executor.available
     )
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: per-model generation histograms, backend and scheduler state"""
+    return PlainTextResponse(metrics_registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/v1/stats")
+async def get_stats():
+    """Detailed gateway state: backends, circuit breakers, probes and model scheduler"""
+    return {
+        "ollama": ollama_executor.stats(),
+        "models_indexed": len(model_manager.models),
+        "response_cache": response_cache.stats() if response_cache is not None else {"enabled": False},
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else {"enabled": False},
+        "embedding_cache": embedding_cache.stats(),
+        "client_limits": client_limiter.stats() if client_limiter is not None else {"enabled": False},
+        "prompt_estimates": prompt_estimator.stats(),
+        "vision": vision_stats(),
+    }
+
 @app.get("/v1/models")
 async def list_models():
     """List all available models"""
@@ -347,7 +1754,16 @@ async def list_models():
             "id": model_id,
             "type": config.get("type", "unknown"),
             "formats": config.get("available_formats", []),
-            "preferred_format": config.get("preferred_format", "unknown")
+            "preferred_format": config.get("preferred_format", "unknown"),
+            "files": {
+                fmt: {
+                    "path": entry["path"],
+                    "size_bytes": entry["size"],
+                    "sha256": entry.get("sha256")
+                }
+                for fmt, entry in config["files"].items() if entry
+            },
+            "gguf": config["files"].get("gguf", {}).get("gguf")
         })
     
     return {
@@ -355,8 +1771,22 @@ async def list_models():
         "count": len(models_info)
     }
 
+@app.post("/v1/models/{model_id}/load")
+async def load_model(model_id: str, request: ModelLoadRequest = ModelLoadRequest()):
+    """Load a model on all backends and keep it resident (pinned)"""
+    if not model_manager.is_available(model_id):
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found")
+    return await ollama_executor.load_model(model_id, request.keep_alive, request.warmup)
+
+@app.post("/v1/models/{model_id}/unload")
+async def unload_model(model_id: str):
+    """Unpin a model and evict it from all backends"""
+    if not model_manager.is_available(model_id):
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found")
+    return await ollama_executor.unload_model(model_id)
+
 @app.post("/v1/generate")
-async def generate_text(request: GenerationRequest):
+async def generate_text(request: GenerationRequest, http_request: Request):
     """
     Standard text generation endpoint using Ollama
     """
@@ -367,13 +1797,12 @@ async def generate_text(request: GenerationRequest):
             detail=f"Model '{request.model_id}' not found. Available models: {list(model_manager.models.keys())}"
         )
     
-    # Check Ollama availability
+    # Fail fast while the backend circuit is open
     if not ollama_executor.available:
-        raise HTTPException(
-            status_code=503,
-            detail="Ollama is not available. Please start Ollama service."
-        )
+        raise ollama_executor.unavailable_error()
     
+    prompt_estimate, prompt_headers = await fit_prompt(request)
+    ticket = admit_client(http_request, prompt_estimate + request.max_tokens)
     try:
         # Generate using Ollama
         if request.stream:
@@ -382,21 +1811,32 @@ async def generate_text(request: GenerationRequest):
                 prompt=request.prompt,
                 stream=True,
                 max_tokens=request.max_tokens,
-                temperature=request.temperature
+                temperature=request.temperature,
+                session_id=request.session_id,
+                client=ticket,
+                prompt_estimate=prompt_estimate
             )
-            return StreamingResponse(
+            # Stop reverse proxies from buffering token streams
+            headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **prompt_headers}
+            if "session" in result:
+                headers["X-Session-Id"] = request.session_id
+                headers["X-Session-Resumed"] = str(result["session"]["resumed"]).lower()
+            if ticket is not None:
+                headers.update(ticket.headers())
+            return ClosingStreamingResponse(
                 result["stream"],
-                media_type="application/x-ndjson"
+                close=result["close"],
+                media_type="application/x-ndjson",
+                headers=headers
             )
         else:
-            result = await ollama_executor.generate(
-                model_id=request.model_id,
-                prompt=request.prompt,
-                stream=False,
-                max_tokens=request.max_tokens,
-                temperature=request.temperature
+            result, cache_headers = await run_until_disconnected(
+                http_request, generate_cached(request, client=ticket, prompt_estimate=prompt_estimate)
             )
-            return JSONResponse(content=result)
+            headers = {**cache_headers, **prompt_headers}
+            if ticket is not None:
+                headers.update(ticket.headers())
+            return JSONResponse(content=result, headers=headers)
     
     except HTTPException:
         raise
@@ -404,49 +1844,141 @@ async def generate_text(request: GenerationRequest):
         logger.error(f"Generation error: {e}")
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
-@app.post("/v1/vision")
-async def predict_vision(request: VisionRequest):
+@app.delete("/v1/sessions/{session_id}")
+async def end_session(session_id: str):
+    """Forget a conversation's stored context"""
+    if not ollama_executor.sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+    return {"session_id": session_id, "status": "deleted"}
+
+@app.post("/v1/generate/batch")
+async def generate_batch(http_request: Request):
     """
-    Vision-language inference endpoint
-    For NavaFlow-VL-JEPA models
+    Bulk generation over NDJSON.
+
+    The request body is one GenerationRequest per line plus an optional `id`.
+    Results stream back as NDJSON in completion order, tagged with the caller's
+    `id` (or the line index). At most OLLAMA_BATCH_CONCURRENCY generations per
+    backend run at once.
     """
-    # Validate model
-    if not model_manager.is_available(request.model_id):
-        raise HTTPException(
-            status_code=404,
-            detail=f"Model '{request.model_id}' not found"
-        )
+    if not ollama_executor.available:
+        raise ollama_executor.unavailable_error()
     
-    # For vision models, we might need to use PyTorch directly
-    # or convert to a format Ollama can handle
-    model_info = model_manager.get_model_info(request.model_id)
+    body_received = asyncio.Event()
     
-    if model_info and model_info.get("type") == "vision-language":
-        # Check if we have a PyTorch model
-        pth_path = model_info.get("pth")
-        
-        if pth_path and pth_path.exists():
-            # Use PyTorch inference (fallback to previous implementation)
-            # In production, you'd load the actual model here
-            return {
-                "prediction": "Vision inference requires model loading",
-                "world_state": {"prediction": "ON", "probability": 0.85},
-                "action": {"predicted_action": "IDLE", "action_id": 0},
-                "note": "Use /predict/vision from main.py for full PyTorch inference"
-            }
+    async def body():
+        # Read ASGI messages directly so the end of the body is known as soon
+        # as it arrives, not when its last line has been processed
+        while True:
+            message = await http_request.receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnect()
+            more_body = message.get("more_body", False)
+            if not more_body:
+                body_received.set()
+            yield message.get("body", b"")
+            if not more_body:
+                return
     
-    # Try Ollama if model supports it
-    if ollama_executor.available:
-        # For vision models in Ollama, we'd need to use a vision-capable model
-        # This is a placeholder - actual implementation would handle vision inputs
-        return {
-            "error": "Vision inference via Ollama requires vision-capable model setup",
-            "suggestion": "Use PyTorch inference endpoint for vision models"
-        }
+    async def wait_for_disconnect():
+        # Once the body is in, the next ASGI message can only be a disconnect
+        await body_received.wait()
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+    
+    concurrency = OLLAMA_BATCH_CONCURRENCY * len(ollama_executor.pool.backends)
+    return BodyStreamingResponse(
+        run_generation_batch(iter_ndjson_lines(body()), concurrency, wait_for_disconnect, http_request.headers.get("X-API-Key")),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: EmbeddingRequest, http_request: Request):
+    """
+    Embed one or many texts in a single call.
+
+    Cached inputs are returned without calling Ollama; the rest go out in
+    batches of EMBEDDINGS_BATCH_SIZE. With `encoding_format="binary"` the body
+    is the raw little-endian float32 matrix (X-Embedding-Count rows of
+    X-Embedding-Dim values).
+    """
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    if not texts:
+        raise HTTPException(status_code=422, detail="input must not be empty")
+    if len(texts) > EMBEDDINGS_MAX_INPUTS:
+        raise HTTPException(status_code=413, detail=f"At most {EMBEDDINGS_MAX_INPUTS} inputs per call")
+    if not ollama_executor.available:
+        raise ollama_executor.unavailable_error()
+    # Budgets only: embedding batches do not take generation slots
+    ticket = admit_client(http_request, sum(estimate_tokens(text) for text in texts), queued=False)
+    
+    matrix, counts = await embed_texts(request.model_id, texts)
+    matrix = matrix.astype("<f4", copy=False)
+    headers = {
+        "X-Embedding-Count": str(matrix.shape[0]),
+        "X-Embedding-Dim": str(matrix.shape[1]),
+        "X-Embedding-Cached": str(counts["cached"]),
+        **(ticket.headers() if ticket is not None else {}),
+    }
+    
+    if request.encoding_format == "binary":
+        return Response(content=matrix.tobytes(), media_type="application/octet-stream", headers=headers)
     
-    raise HTTPException(
-        status_code=501,
-        detail="Vision inference not yet fully implemented for Ollama"
+    if request.encoding_format == "base64":
+        data = [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+    else:
+        data = matrix.tolist()
+    return JSONResponse(
+        content={
+            "model": request.model_id,
+            "dimensions": matrix.shape[1],
+            "encoding_format": request.encoding_format,
+            "data": [{"index": i, "embedding": embedding} for i, embedding in enumerate(data)],
+            "usage": counts,
+        },
+        headers=headers
+    )
+
+@app.post("/v1/vision")
+async def predict_vision(request: VisionRequest, http_request: Request):
+    """
+    Vision-language inference with the in-process NavaFlow-VL-JEPA engine.
+
+    The model's .pth checkpoint is loaded on the first call (or at startup
+    with VISION_PRELOAD_MODELS) and concurrent calls are micro-batched.
+    Requests are interactive unless X-NavaFlow-Priority says `bulk`.
+    """
+    start_time = time.perf_counter()
+    checkpoint = vision_checkpoint(request.model_id)
+    try:
+        image_data = base64.b64decode(request.image_data, validate=True)
+        pil_image = decode_image(image_data)
+    except (ValueError, OSError):
+        raise HTTPException(status_code=400, detail="image_data is not a base64 encoded JPEG or PNG image")
+    # Budgets only: vision batches do not take Ollama slots
+    ticket = admit_client(http_request, estimate_tokens(request.text_query), queued=False)
+    
+    _, scheduler = await vision_runtime(checkpoint)
+    priority = Priority.parse(http_request.headers.get(PRIORITY_HEADER), Priority.INTERACTIVE)
+    try:
+        result = await scheduler.submit((pil_image, request.text_query or DEFAULT_QUERY), priority)
+    except Exception as e:
+        VISION_REQUESTS.inc(model=request.model_id, status="error")
+        raise HTTPException(status_code=500, detail=f"Inference error: {str(e)}")
+    
+    latency_s = time.perf_counter() - start_time
+    VISION_REQUESTS.inc(model=request.model_id, status="ok")
+    VISION_DURATION.observe(latency_s, model=request.model_id)
+    return JSONResponse(
+        content={
+            "model": request.model_id,
+            **format_prediction(result),
+            "priority": priority.name.lower(),
+            "latency_ms": round(latency_s * 1000, 4),
+            "target_met": latency_s * 1000 <= 0.15
+        },
+        headers=ticket.headers() if ticket is not None else None
     )
 
 @app.post("/v1/convert/check")
@@ -456,20 +1988,27 @@ async def check_conversion_status(model_id: str):
         raise HTTPException(status_code=404, detail="Model not found")
     
     model_info = model_manager.get_model_info(model_id)
-    pth_path = model_info.get("pth")
-    gguf_path = model_info.get("gguf")
+    pth_exists = "pth" in model_info["files"]
+    gguf_exists = "gguf" in model_info["files"]
+    gguf_entry = model_info["files"].get("gguf") or {}
+    gguf_valid = gguf_entry.get("valid", False)
+    needs_conversion = pth_exists and not gguf_valid
     
-    needs_conversion = (
-        pth_path and pth_path.exists() and
-        (not gguf_path or not gguf_path.exists())
-    )
+    if needs_conversion and gguf_exists:
+        recommendation = f"GGUF file is invalid ({gguf_entry.get('error')}); re-run the conversion"
+    elif needs_conversion:
+        recommendation = "Convert to GGUF for optimal Ollama performance"
+    else:
+        recommendation = "Model ready"
     
     return {
         "model_id": model_id,
         "needs_conversion": needs_conversion,
-        "pth_exists": pth_path.exists() if pth_path else False,
-        "gguf_exists": gguf_path.exists() if gguf_path else False,
-        "recommendation": "Convert to GGUF for optimal Ollama performance" if needs_conversion else "Model ready"
+        "pth_exists": pth_exists,
+        "gguf_exists": gguf_exists,
+        "gguf_valid": gguf_valid,
+        "gguf": gguf_entry.get("gguf"),
+        "recommendation": recommendation
     }
 
 # --- START SERVER ---
@@ -480,7 +2019,7 @@ if __name__ == "__main__":
     print("=" * 60)
     print(f"📍 Host: {HOST}:{PORT}")
     print(f"📁 Model Directory: {MODEL_DIR}")
-    print(f"🤖 Ollama Host: {OLLAMA_HOST}")
+    print(f"🤖 Ollama Hosts: {', '.join(OLLAMA_HOSTS)}")
     print(f"✅ Ollama Available: {ollama_executor.available}")
     print(f"📦 Available Models: {len(model_manager.models)}")
     print("=" * 60)
@@ -0,0 +1,292 @@
+"""
+Indexed Model Registry for NavaFlow Ollama Gateway
+
+Indexes every model file under MODEL_DIR (GGUF and PyTorch checkpoints) and
+keeps the result in memory, so `/v1/models` and request routing never touch
+the filesystem. Per-file metadata (size, mtime, format, content hash and, for
+GGUF, the parsed header summary) is persisted to a small on-disk index: on
+restart, files whose size and mtime are unchanged reuse their cached metadata
+and startup is instant.
+
+Every GGUF file becomes a model. PyTorch checkpoints only do when they are
+one of the KNOWN_FILES; other .pt/.pth files (optimizer states, training
+snapshots) are indexed but not listed.
+
+Additions and removals are picked up via filesystem notifications when the
+optional `watchfiles` package is installed, otherwise by cheap periodic
+stat polling.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from gguf_reader import GGUFError, read_gguf_summary
+
+try:
+    import watchfiles
+except ImportError:
+    watchfiles = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = ".navaflow_index.json"
+INDEX_VERSION = 2
+
+MODEL_EXTENSIONS = {
+    ".gguf": "gguf",
+    ".pth": "pth",
+    ".pt": "pth",
+}
+
+# Well-known files mapped onto stable NavaFlow model ids
+KNOWN_FILES = {
+    "navajepa_sota.pth": ("navajepa", "vision-language"),
+    "navajepa_sota.gguf": ("navajepa", "vision-language"),
+    "navajepa_int8_quantized.pth": ("navajepa_int8", "vision-language"),
+    "navaflow_v2_version1a_checkpoint.pt": ("navajepa_v2", "vision-language"),
+    "navaflow_v2_version1a.gguf": ("navajepa_v2", "vision-language"),
+}
+
+# Models Ollama can pull itself, available without a local file
+OLLAMA_MODELS = {
+    "llama3": "text",
+}
+
+# Preference order when a model exists in several formats
+FORMAT_ORDER = ["pth", "gguf", "ollama"]
+
+_HASH_CHUNK = 8 * 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    """Stream a file through SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    In-memory model index backed by an on-disk metadata cache.
+
+    `models` is rebuilt off to the side and swapped in atomically, so readers
+    on the event loop always see a consistent snapshot without locking.
+    """
+
+    def __init__(
+        self,
+        model_dir: Path,
+        poll_interval: float = 5.0,
+        index_path: Optional[Path] = None,
+        hash_files: bool = True
+    ):
+        self.model_dir = Path(model_dir)
+        self.poll_interval = poll_interval
+        self.index_path = index_path or self.model_dir / INDEX_FILENAME
+        self.hash_files = hash_files
+
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # Ollama-only models are listed even when the directory is empty
+        self.models: Dict[str, Dict[str, Any]] = self._build_models(self.files)
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+        self._lock = threading.Lock()
+        self._hasher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-hash")
+        self._hashing: set = set()
+        self._watch_task: Optional[asyncio.Task] = None
+
+        self._load_index()
+        self.rescan()
+
+    # --- INDEX PERSISTENCE ---
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.files = data.get("files", {})
+                self.models = self._build_models(self.files)
+                logger.info(f"Loaded model index with {len(self.files)} entries")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable model index {self.index_path}: {e}")
+
+    def _save_index(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"version": INDEX_VERSION, "files": self.files}, f, indent=1)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not persist model index: {e}")
+
+    # --- SCANNING ---
+
+    def _walk(self) -> Dict[str, os.stat_result]:
+        found = {}
+        for root, dirs, names in os.walk(self.model_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in names:
+                if Path(name).suffix.lower() in MODEL_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    try:
+                        found[os.path.relpath(path, self.model_dir)] = os.stat(path)
+                    except OSError:
+                        continue
+        return found
+
+    def describe_file(self, path: Path, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Attach format-specific metadata (GGUF header summary) to an index entry"""
+        if entry["format"] == "gguf":
+            try:
+                entry["gguf"] = read_gguf_summary(path)
+                entry["valid"] = True
+            except GGUFError as e:
+                entry["gguf"] = None
+                entry["valid"] = False
+                entry["error"] = str(e)
+        return entry
+
+    def rescan(self) -> bool:
+        """
+        Re-stat the model directory and rebuild the index.
+
+        Only new or changed files (by size and mtime) are re-described; content
+        hashes are computed in the background. Returns True if anything changed.
+        """
+        with self._lock:
+            found = self._walk()
+            files: Dict[str, Dict[str, Any]] = {}
+            changed = set(found) != set(self.files)
+
+            for rel, st in found.items():
+                cached = self.files.get(rel)
+                if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+                    files[rel] = cached
+                    continue
+                changed = True
+                entry = {
+                    "path": rel,
+                    "format": MODEL_EXTENSIONS[Path(rel).suffix.lower()],
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "sha256": None,
+                }
+                try:
+                    entry = self.describe_file(self.model_dir / rel, entry)
+                except Exception as e:
+                    logger.warning(f"Could not read metadata for {rel}: {e}")
+                files[rel] = entry
+
+            if not changed:
+                return False
+
+            self.files = files
+            self.models = self._build_models(files)
+            self._save_index()
+
+        logger.info(f"📦 Model index updated: {sorted(self.models)}")
+        if self.hash_files:
+            self._schedule_hashing()
+        for listener in self.listeners:
+            listener(self.models)
+        return True
+
+    def _build_models(self, files: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        models: Dict[str, Dict[str, Any]] = {}
+
+        for rel, entry in sorted(files.items()):
+            path = self.model_dir / rel
+            model_id, model_type = KNOWN_FILES.get(path.name, (None, None))
+            if model_id is None:
+                if entry["format"] != "gguf":
+                    continue  # Unknown checkpoint: nothing here knows how to serve it
+                model_id, model_type = path.stem, "text"
+            model = models.setdefault(model_id, {"type": model_type, "files": {}})
+            fmt = entry["format"]
+            # First file per format wins (sorted, so deterministic)
+            if fmt not in model["files"]:
+                model[fmt] = path
+                model["files"][fmt] = entry
+
+        for model_id, model_type in OLLAMA_MODELS.items():
+            model = models.setdefault(model_id, {"type": model_type, "files": {}})
+            model["files"]["ollama"] = {}
+
+        for model in models.values():
+            formats = [f for f in FORMAT_ORDER if f in model["files"]]
+            model["available_formats"] = formats
+            model["preferred_format"] = formats[0]
+        return models
+
+    def _schedule_hashing(self):
+        with self._lock:
+            for rel, entry in self.files.items():
+                if entry.get("sha256") is None and rel not in self._hashing:
+                    self._hashing.add(rel)
+                    self._hasher.submit(self._hash_file, rel, entry["size"], entry["mtime_ns"])
+
+    def _hash_file(self, rel: str, size: int, mtime_ns: int):
+        try:
+            digest = file_sha256(self.model_dir / rel)
+        except OSError as e:
+            logger.warning(f"Could not hash {rel}: {e}")
+            digest = None
+        with self._lock:
+            self._hashing.discard(rel)
+            if digest is None:
+                return
+            entry = self.files.get(rel)
+            # Skip if the file changed while we were hashing
+            if entry and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+                entry["sha256"] = digest
+                self._save_index()
+
+    # --- WATCHING ---
+
+    async def start(self):
+        """Start watching MODEL_DIR for additions and removals"""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+        self._hasher.shutdown(wait=False)
+
+    async def _watch(self):
+        if watchfiles is not None:
+            logger.info(f"Watching {self.model_dir} for model changes (filesystem notifications)")
+            try:
+                async for _ in watchfiles.awatch(self.model_dir, debounce=500):
+                    await asyncio.to_thread(self.rescan)
+                return
+            except Exception as e:
+                logger.warning(f"Filesystem notifications unavailable ({e}); falling back to polling")
+
+        logger.info(f"Watching {self.model_dir} for model changes (polling every {self.poll_interval}s)")
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.rescan)
+            except Exception as e:
+                logger.error(f"Model rescan failed: {e}")
@@ -0,0 +1,177 @@
+"""
+Model-Affinity Scheduler for the Ollama Gateway
+
+Ollama keeps at most OLLAMA_MAX_LOADED_MODELS models resident; interleaving
+requests for more models than that makes it evict and reload weights, which
+costs seconds per swap. This scheduler sits in front of the backends and:
+
+1. Caps the number of distinct models with requests in flight at
+   `max_loaded_models`
+2. Groups queued requests by model: when a model gets a slot, all of its
+   queued requests are admitted together
+3. Applies a fairness window: once a model has held its slot for longer than
+   `fairness_window_s` while other models are waiting, it stops admitting new
+   requests and drains, so a hot model cannot starve the others
+
+Swaps are counted against an LRU of the models assumed resident in Ollama.
+"""
+
+import asyncio
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _ActiveModel:
+    __slots__ = ("in_flight", "active_since")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.active_since = time.monotonic()
+
+
+class ModelAffinityScheduler:
+    """
+    Admission control by model.
+
+    Usage:
+        waited_s = await scheduler.acquire(model)
+        try:
+            ...
+        finally:
+            scheduler.release(model)
+    """
+
+    def __init__(self, max_loaded_models: int = 4, fairness_window_s: float = 5.0):
+        self.max_loaded_models = max(1, max_loaded_models)
+        self.fairness_window_s = fairness_window_s
+
+        self._active: Dict[str, _ActiveModel] = {}
+        self._waiting: Dict[str, Deque[Tuple[asyncio.Future, float]]] = {}
+        self._resident: "OrderedDict[str, None]" = OrderedDict()
+
+        self.loads = 0
+        self.swaps = 0
+        self.queued = 0
+        self.admitted: Dict[str, int] = {}
+        self.max_wait_s = 0.0
+
+    # --- ADMISSION ---
+
+    async def acquire(self, model: str) -> float:
+        """Wait for a slot for `model`; returns the time spent queued in seconds"""
+        if not self._waiting.get(model) and self._can_admit(model):
+            self._admit(model)
+            return 0.0
+
+        enqueued_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(model, deque()).append((future, enqueued_at))
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up: hand the slot back
+                self.release(model)
+            else:
+                self._discard(model, future)
+            raise
+
+        waited = time.monotonic() - enqueued_at
+        self.max_wait_s = max(self.max_wait_s, waited)
+        return waited
+
+    def release(self, model: str):
+        """Finish one request for `model` and admit queued work"""
+        state = self._active.get(model)
+        if state is None:
+            return
+        state.in_flight -= 1
+        if state.in_flight <= 0:
+            del self._active[model]
+        self._dispatch()
+
+    def _can_admit(self, model: str) -> bool:
+        state = self._active.get(model)
+        if state is not None:
+            return not self._draining(model, state)
+        return len(self._active) < self.max_loaded_models
+
+    def _draining(self, model: str, state: _ActiveModel) -> bool:
+        if time.monotonic() - state.active_since < self.fairness_window_s:
+            return False
+        return any(queue for other, queue in self._waiting.items() if other != model)
+
+    def _admit(self, model: str):
+        state = self._active.get(model)
+        if state is None:
+            state = self._active[model] = _ActiveModel()
+            self._touch_resident(model)
+        state.in_flight += 1
+        self.admitted[model] = self.admitted.get(model, 0) + 1
+
+    def _touch_resident(self, model: str):
+        if model in self._resident:
+            self._resident.move_to_end(model)
+            return
+        self.loads += 1
+        if len(self._resident) >= self.max_loaded_models:
+            evicted, _ = self._resident.popitem(last=False)
+            self.swaps += 1
+            logger.info(f"🔁 Model swap: {evicted} -> {model}")
+        self._resident[model] = None
+
+    def mark_resident(self, model: str):
+        """Record a model loaded outside the request path (preload)"""
+        self._touch_resident(model)
+
+    def mark_evicted(self, model: str):
+        """Record an explicit unload"""
+        self._resident.pop(model, None)
+
+    def _grant_all(self, model: str):
+        queue = self._waiting.pop(model, None) or ()
+        for future, _ in queue:
+            if not future.done():
+                self._admit(model)
+                future.set_result(None)
+
+    def _dispatch(self):
+        # Active models that are not draining take their queued work directly
+        for model in list(self._waiting):
+            state = self._active.get(model)
+            if state is not None and not self._draining(model, state):
+                self._grant_all(model)
+
+        # Free slots go to the model whose oldest request has waited longest
+        while len(self._active) < self.max_loaded_models and self._waiting:
+            model = min(self._waiting, key=lambda m: self._waiting[m][0][1] if self._waiting[m] else float("inf"))
+            self._grant_all(model)
+
+    def _discard(self, model: str, future: asyncio.Future):
+        queue = self._waiting.get(model)
+        if not queue:
+            return
+        self._waiting[model] = deque(item for item in queue if item[0] is not future)
+        if not self._waiting[model]:
+            del self._waiting[model]
+
+    # --- REPORTING ---
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_loaded_models": self.max_loaded_models,
+            "fairness_window_s": self.fairness_window_s,
+            "active": {m: s.in_flight for m, s in self._active.items()},
+            "waiting": {m: len(q) for m, q in self._waiting.items()},
+            "resident": list(self._resident),
+            "loads": self.loads,
+            "swaps": self.swaps,
+            "queued": self.queued,
+            "admitted": dict(self.admitted),
+            "max_wait_s": round(self.max_wait_s, 3),
+        }
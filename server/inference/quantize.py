@@ -3,164 +3,542 @@ Model Quantization for NavaFlow-VL-JEPA
 
 Optimize the model for production deployment to achieve 0.15ms latency goal.
 Uses Post-Training Quantization (PTQ) to convert FP32 to INT8.
+
+Two modes:
+
+- `static` (default): weights are quantized per output channel and activation
+  scales are calibrated on (vision, text) embedding pairs, so every layer of
+  the predictor and heads runs an INT8 kernel on CPU. Each head is wrapped in
+  quant/dequant stubs and the model keeps its own forward. Linear+GELU pairs
+  are fused into one kernel (oneDNN), so the pre-activation is never
+  requantized.
+- `dynamic`: weights only; activations stay FP32 and are quantized on every call.
+
+Calibration pairs come from an embeddings file (`torch.save` of, or an `.npz`
+with, `vision` and `text` arrays of shape [N, 768]) or from request recordings
+(NAVAFLOW_RECORD_DIR), encoded with the serving encoders. Static mode refuses
+to run without them unless random calibration is explicitly allowed:
+
+    python quantize.py --calibration-recordings ./recordings --calibration-samples 512
+    python quantize.py --calibration-data pairs.pt
+    python quantize.py --mode dynamic
+    python quantize.py --allow-random-calibration   # demo only: random activation ranges
+
+Static checkpoints are loaded with `load_quantized_model` (vision_engine.py
+does this automatically).
 """
 
+import argparse
+import copy
+import time
+import logging
+import warnings
+import numpy as np
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-# Model configuration
-VISION_DIM = 768
-TEXT_DIM = 2048
-EMBEDDING_DIM = 1536
-NUM_AGENT_ACTIONS = 5
+import torch.ao.nn.quantized as nnq
+from torch.ao.nn.intrinsic.modules.fused import _FusedModule
+from torch.ao.nn.quantized.modules.utils import _quantize_weight
+from torch.ao.quantization import (
+    QConfig, QuantWrapper, convert, default_per_channel_weight_observer,
+    fuse_modules, get_default_qconfig, get_default_static_quant_module_mappings, prepare
+)
 
-def quantize_model(
-    checkpoint_path: str = "navajepa_sota.pth",
-    output_path: str = "navajepa_int8_quantized.pth",
-    calibration_samples: int = 100
-):
-    """
-    Quantize NavaFlow-VL-JEPA model to INT8 for production deployment.
-    
-    Args:
-        checkpoint_path: Path to trained model checkpoint
-        output_path: Path to save quantized model
-        calibration_samples: Number of samples for calibration
-    """
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"🔍 Starting Dynamic Quantization on {device}...")
-    
-    # Load model (simplified - in production, import from model module)
+from vision_engine import (
+    DEFAULT_QUERY, EMBEDDING_DIM, NUM_AGENT_ACTIONS, TEXT_DIM, VISION_DIM, MockNavaFlowModel, decode_image, encoders
+)
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_ENDPOINTS = ("/predict/vision", "/predict/batch")
+
+
+# --- FLOAT MODEL ---
+
+def load_float_model(checkpoint_path: Optional[str], device: str) -> nn.Module:
+    """NavaFlowVLJEPA with the checkpoint's weights, or the mock structure for demos"""
     try:
         from model import NavaFlowVLJEPA
         model = NavaFlowVLJEPA(device)
-        
-        if Path(checkpoint_path).exists():
+
+        if checkpoint_path and Path(checkpoint_path).exists():
             checkpoint = torch.load(checkpoint_path, map_location=device)
             if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
                 model.load_state_dict(checkpoint['model_state_dict'])
             else:
                 model.load_state_dict(checkpoint)
             print(f"✅ Loaded model from {checkpoint_path}")
-        else:
+        elif checkpoint_path:
             print(f"⚠️  Checkpoint not found: {checkpoint_path}")
             print("   Using untrained model for quantization demo")
     except ImportError:
-        print("⚠️  Model module not found. Using mock model for demo.")
-        # Create mock model structure
-        class MockModel(nn.Module):
-            def __init__(self):
-                super().__init__()
-                self.predictor = nn.Sequential(
-                    nn.Linear(768 + 768, 1536),
-                    nn.GELU(),
-                    nn.Linear(1536, 1536)
-                )
-                self.world_head = nn.Sequential(
-                    nn.Linear(768 + 768, 1),
-                    nn.Sigmoid()
-                )
-                self.agent_head = nn.Sequential(
-                    nn.Linear(768 + 768, NUM_AGENT_ACTIONS)
-                )
-        model = MockModel().to(device)
-    
+        if checkpoint_path:
+            print("⚠️  Model module not found. Using mock model for demo.")
+        model = MockNavaFlowModel().to(device)
+
     model.eval()
     model.float()  # Ensure FP32 for quantization
-    
-    # --- DYNAMIC QUANTIZATION (PTQ) ---
-    # PyTorch's built-in quantization
-    print("📊 Applying Dynamic Quantization...")
-    
-    # Quantize the predictor (main compute)
-    if hasattr(model, 'predictor'):
-        # Quantize predictor layers
-        model.predictor = torch.quantization.quantize_dynamic(
-            model.predictor,
-            {nn.Linear},  # Quantize Linear layers
-            dtype=torch.qint8
+    return model
+
+
+# --- FUSED LINEAR + GELU ---
+
+class LinearGELU(_FusedModule):
+    """Linear followed by GELU, observed and quantized as one op"""
+
+    def __init__(self, linear: nn.Linear, gelu: nn.GELU):
+        super().__init__(linear, gelu)
+
+    def forward(self, x):
+        x = self[0](x)
+        # Attached by prepare_static(): the quantized kernel needs the pre-activation range too
+        observer = getattr(self, "pre_activation_post_process", None)
+        if observer is not None:
+            x = observer(x)
+        return self[1](x)
+
+
+def fuse_linear_gelu(is_qat: bool, linear: nn.Linear, gelu: nn.GELU) -> LinearGELU:
+    if is_qat:
+        raise NotImplementedError("Linear+GELU fusion is only implemented for post-training quantization")
+    return LinearGELU(linear, gelu)
+
+
+class QuantizedLinearGELU(nnq.Linear):
+    """
+    INT8 Linear+GELU.
+
+    Runs as one oneDNN kernel (u8 activations, s8 per-channel weights, GELU
+    applied before requantizing to the GELU output range). The oneDNN op is
+    private and its arguments have changed between torch releases, so it is
+    run once on a probe input before use. Where oneDNN is not available or
+    the probe fails it falls back to the quantized linear followed by quantized
+    GELU, at the pre-activation's scale.
+    """
+
+    _FLOAT_MODULE = LinearGELU
+
+    def __init__(self, in_features, out_features, bias_=True, dtype=torch.qint8):
+        super().__init__(in_features, out_features, bias_, dtype=dtype)
+        self.approximate = "none"
+        self.gelu_scale = 1.0
+        self.gelu_zero_point = 0
+        self._onednn = None  # (packed weight, scales, zero points, bias), False if unavailable
+
+    def _get_name(self):
+        return "QuantizedLinearGELU"
+
+    def _prepack_onednn(self):
+        if not torch.backends.mkldnn.is_available() or not hasattr(torch.ops.onednn, "qlinear_pointwise"):
+            return False
+        weight, bias = self._weight_bias()
+        if weight.qscheme() not in (torch.per_channel_symmetric, torch.per_channel_affine):
+            return False
+        probe = torch.quantize_per_tensor(torch.zeros(1, self.in_features), self.scale, self.zero_point, torch.quint8)
+        try:
+            onednn = (torch.ops.onednn.qlinear_prepack(weight.int_repr(), None),
+                      weight.q_per_channel_scales().float(), weight.q_per_channel_zero_points(),
+                      bias.float() if bias is not None else None)
+            self._run_onednn(probe, onednn)
+        except RuntimeError as e:
+            logger.warning(f"⚠️  oneDNN Linear+GELU unavailable, using separate kernels: {e}")
+            return False
+        return onednn
+
+    def _run_onednn(self, x: torch.Tensor, onednn) -> torch.Tensor:
+        packed, w_scales, w_zero_points, bias = onednn
+        out = torch.ops.onednn.qlinear_pointwise(
+            x.int_repr(), x.q_scale(), x.q_zero_point(), packed, w_scales, w_zero_points, bias,
+            self.gelu_scale, self.gelu_zero_point, torch.uint8, "gelu", [], self.approximate
         )
-        print("✅ Predictor quantized")
-    
-    # Quantize world head
-    if hasattr(model, 'world_head'):
-        model.world_head = torch.quantization.quantize_dynamic(
-            model.world_head,
-            {nn.Linear},
-            dtype=torch.qint8
+        return torch._make_per_tensor_quantized_tensor(out, self.gelu_scale, self.gelu_zero_point)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self._onednn is None:
+            self._onednn = self._prepack_onednn()
+        if self._onednn is False:
+            return F.gelu(super().forward(x), approximate=self.approximate)
+        return self._run_onednn(x, self._onednn)
+
+    def set_weight_bias(self, w, b):
+        super().set_weight_bias(w, b)
+        self._onednn = None
+
+    def _save_to_state_dict(self, destination, prefix, keep_vars):
+        super()._save_to_state_dict(destination, prefix, keep_vars)
+        destination[prefix + "gelu_scale"] = torch.tensor(self.gelu_scale)
+        destination[prefix + "gelu_zero_point"] = torch.tensor(self.gelu_zero_point)
+
+    def _load_from_state_dict(self, state_dict, prefix, local_metadata, strict, missing_keys, unexpected_keys, error_msgs):
+        self.gelu_scale = float(state_dict.pop(prefix + "gelu_scale"))
+        self.gelu_zero_point = int(state_dict.pop(prefix + "gelu_zero_point"))
+        super()._load_from_state_dict(state_dict, prefix, local_metadata, strict, missing_keys, unexpected_keys, error_msgs)
+        self._onednn = None
+
+    @classmethod
+    def from_float(cls, mod, use_precomputed_fake_quant=False):
+        linear, gelu = mod[0], mod[1]
+        weight_post_process = mod.qconfig.weight()
+        weight_post_process(linear.weight)
+        qlinear = cls(linear.in_features, linear.out_features, dtype=weight_post_process.dtype)
+        qlinear.set_weight_bias(_quantize_weight(linear.weight.float(), weight_post_process), linear.bias)
+        scale, zero_point = mod.pre_activation_post_process.calculate_qparams()
+        qlinear.scale, qlinear.zero_point = float(scale), int(zero_point)
+        scale, zero_point = mod.activation_post_process.calculate_qparams()
+        qlinear.gelu_scale, qlinear.gelu_zero_point = float(scale), int(zero_point)
+        qlinear.approximate = gelu.approximate
+        # Checked now, so a torch whose oneDNN op does not take these arguments never fails a forward
+        qlinear._onednn = qlinear._prepack_onednn()
+        return qlinear
+
+
+# --- STATIC QUANTIZATION ---
+
+QUANTIZED_HEADS = ('predictor', 'world_head', 'agent_head')
+OUTPUT_KEYS = ('prediction', 'world_state_logits', 'action_logits')
+
+
+def check_architecture(model: nn.Module):
+    """Refuse models whose forward is not (vision_emb, text_emb) -> the NavaFlow heads' outputs"""
+    missing = [name for name in QUANTIZED_HEADS if not isinstance(getattr(model, name, None), nn.Module)]
+    if missing:
+        raise ValueError(f"Static quantization needs the predictor and head modules; model has no {missing}")
+    probe = torch.zeros(2, VISION_DIM)
+    try:
+        with torch.no_grad():
+            outputs = model(probe, probe)
+    except Exception as e:
+        raise ValueError(f"Unrecognised architecture: forward(vision_emb, text_emb) failed: {e}") from e
+    if not isinstance(outputs, dict) or any(key not in outputs for key in OUTPUT_KEYS):
+        raise ValueError(f"Unrecognised architecture: forward must return {list(OUTPUT_KEYS)}")
+
+
+def check_calibrated(prepared: nn.Module):
+    """Every head must have seen calibration data, i.e. the model's forward runs through it"""
+    unused = [name for name in QUANTIZED_HEADS
+              if not torch.isfinite(getattr(prepared, name).quant.activation_post_process.min_val).all()]
+    if unused:
+        raise ValueError(f"Unrecognised architecture: forward never ran {unused}, so they cannot be calibrated")
+
+
+def default_backend() -> str:
+    engines = torch.backends.quantized.supported_engines
+    for backend in ("x86", "fbgemm", "qnnpack"):
+        if backend in engines:
+            return backend
+    raise RuntimeError(f"No quantized CPU engine available (supported: {engines})")
+
+
+def _linear_gelu_pairs(model: nn.Module) -> List[List[str]]:
+    pairs = []
+    for name, module in model.named_modules():
+        if isinstance(module, nn.Sequential) and not isinstance(module, _FusedModule):
+            children = list(module.named_children())
+            for (first, a), (second, b) in zip(children, children[1:]):
+                if type(a) is nn.Linear and type(b) is nn.GELU:
+                    prefix = f"{name}." if name else ""
+                    pairs.append([prefix + first, prefix + second])
+    return pairs
+
+
+def prepare_static(model: nn.Module, backend: str) -> nn.Module:
+    """
+    Wrap each head in quant/dequant stubs, fuse Linear+GELU and insert
+    observers; returns the model to calibrate.
+
+    The model keeps its own forward: only the heads are quantized, each
+    quantizing its input once and dequantizing its output, and everything
+    outside them stays FP32.
+    """
+    torch.backends.quantized.engine = backend
+    model = model.cpu().eval()
+    check_architecture(model)
+    # Per-channel symmetric weights on every backend; activation observers as the backend recommends
+    qconfig = QConfig(activation=get_default_qconfig(backend).activation, weight=default_per_channel_weight_observer)
+    for name in QUANTIZED_HEADS:
+        head = QuantWrapper(getattr(model, name))
+        head.qconfig = qconfig
+        setattr(model, name, head)
+    pairs = [pair for pair in _linear_gelu_pairs(model) if pair[0].split(".")[0] in QUANTIZED_HEADS]
+    if pairs:
+        model = fuse_modules(
+            model, pairs,
+            fuse_custom_config_dict={"additional_fuser_method_mapping": {(nn.Linear, nn.GELU): fuse_linear_gelu}}
         )
-        print("✅ World head quantized")
-    
-    # Quantize agent head
-    if hasattr(model, 'agent_head'):
-        model.agent_head = torch.quantization.quantize_dynamic(
-            model.agent_head,
-            {nn.Linear},
-            dtype=torch.qint8
+    prepared = prepare(model)
+    for module in prepared.modules():
+        if isinstance(module, LinearGELU):
+            module.pre_activation_post_process = module.qconfig.activation()
+    return prepared
+
+
+def convert_static(prepared: nn.Module) -> nn.Module:
+    mapping = {**get_default_static_quant_module_mappings(), LinearGELU: QuantizedLinearGELU}
+    return convert(prepared, mapping=mapping)
+
+
+def load_quantized_model(checkpoint: Union[str, Path, Dict[str, Any]]) -> nn.Module:
+    """Rebuild a static INT8 checkpoint written by `quantize_model` (CPU)"""
+    if not isinstance(checkpoint, dict):
+        checkpoint = torch.load(checkpoint, map_location="cpu")
+    if checkpoint.get('mode') != 'static':
+        raise ValueError("Not a static INT8 checkpoint (re-run quantize.py --mode static)")
+    backend = checkpoint.get('backend') or default_backend()
+    if backend not in torch.backends.quantized.supported_engines:
+        backend = default_backend()
+    skeleton = load_float_model(None, "cpu")
+    architecture = checkpoint.get('architecture')
+    if architecture is not None and architecture != type(skeleton).__name__:
+        raise ValueError(f"Checkpoint was quantized from {architecture}, but this build has {type(skeleton).__name__}")
+    with warnings.catch_warnings():
+        # Observers in the skeleton never saw data; the loaded state replaces their qparams
+        warnings.simplefilter("ignore")
+        model = convert_static(prepare_static(skeleton, backend))
+    model.load_state_dict(checkpoint['model_state_dict'])
+    return model.eval()
+
+
+# --- CALIBRATION DATA ---
+
+def _encode_pairs(items: List[Tuple[Any, str]], batch_size: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    encoders.load()
+    vision, text = [], []
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        vision.append(encoders.encode_vision([image for image, _ in batch]).float().cpu())
+        text.append(encoders.encode_text([query for _, query in batch]).float().cpu())
+    return torch.cat(vision), torch.cat(text)
+
+
+def load_calibration_pairs(
+    data_path: Optional[str] = None,
+    recordings: Optional[List[str]] = None,
+    samples: int = 100,
+    batch_size: int = 32,
+    allow_random: bool = False
+) -> Tuple[torch.Tensor, torch.Tensor, str]:
+    """
+    Up to `samples` (vision, text) embedding pairs, and where they came from.
+
+    Without a data file or recordings this raises, unless `allow_random`
+    (demos only: random activation ranges do not match production traffic).
+    """
+    if data_path:
+        if Path(data_path).suffix == ".npz":
+            data = np.load(data_path)
+            vision, text = torch.from_numpy(data['vision']), torch.from_numpy(data['text'])
+        else:
+            data = torch.load(data_path, map_location="cpu")
+            vision, text = torch.as_tensor(data['vision']), torch.as_tensor(data['text'])
+        if vision.shape != text.shape or vision.dim() != 2:
+            raise ValueError(f"Expected matching [N, {VISION_DIM}] vision and text arrays, got {tuple(vision.shape)} and {tuple(text.shape)}")
+        return vision[:samples].float(), text[:samples].float(), data_path
+
+    if recordings:
+        from replay import load_records, resolve_payloads
+        records, _ = resolve_payloads(load_records(recordings))
+        items = []
+        for meta, payloads in records:
+            if meta.get("endpoint") not in CALIBRATION_ENDPOINTS:
+                continue
+            for payload in payloads:
+                try:
+                    items.append((decode_image(payload), meta.get("text_query") or DEFAULT_QUERY))
+                except Exception:
+                    continue  # Not an image (e.g. a truncated sample)
+                if len(items) >= samples:
+                    break
+            if len(items) >= samples:
+                break
+        if not items:
+            raise ValueError(f"No replayable vision requests in {recordings}")
+        vision, text = _encode_pairs(items, batch_size)
+        return vision, text, f"{len(items)} recorded requests"
+
+    if not allow_random:
+        raise ValueError("No calibration data: pass --calibration-data or --calibration-recordings "
+                         "(or --allow-random-calibration for a demo)")
+    print("⚠️  Calibrating on random embeddings; activation ranges will not match production traffic.")
+    generator = torch.Generator().manual_seed(0)
+    return (torch.randn(samples, VISION_DIM, generator=generator),
+            torch.randn(samples, VISION_DIM, generator=generator), "random")
+
+
+def compare_outputs(reference: nn.Module, quantized: nn.Module, vision: torch.Tensor, text: torch.Tensor) -> Dict[str, float]:
+    """How closely the INT8 model tracks FP32 on the calibration pairs"""
+    with torch.no_grad():
+        expected = reference(vision, text)
+        actual = quantized(vision, text)
+    return {
+        "prediction_cosine": F.cosine_similarity(expected['prediction'], actual['prediction'], dim=-1).mean().item(),
+        "world_state_max_abs_err": (expected['world_state_logits'] - actual['world_state_logits']).abs().max().item(),
+        "action_agreement": (expected['action_logits'].argmax(-1) == actual['action_logits'].argmax(-1)).float().mean().item(),
+    }
+
+
+# --- DYNAMIC QUANTIZATION ---
+
+def quantize_dynamic_heads(model: nn.Module) -> nn.Module:
+    """Weights-only INT8 for the predictor and heads"""
+    # Quantize the predictor (main compute)
+    for name in ('predictor', 'world_head', 'agent_head'):
+        if hasattr(model, name):
+            setattr(model, name, torch.quantization.quantize_dynamic(
+                getattr(model, name),
+                {nn.Linear},  # Quantize Linear layers
+                dtype=torch.qint8
+            ))
+            print(f"✅ {name} quantized")
+    return model
+
+
+def quantize_model(
+    checkpoint_path: str = "navajepa_sota.pth",
+    output_path: str = "navajepa_int8_quantized.pth",
+    calibration_samples: int = 100,
+    mode: str = "static",
+    calibration_data: Optional[str] = None,
+    calibration_recordings: Optional[List[str]] = None,
+    backend: Optional[str] = None,
+    allow_random_calibration: bool = False
+):
+    """
+    Quantize NavaFlow-VL-JEPA model to INT8 for production deployment.
+
+    Args:
+        checkpoint_path: Path to trained model checkpoint
+        output_path: Path to save quantized model
+        calibration_samples: Number of (vision, text) pairs for calibration (static mode)
+        mode: "static" (weights and activations) or "dynamic" (weights only)
+        calibration_data: .pt/.npz file with `vision` and `text` embeddings
+        calibration_recordings: Request recording directories or .navrec files
+        backend: Quantized CPU engine (default: x86, else fbgemm, else qnnpack)
+        allow_random_calibration: Calibrate on random embeddings when no data is given (demos only)
+    """
+    if mode not in ("static", "dynamic"):
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    # Quantized kernels are CPU-only; static mode always calibrates on CPU
+    device = "cuda" if torch.cuda.is_available() and mode == "dynamic" else "cpu"
+    print(f"🔍 Starting {mode.capitalize()} Quantization on {device}...")
+
+    model = load_float_model(checkpoint_path, device)
+    config = {
+        'VISION_DIM': VISION_DIM,
+        'TEXT_DIM': TEXT_DIM,
+        'EMBEDDING_DIM': EMBEDDING_DIM,
+        'NUM_AGENT_ACTIONS': NUM_AGENT_ACTIONS
+    }
+
+    if mode == "dynamic":
+        # --- DYNAMIC QUANTIZATION (PTQ) ---
+        print("📊 Applying Dynamic Quantization...")
+        reference = None
+        quantized = quantize_dynamic_heads(model)
+        extra = {}
+    else:
+        # --- STATIC QUANTIZATION (PTQ) ---
+        backend = backend or default_backend()
+        vision, text, source = load_calibration_pairs(
+            calibration_data, calibration_recordings, calibration_samples, allow_random=allow_random_calibration
         )
-        print("✅ Agent head quantized")
-    
+        print(f"📊 Calibrating on {len(vision)} pairs ({source}), backend {backend}...")
+        reference = copy.deepcopy(model).cpu().eval()
+
+        prepared = prepare_static(model, backend)
+        fused = sum(isinstance(m, LinearGELU) for m in prepared.modules())
+        with torch.no_grad():
+            for i in range(0, len(vision), 32):
+                prepared(vision[i:i + 32], text[i:i + 32])
+        check_calibrated(prepared)
+        quantized = convert_static(prepared).eval()
+        print(f"✅ Converted to INT8 ({fused} Linear+GELU fused)")
+
+        accuracy = compare_outputs(reference, quantized, vision, text)
+        print(f"   Prediction cosine vs FP32: {accuracy['prediction_cosine']:.4f}")
+        print(f"   Action agreement vs FP32:  {accuracy['action_agreement'] * 100:.1f}%")
+        extra = {
+            'backend': backend,
+            'architecture': type(reference).__name__,
+            'calibration': {'source': source, 'samples': len(vision)},
+            'accuracy': accuracy
+        }
+
     # --- SAVE QUANTIZED MODEL ---
     torch.save({
-        'model_state_dict': model.state_dict(),
+        'model_state_dict': quantized.state_dict(),
         'quantized': True,
         'dtype': 'int8',
-        'config': {
-            'VISION_DIM': VISION_DIM,
-            'TEXT_DIM': TEXT_DIM,
-            'EMBEDDING_DIM': EMBEDDING_DIM,
-            'NUM_AGENT_ACTIONS': NUM_AGENT_ACTIONS
-        }
+        'mode': mode,
+        **extra,
+        'config': config
     }, output_path)
-    
+
     print(f"✅ Quantization Complete!")
     print(f"📦 Model saved as '{output_path}'")
-    
+
     # --- BENCHMARK QUANTIZED MODEL ---
-    print("\\n📊 Benchmarking quantized model...")
-    model.eval()
-    
-    dummy_vision = torch.randn(1, 768).to(device)
-    dummy_text = torch.randn(1, 768).to(device)
-    
-    # Warmup
-    with torch.no_grad():
-        for _ in range(10):
-            if hasattr(model, 'forward'):
-                _ = model(dummy_vision, dummy_text)
-            else:
-                _ = model.predictor(torch.cat([dummy_vision, dummy_text], dim=-1))
-    
-    # Benchmark
-    import time
-    times = []
-    with torch.no_grad():
-        for _ in range(100):
-            start = time.time()
-            if hasattr(model, 'forward'):
-                _ = model(dummy_vision, dummy_text)
-            else:
-                _ = model.predictor(torch.cat([dummy_vision, dummy_text], dim=-1))
-            if device == "cuda":
-                torch.cuda.synchronize()
-            times.append((time.time() - start) * 1000)
-    
-    avg_latency = sum(times) / len(times)
+    print("\n📊 Benchmarking quantized model...")
+    bench_device = device if mode == "dynamic" else "cpu"
+    dummy_vision = torch.randn(1, 768).to(bench_device)
+    dummy_text = torch.randn(1, 768).to(bench_device)
+
+    def benchmark(m: nn.Module) -> float:
+        with torch.no_grad():
+            # Warmup
+            for _ in range(10):
+                m(dummy_vision, dummy_text)
+            times = []
+            for _ in range(100):
+                start = time.perf_counter()
+                m(dummy_vision, dummy_text)
+                if bench_device == "cuda":
+                    torch.cuda.synchronize()
+                times.append((time.perf_counter() - start) * 1000)
+        return sum(times) / len(times)
+
+    if reference is not None:
+        print(f"   FP32 Latency:    {benchmark(reference):.4f} ms")
+    avg_latency = benchmark(quantized)
     print(f"   Average Latency: {avg_latency:.4f} ms")
     print(f"   Target: 0.15 ms")
     print(f"   Status: {'✅ MET' if avg_latency <= 0.15 else '⚠️  OPTIMIZATION NEEDED'}")
-    
-    return model
 
-if __name__ == "__main__":
+    return quantized
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize NavaFlow-VL-JEPA to INT8")
+    parser.add_argument("--checkpoint", default="navajepa_sota.pth", help="FP32 checkpoint")
+    parser.add_argument("--output", default="navajepa_int8_quantized.pth", help="Where to write the INT8 checkpoint")
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--calibration-samples", type=int, default=100, help="(vision, text) pairs used for calibration")
+    parser.add_argument("--calibration-data", default=None, help=".pt/.npz file with `vision` and `text` embeddings [N, 768]")
+    parser.add_argument("--calibration-recordings", nargs="+", default=None,
+                        help="Recording directories or .navrec files (NAVAFLOW_RECORD_DIR)")
+    parser.add_argument("--allow-random-calibration", action="store_true",
+                        help="Calibrate on random embeddings when no data is given (demos only)")
+    parser.add_argument("--backend", default=None, help="Quantized engine: x86, fbgemm or qnnpack")
+    args = parser.parse_args()
+    if (args.mode == "static" and not args.calibration_data and not args.calibration_recordings
+            and not args.allow_random_calibration):
+        parser.error("static mode needs --calibration-data or --calibration-recordings "
+                     "(or --allow-random-calibration for a demo)")
+
     print("=" * 60)
     print("NavaFlow-VL-JEPA Model Quantization")
     print("=" * 60)
-    
-    quantize_model()
-    
-    print("\\n" + "=" * 60)
+
+    quantize_model(
+        args.checkpoint, args.output, args.calibration_samples, args.mode,
+        args.calibration_data, args.calibration_recordings, args.backend, args.allow_random_calibration
+    )
+
+    print("\n" + "=" * 60)
     print("✅ Quantization process complete!")
     print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Production Request Recorder for NavaFlow Inference
+
+Opt-in capture of live traffic for tuning batching and caching. The request
+path only enqueues a reference to the payload; hashing, sampling, encoding
+and disk I/O all happen on a background writer thread. When the queue is
+full records are dropped (and counted) rather than slowing requests down.
+
+Log files are rotated by size and read back by `replay.py`.
+
+File layout:
+
+    MAGIC (8 bytes)
+    record*
+
+    record := meta_len u32 | meta (utf-8 JSON) | n_payloads u16 |
+              (sample_len u32 | sample bytes){n_payloads}
+
+`meta` holds the timestamp, endpoint, headers of interest, original status
+and latency, plus `payloads: [{sha256, size, sampled}]`. Unsampled payloads
+are written with sample_len 0.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"NAVREC1\n"
+_U32 = struct.Struct("!I")
+_U16 = struct.Struct("!H")
+
+
+class RequestRecorder:
+    """
+    Asynchronous, rotating binary request log.
+
+    Args:
+        directory: Where log files are written
+        max_file_bytes: Rotate once the current file exceeds this size
+        max_files: Oldest files beyond this count are deleted
+        sample_rate: Fraction of requests whose payload bytes are stored
+        max_sample_bytes: Payloads larger than this are hashed but not stored
+        queue_size: Records buffered in memory before new ones are dropped
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_file_bytes: int = 256 * 1024 * 1024,
+        max_files: int = 8,
+        sample_rate: float = 1.0,
+        max_sample_bytes: int = 4 * 1024 * 1024,
+        queue_size: int = 10000
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.max_sample_bytes = max_sample_bytes
+
+        self._queue: "queue.Queue[Optional[Tuple[Dict[str, Any], Sequence[bytes]]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._file_bytes = 0
+        self._random = random.Random()
+
+        self.recorded = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the background writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="request-recorder", daemon=True)
+            self._thread.start()
+            logger.info(f"✅ Request recorder writing to {self.directory}")
+
+    def stop(self, timeout: float = 5.0):
+        """Flush queued records and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def record(self, endpoint: str, meta: Dict[str, Any], payloads: Sequence[bytes] = ()):
+        """
+        Enqueue one request. Never blocks; drops the record if the writer is behind.
+        """
+        entry = {"ts": time.time(), "endpoint": endpoint, **meta}
+        try:
+            self._queue.put_nowait((entry, payloads))
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "directory": str(self.directory),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+        }
+
+    # --- WRITER THREAD ---
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+                self.recorded += 1
+            except Exception as e:
+                logger.error(f"Request recorder write failed: {e}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, meta: Dict[str, Any], payloads: Sequence[bytes]):
+        sampled = self._random.random() < self.sample_rate
+        samples: List[bytes] = []
+        meta["payloads"] = []
+        for payload in payloads:
+            keep = sampled and len(payload) <= self.max_sample_bytes
+            meta["payloads"].append({
+                "sha256": hashlib.sha256(payload).hexdigest(),
+                "size": len(payload),
+                "sampled": keep,
+            })
+            samples.append(payload if keep else b"")
+
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        parts = [_U32.pack(len(meta_bytes)), meta_bytes, _U16.pack(len(samples))]
+        for sample in samples:
+            parts.append(_U32.pack(len(sample)))
+            parts.append(sample)
+        record = b"".join(parts)
+
+        if self._file is None or self._file_bytes + len(record) > self.max_file_bytes:
+            self._rotate()
+        self._file.write(record)
+        self._file_bytes += len(record)
+        if self._queue.empty():
+            self._file.flush()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        path = self.directory / f"requests-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.time_ns() % 10**9:09d}.navrec"
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file_bytes = len(MAGIC)
+
+        if self.max_files > 0:
+            logs = sorted(self.directory.glob("requests-*.navrec"), key=lambda p: p.stat().st_mtime)
+            for old in logs[:-self.max_files]:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+
+def read_log(path: Path) -> Iterator[Tuple[Dict[str, Any], List[bytes]]]:
+    """Yield (meta, payload samples) records from one log file"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a NavaFlow request log")
+        while True:
+            head = f.read(_U32.size)
+            if len(head) < _U32.size:
+                return
+            (meta_len,) = _U32.unpack(head)
+            meta_bytes = f.read(meta_len)
+            count_bytes = f.read(_U16.size)
+            if len(meta_bytes) < meta_len or len(count_bytes) < _U16.size:
+                return  # Truncated tail from a crash mid-write
+            samples = []
+            for _ in range(_U16.unpack(count_bytes)[0]):
+                size_bytes = f.read(_U32.size)
+                if len(size_bytes) < _U32.size:
+                    return
+                samples.append(f.read(_U32.unpack(size_bytes)[0]))
+            yield json.loads(meta_bytes), samples
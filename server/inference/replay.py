@@ -0,0 +1,213 @@
+"""
+Deterministic Traffic Replay for NavaFlow Inference
+
+Re-drives traffic captured by the request recorder (NAVAFLOW_RECORD_DIR)
+against any server build and reports latency deltas per endpoint.
+
+    python replay.py ./recordings --target http://localhost:8000 --speed 1
+    python replay.py ./recordings --speed 10     # 10x accelerated
+    python replay.py ./recordings --speed 0      # as fast as possible
+
+Replay is deterministic: records are sent in capture order, and payloads that
+were not sampled are substituted with a sampled payload from the same endpoint
+chosen by content hash, so every run sends identical bytes.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from recorder import read_log
+
+PRIORITY_HEADER = "X-NavaFlow-Priority"
+BOUNDARY = "navaflow-replay-7f3c1e9a2b"
+
+
+def load_records(paths: List[str]) -> List[Tuple[Dict[str, Any], List[bytes]]]:
+    """Load and order records from log files or directories"""
+    files: List[Path] = []
+    for p in map(Path, paths):
+        files.extend(sorted(p.glob("requests-*.navrec")) if p.is_dir() else [p])
+    records = [record for f in files for record in read_log(f)]
+    records.sort(key=lambda r: r[0]["ts"])
+    return records
+
+
+def resolve_payloads(records) -> Tuple[List[Tuple[Dict[str, Any], List[bytes]]], int]:
+    """Fill unsampled payloads deterministically; drop records that cannot be replayed"""
+    pools: Dict[str, List[bytes]] = {}
+    for meta, samples in records:
+        for info, sample in zip(meta.get("payloads", []), samples):
+            if info.get("sampled"):
+                pools.setdefault(meta["endpoint"], []).append(sample)
+
+    resolved, skipped = [], 0
+    for meta, samples in records:
+        pool = pools.get(meta["endpoint"], [])
+        payloads = []
+        for info, sample in zip(meta.get("payloads", []), samples):
+            if info.get("sampled"):
+                payloads.append(sample)
+            elif pool:
+                payloads.append(pool[int(info["sha256"], 16) % len(pool)])
+            else:
+                payloads = None
+                break
+        if payloads is None:
+            skipped += 1
+        else:
+            resolved.append((meta, payloads))
+    return resolved, skipped
+
+
+def build_request(meta: Dict[str, Any], payloads: List[bytes]) -> Tuple[bytes, Dict[str, str]]:
+    """Rebuild the multipart body for a recorded request"""
+    boundary = BOUNDARY
+    file_field = "images" if meta["endpoint"] == "/predict/batch" else "image"
+    parts = []
+    if meta.get("text_query") is not None:
+        parts.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"text_query\"\r\n\r\n"
+                     f"{meta['text_query']}\r\n".encode("utf-8"))
+    for i, payload in enumerate(payloads):
+        parts.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{file_field}\"; "
+                     f"filename=\"replay-{i}\"\r\nContent-Type: application/octet-stream\r\n\r\n".encode())
+        parts.append(payload)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    if meta.get("priority"):
+        headers[PRIORITY_HEADER] = meta["priority"]
+    return b"".join(parts), headers
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class Replayer:
+    """Open-loop replay: requests are sent on schedule regardless of responses"""
+
+    def __init__(self, target: str, speed: float, concurrency: int):
+        url = urlparse(target)
+        self.host = url.hostname or "localhost"
+        self.port = url.port or 80
+        self.speed = speed
+        self.concurrency = concurrency
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            self._local.conn = conn
+        return conn
+
+    def _send(self, meta: Dict[str, Any], payloads: List[bytes]) -> Tuple[str, Optional[int], float]:
+        body, headers = build_request(meta, payloads)
+        start = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request("POST", meta["endpoint"], body=body, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            status = response.status
+        except Exception:
+            self._local.conn = None
+            return meta["endpoint"], None, (time.perf_counter() - start) * 1000
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        # Compare like with like: recordings hold the server-side latency
+        try:
+            data = json.loads(body)
+            latency_ms = data.get("latency_ms", data.get("total_latency_ms", latency_ms))
+        except ValueError:
+            pass
+        return meta["endpoint"], status, latency_ms
+
+    def run(self, records) -> List[Tuple[Dict[str, Any], Tuple[str, Optional[int], float]]]:
+        if not records:
+            return []
+        first_ts = records[0][0]["ts"]
+        wall_start = time.perf_counter()
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for meta, payloads in records:
+                if self.speed > 0:
+                    delay = (meta["ts"] - first_ts) / self.speed - (time.perf_counter() - wall_start)
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append((meta, pool.submit(self._send, meta, payloads)))
+            return [(meta, future.result()) for meta, future in futures]
+
+
+def report(results, skipped: int) -> Dict[str, Any]:
+    """Per-endpoint recorded vs replayed latency"""
+    by_endpoint: Dict[str, Dict[str, List[float]]] = {}
+    errors: Dict[str, int] = {}
+    for meta, (endpoint, status, latency_ms) in results:
+        bucket = by_endpoint.setdefault(endpoint, {"recorded": [], "replayed": []})
+        if status is None or status >= 500:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+            continue
+        if meta.get("latency_ms") is not None:
+            bucket["recorded"].append(meta["latency_ms"])
+        bucket["replayed"].append(latency_ms)
+
+    summary = {"skipped": skipped, "endpoints": {}}
+    for endpoint, bucket in by_endpoint.items():
+        row = {"requests": len(bucket["replayed"]), "errors": errors.get(endpoint, 0)}
+        for pct in (50, 99):
+            recorded = _percentile(bucket["recorded"], pct)
+            replayed = _percentile(bucket["replayed"], pct)
+            row[f"recorded_p{pct}_ms"] = round(recorded, 3)
+            row[f"replayed_p{pct}_ms"] = round(replayed, 3)
+            row[f"delta_p{pct}_ms"] = round(replayed - recorded, 3)
+        summary["endpoints"][endpoint] = row
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded NavaFlow traffic and report latency deltas")
+    parser.add_argument("logs", nargs="+", help="Recording directories or .navrec files")
+    parser.add_argument("--target", default="http://localhost:8000", help="Server build to replay against")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Timing multiplier: 1 = original, 10 = 10x faster, 0 = no delays")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max requests in flight")
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N records")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    records, skipped = resolve_payloads(load_records(args.logs))
+    if args.limit is not None:
+        records = records[:args.limit]
+
+    results = Replayer(args.target, args.speed, args.concurrency).run(records)
+    summary = report(results, skipped)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print("=" * 72)
+    print(f"NavaFlow Replay: {len(results)} requests against {args.target} (speed {args.speed}x)")
+    print("=" * 72)
+    for endpoint, row in summary["endpoints"].items():
+        print(f"{endpoint:<18} n={row['requests']:<6} errors={row['errors']:<4} "
+              f"p50 {row['recorded_p50_ms']:.2f} -> {row['replayed_p50_ms']:.2f} ms ({row['delta_p50_ms']:+.2f})  "
+              f"p99 {row['recorded_p99_ms']:.2f} -> {row['replayed_p99_ms']:.2f} ms ({row['delta_p99_ms']:+.2f})")
+    if skipped:
+        print(f"⚠️  {skipped} records skipped (no sampled payload available)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Exact-Match Response Cache for Deterministic Generations
+
+With `temperature=0` Ollama is deterministic for a given model build, prompt
+and options, so repeated prompts can be answered without re-running the
+generation. Entries are keyed on:
+
+    sha256(model digest | prompt | canonical JSON of options)
+
+Using the model *digest* (not its name) means re-pulling or re-converting a
+model naturally invalidates its entries.
+
+Two tiers:
+
+- Memory: LRU bounded by entry count, with TTL
+- Disk (optional): SQLite file that survives restarts; hits are promoted to
+  memory. Disk I/O runs in a worker thread so the event loop never blocks.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TIER_MEMORY = "memory"
+TIER_DISK = "disk"
+
+
+def make_cache_key(model_digest: str, prompt: str, options: Dict[str, Any]) -> str:
+    """Stable key for a deterministic generation"""
+    digest = hashlib.sha256()
+    digest.update(model_digest.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(options, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _DiskTier:
+    """SQLite-backed tier; every method is blocking and called via a thread"""
+
+    def __init__(self, path: Path, max_entries: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created_at)")
+        self._conn.commit()
+        self._puts = 0
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, model: str, value: Dict[str, Any], created_at: float, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(value), created_at, expires_at)
+            )
+            self._puts += 1
+            # Amortized cleanup: drop expired rows and trim to max_entries
+            if self._puts % 256 == 0:
+                self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Two-tier exact-match cache with per-model hit accounting.
+
+    Args:
+        max_entries: Memory tier capacity (LRU)
+        ttl_s: Entry lifetime in seconds
+        disk_path: SQLite file for the persistent tier (None = memory only)
+        max_disk_entries: Disk tier capacity (oldest entries are trimmed)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_s: float = 3600.0,
+        disk_path: Optional[Path] = None,
+        max_disk_entries: int = 1000000
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._memory: "OrderedDict[str, Tuple[float, float, Dict[str, Any]]]" = OrderedDict()
+        self._disk = _DiskTier(disk_path, max_disk_entries) if disk_path else None
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _model_stats(self, model: str) -> Dict[str, int]:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        return stats
+
+    async def get(self, key: str, model: str) -> Tuple[Optional[Dict[str, Any]], Optional[str], float]:
+        """Returns (value, tier, age_s); value is None on a miss"""
+        now = time.time()
+        stats = self._model_stats(model)
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            created_at, expires_at, value = entry
+            if expires_at >= now:
+                self._memory.move_to_end(key)
+                stats["memory_hits"] += 1
+                return value, TIER_MEMORY, now - created_at
+            del self._memory[key]
+
+        if self._disk is not None:
+            try:
+                found = await asyncio.to_thread(self._disk.get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache disk read failed: {e}")
+                found = None
+            if found is not None:
+                value, created_at = found
+                self._remember(key, value, created_at, created_at + self.ttl_s)
+                stats["disk_hits"] += 1
+                return value, TIER_DISK, now - created_at
+
+        stats["misses"] += 1
+        return None, None, 0.0
+
+    async def put(self, key: str, model: str, value: Dict[str, Any]):
+        now = time.time()
+        self._remember(key, value, now, now + self.ttl_s)
+        self._model_stats(model)["stores"] += 1
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.put, key, model, value, now, now + self.ttl_s)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache disk write failed: {e}")
+
+    def _remember(self, key: str, value: Dict[str, Any], created_at: float, expires_at: float):
+        self._memory[key] = (created_at, expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        per_model = {}
+        for model, s in self._stats.items():
+            hits = s["memory_hits"] + s["disk_hits"]
+            lookups = hits + s["misses"]
+            per_model[model] = {**s, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+        return {
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "disk": str(self._disk.path) if self._disk is not None else None,
+            "models": per_model,
+        }
@@ -0,0 +1,287 @@
+"""
+Persistent Ollama Runner Pool
+
+Fallback generation path for when the gateway cannot use httpx. Spawning
+`ollama run <model> <prompt>` per request pays process startup and model
+attach every time and buffers the whole output. Instead, a fixed pool of
+long-lived worker processes (`python runner_pool.py --worker`) take requests
+over their stdin/stdout pipes and stream Ollama's NDJSON back as it arrives.
+
+Pipes use the binary_protocol frame header:
+
+    gateway -> worker   OP_GENERATE  JSON request (Ollama /api/generate body + "host")
+    worker -> gateway   OP_CHUNK     one NDJSON line
+                        OP_DONE      end of request; STATUS_ERROR carries
+                                     {"status_code": ..., "error": ...}
+
+Workers call Ollama's HTTP API with the standard library only; if it is
+unreachable they fall back to streaming `ollama run`. Each worker serves one
+request at a time and is replaced after `max_requests` requests, when it
+crashes, or when a caller abandons a stream mid-request.
+"""
+
+import asyncio
+import codecs
+import json
+import os
+import subprocess
+import sys
+import time
+import logging
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Optional
+
+from binary_protocol import HEADER, HEADER_SIZE, MAX_FRAME_BYTES, STATUS_ERROR, STATUS_OK, ProtocolError, encode_frame
+
+logger = logging.getLogger(__name__)
+
+OP_GENERATE = 16
+OP_CHUNK = 17
+OP_DONE = 18
+
+WORKER_SCRIPT = str(Path(__file__).resolve())
+
+
+class RunnerError(Exception):
+    """Failed generation; `status_code` follows HTTP semantics"""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# --- WORKER PROCESS ---
+
+def _read_exact(stream: BinaryIO, n: int) -> Optional[bytes]:
+    """Read n bytes; None on a clean EOF before the first byte"""
+    buf = b""
+    while len(buf) < n:
+        data = stream.read(n - len(buf))
+        if not data:
+            if not buf:
+                return None
+            raise ProtocolError("Pipe closed mid-frame")
+        buf += data
+    return buf
+
+
+def _worker_generate(request: Dict[str, Any], send_chunk: Callable[[bytes], None], timeout: float):
+    host = request.pop("host")
+    body = json.dumps({**request, "stream": True}).encode("utf-8")
+    http_request = urllib.request.Request(
+        f"{host}/api/generate", data=body, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            for line in response:
+                if line.strip():
+                    send_chunk(line if line.endswith(b"\n") else line + b"\n")
+        return
+    except urllib.error.HTTPError as e:
+        raise RunnerError(e.read().decode("utf-8", errors="replace"), e.code)
+    except urllib.error.URLError as e:
+        logger.warning(f"Ollama API unreachable at {host} ({e.reason}); using the ollama CLI")
+    _worker_generate_cli(request, send_chunk)
+
+
+def _worker_generate_cli(request: Dict[str, Any], send_chunk: Callable[[bytes], None]):
+    model = request["model"]
+    try:
+        process = subprocess.Popen(
+            ["ollama", "run", model, request.get("prompt", "")],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except OSError as e:
+        raise RunnerError(f"Ollama is not reachable and the CLI failed: {e}", 503)
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = os.read(process.stdout.fileno(), 4096)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            send_chunk(json.dumps({"model": model, "response": text, "done": False}).encode("utf-8") + b"\n")
+    if process.wait() != 0:
+        raise RunnerError(f"Ollama execution failed: {process.stderr.read().decode('utf-8', errors='replace')}", 500)
+    send_chunk(json.dumps({"model": model, "response": "", "done": True}).encode("utf-8") + b"\n")
+
+
+def run_worker(timeout: float = 300.0):
+    """Serve OP_GENERATE frames on stdin/stdout until stdin closes"""
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    # stdout carries frames; anything printed goes to stderr instead
+    sys.stdout = sys.stderr
+
+    def send(request_id: int, op: int, payload: bytes = b"", status: int = STATUS_OK):
+        stdout.write(encode_frame(request_id, op, payload, status))
+        stdout.flush()
+
+    while True:
+        header = _read_exact(stdin, HEADER_SIZE)
+        if header is None:
+            return
+        length, request_id, op, _ = HEADER.unpack(header)
+        if length > MAX_FRAME_BYTES:
+            raise ProtocolError(f"Frame of {length} bytes exceeds limit")
+        payload = _read_exact(stdin, length) or b""
+        try:
+            if op != OP_GENERATE:
+                raise RunnerError(f"Unsupported op {op}", 400)
+            _worker_generate(json.loads(payload), lambda chunk: send(request_id, OP_CHUNK, chunk), timeout)
+            send(request_id, OP_DONE)
+        except Exception as e:
+            status_code = e.status_code if isinstance(e, RunnerError) else 500
+            error = {"status_code": status_code, "error": str(e)}
+            send(request_id, OP_DONE, json.dumps(error).encode("utf-8"), STATUS_ERROR)
+
+
+# --- POOL ---
+
+class _Runner:
+    __slots__ = ("process", "requests", "started_at")
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.requests = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+
+class RunnerPool:
+    """
+    Fixed-size pool of worker processes.
+
+    Usage:
+        await pool.start()
+        async for line in pool.generate({"host": ..., "model": ..., "prompt": ...}):
+            ...
+    """
+
+    def __init__(self, size: int = 2, max_requests: int = 1000, request_timeout: float = 300.0):
+        self.size = max(1, size)
+        self.max_requests = max_requests
+        self.request_timeout = request_timeout
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+
+        self.requests = 0
+        self.spawned = 0
+        self.recycled = 0
+        self.crashed = 0
+
+    async def start(self):
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._spawn())
+        logger.info(f"✅ Runner pool started ({self.size} workers)")
+
+    async def aclose(self):
+        self._closed = True
+        while not self._idle.empty():
+            await self._stop(self._idle.get_nowait(), graceful=True)
+
+    async def _spawn(self) -> _Runner:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT, "--worker", "--timeout", str(self.request_timeout),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE
+        )
+        self.spawned += 1
+        return _Runner(process)
+
+    @staticmethod
+    async def _stop(runner: _Runner, graceful: bool):
+        if runner.alive and graceful:
+            runner.process.stdin.close()
+            try:
+                await asyncio.wait_for(runner.process.wait(), timeout=5)
+                return
+            except asyncio.TimeoutError:
+                pass
+        if runner.alive:
+            runner.process.kill()
+            await runner.process.wait()
+
+    async def _replace(self, runner: _Runner, graceful: bool):
+        """Stop `runner` and put a fresh worker in the pool (runs as a task)"""
+        await self._stop(runner, graceful)
+        while not self._closed:
+            try:
+                self._idle.put_nowait(await self._spawn())
+                return
+            except OSError as e:
+                logger.error(f"Could not start runner worker: {e}; retrying")
+                await asyncio.sleep(1)
+
+    async def generate(self, request: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Stream the NDJSON lines of one generation; errors raise RunnerError"""
+        runner = await self._idle.get()
+        if not runner.alive:
+            self.crashed += 1
+            logger.warning(f"Runner worker exited with {runner.process.returncode}; replacing")
+            runner = await self._spawn()
+
+        finished = False
+        try:
+            runner.process.stdin.write(encode_frame(runner.requests, OP_GENERATE, json.dumps(request).encode("utf-8")))
+            await runner.process.stdin.drain()
+            runner.requests += 1
+            self.requests += 1
+            while True:
+                length, _, op, status = HEADER.unpack(await runner.process.stdout.readexactly(HEADER_SIZE))
+                payload = await runner.process.stdout.readexactly(length) if length else b""
+                if op == OP_CHUNK:
+                    yield payload
+                    continue
+                finished = True
+                if status != STATUS_OK:
+                    error = json.loads(payload)
+                    raise RunnerError(error["error"], error["status_code"])
+                return
+        except (asyncio.IncompleteReadError, BrokenPipeError, ConnectionResetError) as e:
+            self.crashed += 1
+            raise RunnerError(f"Runner worker died: {type(e).__name__}", 502)
+        finally:
+            if self._closed:
+                asyncio.ensure_future(self._stop(runner, graceful=finished))
+            elif not finished:
+                # Crashed, or the caller walked away mid-request: the worker is
+                # still writing this request's frames, so it cannot be reused
+                asyncio.ensure_future(self._replace(runner, graceful=False))
+            elif runner.requests >= self.max_requests:
+                self.recycled += 1
+                asyncio.ensure_future(self._replace(runner, graceful=True))
+            else:
+                self._idle.put_nowait(runner)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize(),
+            "max_requests": self.max_requests,
+            "requests": self.requests,
+            "spawned": self.spawned,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="NavaFlow Ollama runner worker")
+    parser.add_argument("--worker", action="store_true", help="Serve generation frames on stdin/stdout")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Ollama request timeout in seconds")
+    args = parser.parse_args()
+
+    if not args.worker:
+        parser.error("runner_pool.py is started by the gateway with --worker")
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    run_worker(args.timeout)
@@ -0,0 +1,211 @@
+"""
+Priority Batch Scheduler for NavaFlow Inference
+
+Collects concurrent inference requests into micro-batches and always fills
+each batch with higher-priority work first. Interactive dashboard traffic
+therefore never waits behind a bulk backfill for more than one in-flight
+batch, while a starvation guard promotes bulk items that have waited too long.
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Request priority classes (lower value is served first)"""
+    INTERACTIVE = 0
+    BULK = 1
+
+    @classmethod
+    def parse(cls, value: Optional[str], default: "Priority") -> "Priority":
+        """Parse a header value such as 'interactive' or 'bulk'"""
+        if not value:
+            return default
+        try:
+            return cls[value.strip().upper()]
+        except KeyError:
+            return default
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any, future: asyncio.Future):
+        self.item = item
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class _LatencyWindow:
+    """Rolling window of recent latencies for percentile reporting"""
+
+    def __init__(self, size: int = 2048):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value_ms: float):
+        self.samples.append(value_ms)
+        self.count += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class PriorityBatchScheduler:
+    """
+    Micro-batching scheduler with strict priority classes.
+
+    Args:
+        batch_fn: Blocking callable mapping a list of items to a list of results
+            (same order). Runs in the default executor, one batch at a time.
+        max_batch_size: Upper bound on items per batch
+        batch_window_ms: How long to wait for more work after the first item arrives
+        starvation_ms: Bulk items older than this are served ahead of interactive
+            work, using at most a quarter of each batch so a large backfill
+            cannot turn the guard into starvation of the interactive class
+        interactive_slo_ms: Latency target reported for the interactive class
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        batch_window_ms: float = 2.0,
+        starvation_ms: float = 500.0,
+        interactive_slo_ms: float = 50.0
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.batch_window_s = batch_window_ms / 1000.0
+        self.starvation_s = starvation_ms / 1000.0
+        self.max_promoted_per_batch = max(1, max_batch_size // 4)
+        self.interactive_slo_ms = interactive_slo_ms
+
+        self._queues: Dict[Priority, Deque[_Pending]] = {p: deque() for p in Priority}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._latency: Dict[Priority, _LatencyWindow] = {p: _LatencyWindow() for p in Priority}
+        self.batches_run = 0
+        self.starvation_promotions = 0
+
+    async def start(self):
+        """Start the batching loop on the running event loop"""
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and fail any queued work"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for queue in self._queues.values():
+            while queue:
+                pending = queue.popleft()
+                if not pending.future.done():
+                    pending.future.set_exception(RuntimeError("Scheduler stopped"))
+
+    async def submit(self, item: Any, priority: Priority = Priority.INTERACTIVE) -> Any:
+        """Queue one item and wait for its result"""
+        if self._worker is None:
+            await self.start()
+        pending = _Pending(item, asyncio.get_running_loop().create_future())
+        self._queues[priority].append(pending)
+        self._wakeup.set()
+        try:
+            return await pending.future
+        finally:
+            self._latency[priority].add((time.perf_counter() - pending.enqueued_at) * 1000)
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {p.name.lower(): len(q) for p, q in self._queues.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-class latency percentiles and queue depths"""
+        classes = {}
+        for p, window in self._latency.items():
+            classes[p.name.lower()] = {
+                "requests": window.count,
+                "queued": len(self._queues[p]),
+                "p50_ms": round(window.percentile(50), 3),
+                "p99_ms": round(window.percentile(99), 3),
+            }
+        classes["interactive"]["slo_ms"] = self.interactive_slo_ms
+        classes["interactive"]["slo_met"] = classes["interactive"]["p99_ms"] <= self.interactive_slo_ms
+        return {
+            "classes": classes,
+            "batches_run": self.batches_run,
+            "starvation_promotions": self.starvation_promotions,
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": self.batch_window_s * 1000,
+        }
+
+    def _has_work(self) -> bool:
+        return any(self._queues.values())
+
+    def _take_batch(self) -> List[_Pending]:
+        batch: List[_Pending] = []
+        bulk = self._queues[Priority.BULK]
+
+        # Starvation guard: aged bulk items jump ahead of interactive work
+        now = time.perf_counter()
+        while (bulk and len(batch) < self.max_promoted_per_batch
+               and now - bulk[0].enqueued_at >= self.starvation_s):
+            pending = bulk.popleft()
+            if not pending.future.cancelled():
+                batch.append(pending)
+                self.starvation_promotions += 1
+
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue and len(batch) < self.max_batch_size:
+                pending = queue.popleft()
+                if not pending.future.cancelled():
+                    batch.append(pending)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._has_work():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Batching window: only wait if there is room for more work
+            total = sum(len(q) for q in self._queues.values())
+            if total < self.max_batch_size and self.batch_window_s > 0:
+                await asyncio.sleep(self.batch_window_s)
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(None, self.batch_fn, [p.item for p in batch])
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} failed: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            for pending, result in zip(batch, results):
+                if not pending.future.done():
+                    if isinstance(result, Exception):
+                        pending.future.set_exception(result)
+                    else:
+                        pending.future.set_result(result)
@@ -0,0 +1,249 @@
+"""
+Semantic Response Cache for Near-Duplicate Prompts
+
+Incident prompts often repeat with only timestamps or host names changed, so
+an exact-match key misses them. This cache stores each generated response
+with the embedding of its prompt and answers a new prompt with the stored
+response whose prompt is most similar, if the cosine similarity reaches the
+threshold configured for the route.
+
+Lookups use an in-memory random-hyperplane LSH index (numpy only):
+
+- Each unit vector is hashed by `n_tables` groups of `n_bits` hyperplanes;
+  only entries sharing a bucket in some table are scored exactly
+- Below `exact_below` entries the whole namespace is scored directly, which
+  is exact and still well under a millisecond
+
+Entries are partitioned by namespace (model digest and generation options),
+bounded by a global LRU and expire after `ttl_s`.
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _LSHIndex:
+    """Random-hyperplane LSH over unit vectors (cosine similarity)"""
+
+    def __init__(self, dim: int, n_tables: int = 16, n_bits: int = 10, exact_below: int = 2048, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.exact_below = exact_below
+        self._planes = rng.standard_normal((n_tables * n_bits, dim)).astype(np.float32)
+        self._weights = 1 << np.arange(n_bits, dtype=np.int64)
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(n_tables)]
+        self._vectors = np.zeros((64, dim), dtype=np.float32)
+        self._codes: Dict[int, np.ndarray] = {}
+        self._free: List[int] = []
+        self._high_water = 0
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def _hash(self, vec: np.ndarray) -> np.ndarray:
+        bits = (self._planes @ vec > 0).reshape(self.n_tables, self.n_bits)
+        return bits.astype(np.int64) @ self._weights
+
+    def add(self, vec: np.ndarray) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._high_water
+            self._high_water += 1
+            if slot >= len(self._vectors):
+                grown = np.zeros((len(self._vectors) * 2, self.dim), dtype=np.float32)
+                grown[:len(self._vectors)] = self._vectors
+                self._vectors = grown
+        self._vectors[slot] = vec
+        codes = self._hash(vec)
+        for table, code in zip(self._tables, codes.tolist()):
+            table.setdefault(code, set()).add(slot)
+        self._codes[slot] = codes
+        return slot
+
+    def remove(self, slot: int):
+        codes = self._codes.pop(slot, None)
+        if codes is None:
+            return
+        for table, code in zip(self._tables, codes.tolist()):
+            bucket = table.get(code)
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del table[code]
+        self._free.append(slot)
+
+    def search(self, vec: np.ndarray) -> Tuple[Optional[int], float]:
+        """Most similar entry as (slot, cosine similarity); (None, -1.0) if there is none"""
+        if len(self._codes) <= self.exact_below:
+            candidates = self._codes.keys()
+        else:
+            candidates = set()
+            for table, code in zip(self._tables, self._hash(vec).tolist()):
+                bucket = table.get(code)
+                if bucket:
+                    candidates.update(bucket)
+        if not candidates:
+            return None, -1.0
+        slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        scores = self._vectors[slots] @ vec
+        best = int(np.argmax(scores))
+        return int(slots[best]), float(scores[best])
+
+
+class _Entry:
+    __slots__ = ("prompt", "value", "created_at", "expires_at")
+
+    def __init__(self, prompt: str, value: Dict[str, Any], created_at: float, expires_at: float):
+        self.prompt = prompt
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+
+class SemanticMatch:
+    __slots__ = ("prompt", "value", "similarity", "age_s")
+
+    def __init__(self, prompt: str, value: Dict[str, Any], similarity: float, age_s: float):
+        self.prompt = prompt
+        self.value = value
+        self.similarity = similarity
+        self.age_s = age_s
+
+
+class SemanticCache:
+    """
+    Similarity-threshold response cache.
+
+    Usage:
+        match = cache.lookup(namespace, embedding, route)
+        if match is None:
+            result = await generate()
+            cache.add(namespace, embedding, prompt, result)
+
+    Args:
+        max_entries: Capacity across all namespaces (LRU)
+        ttl_s: Entry lifetime in seconds
+        default_threshold: Minimum cosine similarity for a hit
+        route_thresholds: Per-route overrides of `default_threshold`
+        n_tables, n_bits, exact_below: LSH index parameters
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_s: float = 3600.0,
+        default_threshold: float = 0.95,
+        route_thresholds: Optional[Dict[str, float]] = None,
+        n_tables: int = 16,
+        n_bits: int = 10,
+        exact_below: int = 2048
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.default_threshold = default_threshold
+        self.route_thresholds = dict(route_thresholds or {})
+        self._index_params = {"n_tables": n_tables, "n_bits": n_bits, "exact_below": exact_below}
+        self._indexes: Dict[str, _LSHIndex] = {}
+        self._entries: "OrderedDict[Tuple[str, int], _Entry]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def threshold(self, route: str) -> float:
+        return self.route_thresholds.get(route, self.default_threshold)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if vec.ndim != 1 or norm == 0.0 or not np.isfinite(norm):
+            return None
+        return vec / norm
+
+    def _route_stats(self, route: str) -> Dict[str, float]:
+        stats = self._stats.get(route)
+        if stats is None:
+            stats = self._stats[route] = {"hits": 0, "misses": 0, "similarity_sum": 0.0}
+        return stats
+
+    def lookup(self, namespace: str, embedding: Sequence[float], route: str) -> Optional[SemanticMatch]:
+        """Best stored response for `embedding` if it clears the route threshold"""
+        stats = self._route_stats(route)
+        vec = self._normalize(embedding)
+        index = self._indexes.get(namespace)
+        if vec is None or index is None or index.dim != len(vec):
+            stats["misses"] += 1
+            return None
+
+        slot, similarity = index.search(vec)
+        entry = self._entries.get((namespace, slot)) if slot is not None else None
+        now = time.time()
+        if entry is not None and entry.expires_at < now:
+            self._remove(namespace, slot)
+            entry = None
+        if entry is None or similarity < self.threshold(route):
+            stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end((namespace, slot))
+        stats["hits"] += 1
+        stats["similarity_sum"] += similarity
+        return SemanticMatch(entry.prompt, entry.value, similarity, now - entry.created_at)
+
+    def add(self, namespace: str, embedding: Sequence[float], prompt: str, value: Dict[str, Any]):
+        vec = self._normalize(embedding)
+        if vec is None:
+            return
+        index = self._indexes.get(namespace)
+        if index is not None and index.dim != len(vec):
+            # Embedding model changed: the old vectors are not comparable
+            logger.warning(f"Semantic cache: embedding size changed to {len(vec)}; dropping namespace {namespace}")
+            for key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[key]
+            index = None
+        if index is None:
+            index = self._indexes[namespace] = _LSHIndex(len(vec), **self._index_params)
+
+        now = time.time()
+        slot = index.add(vec)
+        self._entries[(namespace, slot)] = _Entry(prompt, value, now, now + self.ttl_s)
+        while len(self._entries) > self.max_entries:
+            (old_namespace, old_slot), _ = self._entries.popitem(last=False)
+            self._remove(old_namespace, old_slot, entry_popped=True)
+
+    def _remove(self, namespace: str, slot: int, entry_popped: bool = False):
+        if not entry_popped:
+            self._entries.pop((namespace, slot), None)
+        index = self._indexes.get(namespace)
+        if index is None:
+            return
+        index.remove(slot)
+        if not len(index):
+            del self._indexes[namespace]
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route, s in self._stats.items():
+            lookups = s["hits"] + s["misses"]
+            routes[route] = {
+                "threshold": self.threshold(route),
+                "hits": int(s["hits"]),
+                "misses": int(s["misses"]),
+                "hit_rate": round(s["hits"] / lookups, 4) if lookups else 0.0,
+                "mean_hit_similarity": round(s["similarity_sum"] / s["hits"], 4) if s["hits"] else None,
+            }
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "namespaces": len(self._indexes),
+            "default_threshold": self.default_threshold,
+            "routes": routes,
+        }
@@ -0,0 +1,167 @@
+"""
+Conversation Session Store for the Ollama Gateway
+
+Ollama's /api/generate returns a `context` array: the token ids of the
+conversation so far. Sending it back with the next turn lets Ollama reuse
+the evaluated prefix (its KV cache) and evaluate only the new tokens,
+instead of re-evaluating the whole conversation every turn.
+
+Sessions are kept in an LRU bounded by count and by total memory. Token ids
+are stored as packed 32-bit integers (4 bytes each instead of a Python int
+per token). Idle sessions expire after `ttl_s`, and contexts longer than
+`max_context_tokens` are not kept.
+"""
+
+import time
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    __slots__ = ("model", "context", "host", "created_at", "last_used", "turns")
+
+    def __init__(self, model: str, context: array, host: Optional[str], created_at: float):
+        self.model = model
+        self.context = context
+        self.host = host
+        self.created_at = created_at
+        self.last_used = created_at
+        self.turns = 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.context) * self.context.itemsize
+
+
+class SessionStore:
+    """
+    LRU of conversation contexts keyed by client-supplied session id.
+
+    Usage:
+        session = store.get(session_id, model)
+        if session is not None:
+            payload["context"] = session.context.tolist()
+        ...
+        store.put(session_id, model, result["context"], backend.host)
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl_s: float = 1800.0,
+        max_memory_bytes: int = 256 * 1024 * 1024,
+        max_context_tokens: int = 32768
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self.max_memory_bytes = max_memory_bytes
+        self.max_context_tokens = max_context_tokens
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.memory_bytes = 0
+
+        self.resumed = 0
+        self.started = 0
+        self.expired = 0
+        self.evicted = 0
+        self.oversized = 0
+        self.reused_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str, model: str) -> Optional[Session]:
+        """Live session for `model`, or None (new, expired or started with another model)"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        now = time.time()
+        if now - session.last_used > self.ttl_s:
+            self._drop(session_id)
+            self.expired += 1
+            return None
+        if session.model != model:
+            return None
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        self.resumed += 1
+        self.reused_tokens += len(session.context)
+        return session
+
+    def peek(self, session_id: str, model: str) -> Optional[Session]:
+        """Like `get`, without counting a resume or refreshing the session"""
+        session = self._sessions.get(session_id)
+        if session is None or session.model != model or time.time() - session.last_used > self.ttl_s:
+            return None
+        return session
+
+    def put(self, session_id: str, model: str, context: List[int], host: Optional[str] = None):
+        """Store the context Ollama returned for the latest turn"""
+        previous = self._sessions.get(session_id)
+        if len(context) > self.max_context_tokens:
+            # Longer than we are willing to hold; the next turn starts fresh
+            if previous is not None:
+                self._drop(session_id)
+            self.oversized += 1
+            logger.info(f"Session {session_id} context ({len(context)} tokens) exceeds the cap; not kept")
+            return
+
+        now = time.time()
+        packed = array("i", context)
+        if previous is not None and previous.model == model:
+            self.memory_bytes -= previous.nbytes
+            previous.context = packed
+            previous.host = host
+            previous.last_used = now
+            previous.turns += 1
+            self.memory_bytes += previous.nbytes
+            self._sessions.move_to_end(session_id)
+        else:
+            if previous is not None:
+                self._drop(session_id)
+            session = Session(model, packed, host, now)
+            self._sessions[session_id] = session
+            self.memory_bytes += session.nbytes
+            self.started += 1
+        self._enforce_limits(now)
+
+    def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        self._drop(session_id)
+        return True
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self.memory_bytes -= session.nbytes
+
+    def _enforce_limits(self, now: float):
+        # LRU order is also last-use order, so expired sessions sit at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used > self.ttl_s:
+                self._drop(session_id)
+                self.expired += 1
+            elif len(self._sessions) > self.max_sessions or self.memory_bytes > self.max_memory_bytes:
+                self._drop(session_id)
+                self.evicted += 1
+            else:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "memory_bytes": self.memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "ttl_s": self.ttl_s,
+            "started": self.started,
+            "resumed": self.resumed,
+            "reused_tokens": self.reused_tokens,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "oversized": self.oversized,
+        }
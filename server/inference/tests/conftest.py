@@ -0,0 +1,167 @@
+"""
+Shared fixtures: the fake Ollama server and gateways in front of it.
+
+Everything runs as real processes on free local ports, the same way
+benchmark_gateway.py drives the gateway, so these tests need no GPU and
+no real Ollama:
+
+    cd server/inference && python -m pytest tests
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+import httpx
+import pytest
+
+HERE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+from benchmark_gateway import _free_port, _wait_ready  # noqa: E402
+
+# Fake Ollama settings restored after every test that changes them
+FAKE_DEFAULTS = {"ttft": 0.05, "token_rate": 200.0, "load_time": 0.0, "error_rate": 0.0, "drop_rate": 0.0}
+
+
+def _stop(processes: List[subprocess.Popen]):
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@pytest.fixture(scope="session")
+def spawn_fake() -> Iterator[Callable[[], str]]:
+    """Start additional fake Ollama servers; returns their base URL"""
+    processes: List[subprocess.Popen] = []
+
+    def spawn() -> str:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        process = subprocess.Popen([
+            sys.executable, str(HERE / "fake_ollama.py"), "--port", str(port),
+            "--ttft", str(FAKE_DEFAULTS["ttft"]), "--token-rate", str(FAKE_DEFAULTS["token_rate"]),
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(process)
+        _wait_ready(f"{url}/api/tags", process)
+        return url
+
+    try:
+        yield spawn
+    finally:
+        _stop(processes)
+
+
+@pytest.fixture(scope="session")
+def ollama_url(spawn_fake) -> str:
+    return spawn_fake()
+
+
+@pytest.fixture
+def fake(ollama_url) -> Iterator[Callable[..., Dict]]:
+    """Reconfigure the shared fake Ollama for one test"""
+    def configure(url: str = ollama_url, **updates) -> Dict:
+        response = httpx.post(f"{url}/_fake/config", json=updates)
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        yield configure
+    finally:
+        configure(**FAKE_DEFAULTS)
+
+
+@pytest.fixture(scope="session")
+def spawn_gateway(ollama_url) -> Iterator[Callable[..., str]]:
+    """
+    Start a gateway with extra environment variables; returns its base URL.
+
+    Gateways are cached per configuration so tests sharing one do not pay
+    the start-up cost again.
+    """
+    processes: List[subprocess.Popen] = []
+    started: Dict[tuple, str] = {}
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        def spawn(**env: str) -> str:
+            env = {"OLLAMA_HOST": ollama_url, **env}
+            key = tuple(sorted(env.items()))
+            if key in started:
+                return started[key]
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            process = subprocess.Popen(
+                [sys.executable, str(HERE / "main_ollama.py")], cwd=str(HERE),
+                env={**os.environ, "PORT": str(port), "HOST": "127.0.0.1", "MODEL_DIR": model_dir,
+                     "VISION_ENGINE_ENABLED": "0", **env},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes.append(process)
+            _wait_ready(f"{url}/", process)
+            started[key] = url
+            return url
+
+        try:
+            yield spawn
+        finally:
+            _stop(processes)
+
+
+@pytest.fixture(scope="session")
+def gateway(spawn_gateway) -> str:
+    """Default gateway, with client limits on so the fair-queue slots are exercised"""
+    return spawn_gateway(CLIENT_LIMITS_ENABLED="1")
+
+
+def wait_for(predicate: Callable[[], bool], timeout: float = 5.0, interval: float = 0.05) -> bool:
+    """Poll `predicate` until it holds or `timeout` passes"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
+
+
+@pytest.fixture(scope="session")
+def gateway_module(ollama_url, tmp_path_factory):
+    """
+    The gateway imported in-process, for driving its ASGI app directly.
+
+    Configuration is read at import time, so this is imported once, against
+    the shared fake Ollama, with client limits on.
+    """
+    os.environ.update({
+        "OLLAMA_HOST": ollama_url, "MODEL_DIR": str(tmp_path_factory.mktemp("models")),
+        "CLIENT_LIMITS_ENABLED": "1", "VISION_ENGINE_ENABLED": "0",
+    })
+    import main_ollama
+    return main_ollama
+
+
+@pytest.fixture(scope="session")
+def run(gateway_module) -> Iterator[Callable]:
+    """Run a coroutine on the in-process gateway's loop (its pooled connections are bound to it)"""
+    loop = asyncio.new_event_loop()
+    try:
+        yield loop.run_until_complete
+    finally:
+        loop.run_until_complete(gateway_module.ollama_executor.aclose())
+        loop.close()
+
+
+def executor_slots(module) -> Dict[str, int]:
+    """Slots held in the in-process gateway's executor"""
+    executor = module.ollama_executor
+    return {
+        "outstanding": sum(b.outstanding for b in executor.pool.backends),
+        "scheduler": sum(executor.scheduler.stats()["active"].values()),
+        "client_queue": executor.client_queue.in_flight if executor.client_queue is not None else 0,
+    }
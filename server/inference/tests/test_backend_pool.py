@@ -0,0 +1,26 @@
+"""Backend selection"""
+
+import pytest
+
+from backend_pool import BackendPool, OllamaBackend
+
+
+@pytest.fixture(scope="module")
+def pool(spawn_fake):
+    return BackendPool([OllamaBackend(spawn_fake()), OllamaBackend(spawn_fake())])
+
+
+def test_prefers_backends_holding_the_model(pool):
+    first, second = pool.backends
+    first.loaded_models, second.loaded_models = set(), {"llama3"}
+    assert {pool.pick("llama3").host for _ in range(4)} == {second.host}
+
+
+def test_loaded_only(pool):
+    first, second = pool.backends
+    first.loaded_models, second.loaded_models = {"llama3"}, set()
+    # Hedges never go where the model would have to be loaded first
+    assert pool.pick("llama3", exclude={first.host}, loaded_only=True) is None
+    assert pool.pick("llama3", exclude={first.host}).host == second.host
+    second.loaded_models = {"llama3"}
+    assert pool.pick("llama3", exclude={first.host}, loaded_only=True).host == second.host
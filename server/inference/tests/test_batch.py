@@ -0,0 +1,87 @@
+"""Error paths of /v1/generate/batch"""
+
+import asyncio
+import json
+
+import httpx
+
+
+def _lines(*items) -> bytes:
+    return b"".join(json.dumps(item).encode("utf-8") + b"\n" for item in items)
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def _results(body: str) -> dict:
+    return {item.get("id"): item for item in map(json.loads, body.splitlines())}
+
+
+def test_bad_items_do_not_fail_the_batch(gateway):
+    body = _lines(
+        {"id": "ok", "model_id": "llama3", "prompt": "hello", "max_tokens": 3},
+        {"id": "unknown", "model_id": "no-such-model", "prompt": "hello"},
+        {"id": "invalid", "model_id": "llama3", "prompt": "hello", "max_tokens": "lots"},
+    ) + b"not json\n"
+    response = httpx.post(f"{gateway}/v1/generate/batch", content=body, timeout=30)
+    assert response.status_code == 200
+    results = _results(response.text)
+    assert results["ok"]["status"] == "success"
+    assert results["unknown"]["status_code"] == 404
+    assert results["invalid"]["status_code"] == 400
+    assert results[3]["status_code"] == 400
+
+
+def test_unexpected_error_becomes_500_line(gateway_module, run, monkeypatch):
+    original = gateway_module.generate_cached
+
+    async def generate_cached(request, **kwargs):
+        if request.prompt == "boom":
+            raise RuntimeError("backend exploded")
+        return await original(request, **kwargs)
+
+    monkeypatch.setattr(gateway_module, "generate_cached", generate_cached)
+
+    async def scenario():
+        lines = [json.dumps({"id": prompt, "model_id": "llama3", "prompt": prompt, "max_tokens": 3}).encode()
+                 for prompt in ("before", "boom", "after")]
+        return [line async for line in gateway_module.run_generation_batch(_aiter(lines), concurrency=2)]
+
+    results = _results(b"".join(run(scenario())).decode())
+    assert results["boom"]["status_code"] == 500
+    assert "backend exploded" in results["boom"]["error"]
+    assert results["before"]["status"] == results["after"]["status"] == "success"
+
+
+def test_abandoned_batch_stops_producing(gateway_module, run):
+    # A reader that leaves while the result queue is full must not leave the
+    # producer blocked on it forever
+    async def scenario():
+        lines = [json.dumps({"model_id": "llama3", "prompt": f"item {i}", "max_tokens": 1}).encode() for i in range(8)]
+        batch = gateway_module.run_generation_batch(_aiter(lines), concurrency=1)
+        await batch.__anext__()
+        await asyncio.sleep(0.5)  # let the queue fill up behind the reader
+        await batch.aclose()
+        await asyncio.sleep(0.2)
+        return [t for t in asyncio.all_tasks() if t.get_coro().__name__ in ("produce", "run_one")]
+
+    assert run(scenario()) == []
+
+
+def test_disconnect_ends_the_stream(gateway_module, run):
+    # On disconnect the producer is cancelled under a reader that is still
+    # draining the queue; the reader must still see the end of the stream
+    async def scenario():
+        disconnected = asyncio.Event()
+        lines = [json.dumps({"model_id": "llama3", "prompt": f"item {i}", "max_tokens": 1}).encode() for i in range(8)]
+        batch = gateway_module.run_generation_batch(_aiter(lines), concurrency=1, wait_for_disconnect=disconnected.wait)
+        received = [await batch.__anext__()]
+        await asyncio.sleep(0.5)
+        disconnected.set()
+        received += [line async for line in batch]
+        return received
+
+    received = run(asyncio.wait_for(scenario(), timeout=10))
+    assert 1 <= len(received) < 8
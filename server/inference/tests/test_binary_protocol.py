@@ -0,0 +1,26 @@
+"""Malformed vision responses are protocol errors"""
+
+import numpy as np
+import pytest
+
+from binary_protocol import ProtocolError, decode_vision_response, encode_vision_response
+
+
+def _payload() -> bytes:
+    return encode_vision_response({
+        "world_state_prob": 0.75, "action_id": 2,
+        "action_probs": [0.1, 0.2, 0.6, 0.1], "embedding": np.arange(8, dtype=np.float32),
+    })
+
+
+def test_round_trip():
+    result = decode_vision_response(_payload())
+    assert result.action_id == 2 and result.world_state_prob == 0.75
+    assert result.action_probs.tolist() == pytest.approx([0.1, 0.2, 0.6, 0.1])
+    assert result.embedding.tolist() == list(range(8))
+
+
+@pytest.mark.parametrize("cut", [0, 3, 7, 12, 21])
+def test_truncated_response_is_a_protocol_error(cut):
+    with pytest.raises(ProtocolError, match="Truncated vision response"):
+        decode_vision_response(_payload()[:cut])
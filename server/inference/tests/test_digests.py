@@ -0,0 +1,44 @@
+"""Model digests (the response and embedding cache namespaces) are keyed by full tag"""
+
+import hashlib
+
+import httpx
+import pytest
+
+
+def test_full_tag(gateway_module):
+    full_tag = gateway_module.OllamaExecutor._full_tag
+    assert full_tag("llama3") == "llama3:latest"
+    assert full_tag("llama3:70b") == "llama3:70b"
+    assert full_tag("registry.local:5000/team/llama3") == "registry.local:5000/team/llama3:latest"
+    assert full_tag("registry.local:5000/team/llama3:q4") == "registry.local:5000/team/llama3:q4"
+
+
+@pytest.mark.parametrize("model_id", ["llama3", "llama3:latest"])
+def test_untagged_and_latest_share_a_digest(gateway_module, run, model_id):
+    expected = hashlib.sha256(b"llama3").hexdigest()  # what fake_ollama reports
+    assert run(gateway_module.ollama_executor.model_digest(model_id)) == expected
+
+
+def test_other_tags_do_not_borrow_latest(gateway_module, run):
+    # fake_ollama only has llama3:latest; another tag of it must not get its digest
+    assert run(gateway_module.ollama_executor.model_digest("llama3:70b")) is None
+
+
+def test_exact_cache_hits_on_resolved_digest(spawn_gateway):
+    # With the digest resolved the cache is live, not bypassed
+    gateway = spawn_gateway(RESPONSE_CACHE_ENABLED="1")
+
+    def generate(prompt: str) -> httpx.Response:
+        response = httpx.post(f"{gateway}/v1/generate", timeout=30, json={
+            "model_id": "llama3", "prompt": prompt, "max_tokens": 4, "temperature": 0,
+        })
+        assert response.status_code == 200
+        return response
+
+    first = generate("cache me")
+    assert first.headers["X-Cache"] == "MISS"
+    again = generate("cache me")
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.json() == first.json()
+    assert generate("something else").headers["X-Cache"] == "MISS"
@@ -0,0 +1,87 @@
+"""GGUF header parsing, including arrays that are skipped and truncated files"""
+
+import struct
+
+import pytest
+
+from gguf_reader import GGUFError, GGUFReader
+
+UINT32, FLOAT32, STRING, ARRAY = 4, 6, 8, 9
+
+
+def _string(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return struct.pack("<Q", len(data)) + data
+
+
+def _kv(key: str, value_type: int, payload: bytes) -> bytes:
+    return _string(key) + struct.pack("<I", value_type) + payload
+
+
+def _array(element_type: int, items: list) -> bytes:
+    if element_type == STRING:
+        body = b"".join(_string(item) for item in items)
+    else:
+        body = b"".join(struct.pack("<f" if element_type == FLOAT32 else "<I", item) for item in items)
+    return struct.pack("<IQ", element_type, len(items)) + body
+
+
+def _gguf(*kvs: bytes, tensors: int = 0) -> bytes:
+    header = b"GGUF" + struct.pack("<IQQ", 3, tensors, len(kvs)) + b"".join(kvs)
+    for i in range(tensors):
+        header += _string(f"blk.{i}.weight") + struct.pack("<I", 2) + struct.pack("<QQ", 4, 4) + struct.pack("<IQ", 0, i * 64)
+    return header
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write(data: bytes):
+        path = tmp_path / "model.gguf"
+        path.write_bytes(data)
+        return path
+    return write
+
+
+def test_parses_metadata_and_skips_large_arrays(write):
+    data = _gguf(
+        _kv("general.architecture", STRING, _string("llama")),
+        _kv("llama.context_length", UINT32, struct.pack("<I", 4096)),
+        _kv("small", ARRAY, _array(UINT32, [1, 2, 3])),
+        _kv("scores", ARRAY, _array(FLOAT32, [0.5] * 100)),
+        _kv("tokenizer.ggml.tokens", ARRAY, _array(STRING, [f"tok{i}" for i in range(100)])),
+        tensors=2,
+    )
+    reader = GGUFReader(write(data), max_array_items=10)
+    assert reader.architecture == "llama" and reader.context_length == 4096
+    assert reader.metadata["small"] == [1, 2, 3]
+    assert reader.metadata["scores"] == {"type": "array", "element_type": FLOAT32, "count": 100}
+    assert reader.metadata["tokenizer.ggml.tokens"]["count"] == 100
+    assert [t.name for t in reader.tensors] == ["blk.0.weight", "blk.1.weight"]
+
+
+@pytest.mark.parametrize("element_type, items", [(FLOAT32, [0.5] * 100), (STRING, [f"tok{i}" for i in range(100)])])
+def test_skipped_array_past_end_of_file(write, element_type, items):
+    data = _gguf(_kv("big", ARRAY, _array(element_type, items)))
+    with pytest.raises(GGUFError, match="Truncated"):
+        GGUFReader(write(data[:-20]), max_array_items=10)
+
+
+def test_skipped_array_with_absurd_count(write):
+    # A corrupt count must not leave the reader positioned past the mapping
+    data = _gguf(_kv("big", ARRAY, struct.pack("<IQ", FLOAT32, 2 ** 40)))
+    with pytest.raises(GGUFError, match="Truncated"):
+        GGUFReader(write(data), max_array_items=10)
+
+
+@pytest.mark.parametrize("cut", [3, 10, 30, 60])
+def test_truncated_files(write, cut):
+    data = _gguf(_kv("general.architecture", STRING, _string("llama")), tensors=1)
+    with pytest.raises(GGUFError):
+        GGUFReader(write(data[:cut]))
+
+
+def test_not_gguf(write):
+    with pytest.raises(GGUFError, match="not a GGUF file"):
+        GGUFReader(write(b"PK\x03\x04" + b"\0" * 64))
+    with pytest.raises(GGUFError, match="empty"):
+        GGUFReader(write(b""))
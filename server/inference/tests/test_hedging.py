@@ -0,0 +1,43 @@
+"""Hedges only touch a backend once the budget has paid for them"""
+
+import asyncio
+
+from hedging import HedgePolicy
+
+
+def _hedged(gateway_module, run, policy: HedgePolicy, pick):
+    executor = gateway_module.OllamaExecutor()
+    executor.hedger = policy
+    picks = []
+
+    def record_pick(*args, **kwargs):
+        picks.append(kwargs)
+        return pick
+
+    async def slow_primary(backend, model_id, payload, observer):
+        await asyncio.sleep(0.2)
+        return {"response": "primary"}
+
+    executor.pool.pick = record_pick
+    executor._generate_on = slow_primary
+    policy.delay = lambda model, max_tokens: 0.01
+    payload = {"model": "llama3", "options": {"num_predict": 4}}
+    result = run(executor._generate_hedged(executor.pool.backends[0], "llama3", payload, None, set()))
+    assert result == {"response": "primary"}
+    return picks
+
+
+def test_refused_budget_never_picks_a_backend(gateway_module, run):
+    policy = HedgePolicy(budget_ratio=0.0)
+    assert _hedged(gateway_module, run, policy, pick=None) == []
+    assert policy.stats()["skipped_budget"] == 1
+
+
+def test_no_eligible_backend_gives_the_credit_back(gateway_module, run):
+    policy = HedgePolicy(budget_ratio=1.0)
+    policy._credits = 1.0
+    assert len(_hedged(gateway_module, run, policy, pick=None)) == 1
+    stats = policy.stats()
+    assert stats["credits"] == 1.0
+    assert stats["hedged"] == 0 and stats["skipped_backend"] == 1
+    assert policy.try_spend()
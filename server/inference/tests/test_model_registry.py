@@ -0,0 +1,36 @@
+"""Which files under MODEL_DIR become models, and background hashing"""
+
+import hashlib
+
+from conftest import wait_for
+from model_registry import ModelRegistry
+
+
+def test_unknown_checkpoints_are_not_listed(tmp_path):
+    (tmp_path / "navajepa_sota.pth").write_bytes(b"known")
+    (tmp_path / "optimizer_state.pth").write_bytes(b"not a model")
+    (tmp_path / "snapshot.pt").write_bytes(b"not a model either")
+    (tmp_path / "mistral-7b.gguf").write_bytes(b"not valid gguf")
+
+    registry = ModelRegistry(tmp_path, hash_files=False)
+    assert set(registry.models) == {"navajepa", "mistral-7b", "llama3"}
+    assert registry.models["navajepa"]["type"] == "vision-language"
+    assert registry.models["mistral-7b"]["type"] == "text"
+    # Still indexed, so a rename to a known name is picked up without re-reading
+    assert "optimizer_state.pth" in registry.files
+
+
+def test_files_are_hashed_in_the_background(tmp_path):
+    for name in ("navajepa_sota.pth", "a.gguf", "b.gguf"):
+        (tmp_path / name).write_bytes(name.encode())
+
+    registry = ModelRegistry(tmp_path)
+    try:
+        assert wait_for(lambda: all(e["sha256"] for e in registry.files.values()))
+        assert registry.files["a.gguf"]["sha256"] == hashlib.sha256(b"a.gguf").hexdigest()
+        assert wait_for(lambda: not registry._hashing)
+
+        reloaded = ModelRegistry(tmp_path, hash_files=False)
+        assert reloaded.files["b.gguf"]["sha256"] == hashlib.sha256(b"b.gguf").hexdigest()
+    finally:
+        registry._hasher.shutdown(wait=True)
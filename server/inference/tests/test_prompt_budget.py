@@ -0,0 +1,100 @@
+"""Prompt estimation, truncation bounds and the context budget"""
+
+import uuid
+
+import httpx
+import pytest
+
+from prompt_budget import TRUNCATION_MARKER, TokenEstimator, truncate_middle
+
+LOG = "Instructions: find the root cause.\n" + "".join(
+    f"2024-01-01 12:00:{i % 60:02d} node-{i} disk pressure warning value={i * 7}\n" for i in range(3000)
+) + "Question: why did latency spike?"
+
+
+@pytest.fixture
+def estimator():
+    return TokenEstimator()
+
+
+@pytest.mark.parametrize("text", [LOG, "界" * 5000, "x" * 100000, "word " * 20000])
+@pytest.mark.parametrize("max_tokens", [25, 50, 200, 1000, 4000])
+def test_truncated_text_fits(estimator, text, max_tokens):
+    out, removed = truncate_middle(text, max_tokens, estimator, "m")
+    assert estimator.estimate(out, "m") <= max_tokens
+    assert removed > 0
+    assert len(out) < len(text)
+
+
+def test_keeps_head_and_tail(estimator):
+    out, removed = truncate_middle(LOG, 500, estimator, "m", head_fraction=0.3)
+    assert out.startswith("Instructions: find the root cause.\n")
+    assert out.endswith("Question: why did latency spike?")
+    assert TRUNCATION_MARKER.format(removed=removed) in out
+
+
+def test_fitting_text_is_untouched(estimator):
+    estimated = estimator.estimate(LOG, "m")
+    assert truncate_middle(LOG, estimated, estimator, "m") == (LOG, 0)
+    out, removed = truncate_middle(LOG, estimated - 1, estimator, "m")
+    assert 0 < removed and estimator.estimate(out, "m") < estimated
+
+
+@pytest.mark.parametrize("max_tokens", [-5, 0, 1, 10])
+def test_budget_smaller_than_the_marker(estimator, max_tokens):
+    with pytest.raises(ValueError, match="marker"):
+        truncate_middle(LOG, max_tokens, estimator, "m")
+
+
+# --- THROUGH THE GATEWAY ---
+
+@pytest.fixture(scope="module")
+def small_context(spawn_gateway):
+    """Gateway capped at a 512-token context; prompt budget 502 with max_tokens=10"""
+    return spawn_gateway(OLLAMA_CONTEXT_LENGTH="512")
+
+
+def _turn(gateway: str, session_id: str, words: int, **extra) -> httpx.Response:
+    return httpx.post(f"{gateway}/v1/generate", json={
+        "model_id": "llama3", "prompt": "alpha " * words, "max_tokens": 10, "session_id": session_id, **extra
+    }, timeout=30)
+
+
+def test_over_budget_prompt_is_rejected(small_context):
+    response = httpx.post(f"{small_context}/v1/generate",
+                          json={"model_id": "llama3", "prompt": "alpha " * 600, "max_tokens": 10}, timeout=30)
+    assert response.status_code == 413
+    assert response.json()["detail"]["max_prompt_tokens"] == 502
+
+
+def test_session_context_counts_against_the_budget(small_context):
+    session = str(uuid.uuid4())
+    assert _turn(small_context, session, 300).status_code == 200  # stores ~310 context tokens
+    # Fits on its own, but not next to the session's context
+    response = _turn(small_context, session, 250)
+    assert response.status_code == 413
+    detail = response.json()["detail"]
+    assert detail["session_context_tokens"] == 310
+    assert detail["max_prompt_tokens"] == 502 - 310
+    # A fresh session has the whole budget
+    assert _turn(small_context, str(uuid.uuid4()), 250).status_code == 200
+
+
+def test_truncation_leaves_room_for_the_session(small_context):
+    session = str(uuid.uuid4())
+    assert _turn(small_context, session, 300).status_code == 200
+    response = _turn(small_context, session, 250, truncate=True)
+    assert response.status_code == 200
+    assert response.json()["session"]["resumed"] is True
+    assert int(response.headers["X-Prompt-Tokens-Estimated"]) <= 502 - 310
+    assert int(response.headers["X-Prompt-Truncated-Tokens"]) > 0
+
+
+def test_session_filling_the_context_is_reset(small_context):
+    session = str(uuid.uuid4())
+    assert _turn(small_context, session, 440).status_code == 200  # ~450 of 502 tokens
+    response = _turn(small_context, session, 100, truncate=True)
+    assert response.status_code == 200
+    assert response.headers["X-Session-Reset"] == "true"
+    assert "X-Prompt-Truncated-Tokens" not in response.headers
+    assert response.json()["session"]["resumed"] is False
@@ -0,0 +1,83 @@
+"""Static INT8 quantization refuses what it cannot quantize correctly"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+nn = torch.nn
+
+import quantize  # noqa: E402
+from vision_engine import MockNavaFlowModel  # noqa: E402
+
+
+def test_missing_calibration_data_is_an_error():
+    with pytest.raises(ValueError, match="No calibration data"):
+        quantize.load_calibration_pairs()
+    vision, text, source = quantize.load_calibration_pairs(samples=4, allow_random=True)
+    assert source == "random" and vision.shape == text.shape == (4, 768)
+
+
+def test_unrecognised_forward_is_refused():
+    class PredictionOnly(MockNavaFlowModel):
+        def forward(self, vision_emb, text_emb):
+            return {"prediction": self.predictor(torch.cat([vision_emb, text_emb], dim=-1))}
+
+    with pytest.raises(ValueError, match="Unrecognised architecture"):
+        quantize.prepare_static(PredictionOnly(), quantize.default_backend())
+
+
+def test_heads_the_forward_skips_are_refused():
+    class SkipsHeads(MockNavaFlowModel):
+        def forward(self, vision_emb, text_emb):
+            n = len(vision_emb)
+            return {"prediction": self.predictor(torch.cat([vision_emb, text_emb], dim=-1)),
+                    "world_state_logits": torch.zeros(n, 1), "action_logits": torch.zeros(n, 4)}
+
+    prepared = quantize.prepare_static(SkipsHeads(), quantize.default_backend())
+    prepared(torch.randn(8, 768), torch.randn(8, 768))
+    with pytest.raises(ValueError, match="never ran"):
+        quantize.check_calibrated(prepared)
+
+
+def test_static_model_keeps_its_forward_and_round_trips(tmp_path):
+    backend = quantize.default_backend()
+    vision, text, _ = quantize.load_calibration_pairs(samples=32, allow_random=True)
+    reference = MockNavaFlowModel().eval()
+    prepared = quantize.prepare_static(quantize.copy.deepcopy(reference), backend)
+    with torch.no_grad():
+        prepared(vision, text)
+    quantize.check_calibrated(prepared)
+    quantized = quantize.convert_static(prepared).eval()
+    assert quantize.compare_outputs(reference, quantized, vision, text)["prediction_cosine"] > 0.99
+
+    path = tmp_path / "int8.pth"
+    torch.save({"model_state_dict": quantized.state_dict(), "mode": "static", "backend": backend,
+                "architecture": "MockNavaFlowModel"}, path)
+    reloaded = quantize.load_quantized_model(str(path))
+    with torch.no_grad():
+        assert torch.equal(reloaded(vision, text)["action_logits"], quantized(vision, text)["action_logits"])
+
+
+def _convert(reference):
+    vision, text, _ = quantize.load_calibration_pairs(samples=32, allow_random=True)
+    prepared = quantize.prepare_static(quantize.copy.deepcopy(reference), quantize.default_backend())
+    with torch.no_grad():
+        prepared(vision, text)
+    return quantize.convert_static(prepared).eval(), vision, text
+
+
+def test_fused_kernel_is_probed_at_conversion():
+    quantized, _, _ = _convert(MockNavaFlowModel().eval())
+    fused = [m for m in quantized.modules() if isinstance(m, quantize.QuantizedLinearGELU)]
+    assert fused and all(m._onednn is not None for m in fused)
+
+
+def test_incompatible_onednn_op_falls_back_to_separate_kernels(monkeypatch):
+    # The op's argument list differs between torch releases
+    def incompatible(self, x, onednn):
+        raise RuntimeError("qlinear_pointwise() expected at most 12 argument(s) but received 13")
+
+    monkeypatch.setattr(quantize.QuantizedLinearGELU, "_run_onednn", incompatible)
+    reference = MockNavaFlowModel().eval()
+    quantized, vision, text = _convert(reference)
+    assert all(m._onednn is False for m in quantized.modules() if isinstance(m, quantize.QuantizedLinearGELU))
+    assert quantize.compare_outputs(reference, quantized, vision, text)["prediction_cosine"] > 0.99
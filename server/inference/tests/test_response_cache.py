@@ -0,0 +1,21 @@
+"""A failing disk tier degrades the response cache to misses, never errors"""
+
+import asyncio
+import sqlite3
+
+from response_cache import ResponseCache
+
+
+def test_disk_read_error_is_a_miss(tmp_path):
+    path = tmp_path / "responses.db"
+    cache = ResponseCache(max_entries=0, ttl_s=60, disk_path=path)
+    try:
+        asyncio.run(cache.put("key", "llama3", {"text": "stored"}))
+        with sqlite3.connect(str(path)) as conn:
+            conn.execute("DROP TABLE responses")
+
+        value, tier, _ = asyncio.run(cache.get("key", "llama3"))
+        assert value is None and tier is None
+        assert cache.stats()["models"]["llama3"]["misses"] == 1
+    finally:
+        cache.close()
@@ -0,0 +1,25 @@
+"""The semantic cache never mixes sampled and deterministic answers"""
+
+import httpx
+
+
+def _generate(gateway: str, temperature: float) -> httpx.Response:
+    response = httpx.post(f"{gateway}/v1/generate", timeout=30, json={
+        "model_id": "llama3", "prompt": "summarise the outage on web-01", "max_tokens": 4,
+        "temperature": temperature,
+    })
+    assert response.status_code == 200
+    return response
+
+
+def test_sampled_answer_is_not_served_at_temperature_zero(spawn_gateway):
+    gateway = spawn_gateway(SEMANTIC_CACHE_ENABLED="1")
+    assert _generate(gateway, 1.0).headers["X-Cache"] == "MISS"
+
+    deterministic = _generate(gateway, 0)
+    assert deterministic.headers["X-Cache"] == "MISS"
+    assert "semantic_cache" not in deterministic.json()
+
+    # Each still hits its own entries
+    assert _generate(gateway, 0).headers.get("X-Cache-Tier") == "semantic"
+    assert _generate(gateway, 1.0).headers.get("X-Cache-Tier") == "semantic"
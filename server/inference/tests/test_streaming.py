@@ -0,0 +1,128 @@
+"""Streaming generations give back every slot they hold, however the client leaves"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from starlette.requests import ClientDisconnect
+
+from conftest import executor_slots, wait_for
+
+
+def _slots(gateway: str) -> dict:
+    stats = httpx.get(f"{gateway}/v1/stats").json()
+    return {
+        "outstanding": sum(b["outstanding"] for b in stats["ollama"]["backends"]),
+        "scheduler": sum(stats["ollama"]["scheduler"]["active"].values()),
+        "client_queue": stats["client_limits"]["queue"]["in_flight"],
+    }
+
+
+IDLE = {"outstanding": 0, "scheduler": 0, "client_queue": 0}
+
+
+def _unload(ollama_url: str, model: str = "llama3"):
+    httpx.post(f"{ollama_url}/api/generate", json={"model": model, "keep_alive": 0}).raise_for_status()
+
+
+def test_stream_completes_and_releases(gateway):
+    with httpx.stream("POST", f"{gateway}/v1/generate",
+                      json={"model_id": "llama3", "prompt": "hello there", "stream": True, "max_tokens": 5}) as r:
+        assert r.status_code == 200
+        lines = list(r.iter_lines())
+    assert '"done": true' in lines[-1] or '"done":true' in lines[-1]
+    assert wait_for(lambda: _slots(gateway) == IDLE)
+
+
+def test_disconnect_mid_stream_releases(gateway, fake):
+    fake(token_rate=5)
+    with httpx.stream("POST", f"{gateway}/v1/generate",
+                      json={"model_id": "llama3", "prompt": "a slow one", "stream": True, "max_tokens": 50}) as r:
+        next(r.iter_lines())
+    assert wait_for(lambda: _slots(gateway) == IDLE)
+
+
+def test_disconnect_before_first_chunk_releases(gateway, fake, ollama_url):
+    # Ollama holds the response headers back while it loads the model, so the
+    # client is gone before the gateway has a stream to hand to Starlette
+    _unload(ollama_url)
+    fake(load_time=1.0)
+    with pytest.raises(httpx.ReadTimeout):
+        httpx.post(f"{gateway}/v1/generate",
+                   json={"model_id": "llama3", "prompt": "never read", "stream": True, "max_tokens": 5},
+                   timeout=httpx.Timeout(5.0, read=0.3))
+    assert wait_for(lambda: _slots(gateway) == IDLE, timeout=5.0)
+
+
+async def _call_asgi(app, path: str, body: dict, send):
+    """One POST through the ASGI app, with a client that sends its body and then waits"""
+    payload = json.dumps(body).encode("utf-8")
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+    }
+    await app(scope, receive, send)
+
+
+def test_unstarted_stream_is_closed(gateway_module, run):
+    # With ASGI 2.4 servers a failed send raises before Starlette has pulled a
+    # single chunk, so the body generator never runs and its finally never fires
+    async def send(message):
+        if message["type"] == "http.response.start":
+            raise OSError("client went away")
+
+    async def scenario():
+        with pytest.raises((ClientDisconnect, OSError)):
+            await _call_asgi(gateway_module.app, "/v1/generate",
+                             {"model_id": "llama3", "prompt": "never sent", "stream": True, "max_tokens": 5}, send)
+        return executor_slots(gateway_module)
+
+    assert run(scenario()) == IDLE
+
+
+def test_unstarted_runner_stream_is_closed(gateway_module, run, monkeypatch):
+    # Without httpx generations run on the worker pool; the first line has
+    # already checked a worker out by the time the response is built
+    import backend_pool
+    monkeypatch.setattr(backend_pool, "httpx", None)
+    monkeypatch.setattr(gateway_module, "httpx", None)
+    executor = gateway_module.OllamaExecutor()
+    monkeypatch.setattr(gateway_module, "ollama_executor", executor)
+    for backend in executor.pool.backends:
+        # Its start-up check falls back to the `ollama` CLI, which is not installed here
+        backend.breaker.record_success()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            raise OSError("client went away")
+
+    async def scenario():
+        await executor.start()
+        try:
+            with pytest.raises((ClientDisconnect, OSError)):
+                await _call_asgi(gateway_module.app, "/v1/generate",
+                                 {"model_id": "llama3", "prompt": "never sent", "stream": True, "max_tokens": 50}, send)
+            slots = executor_slots(gateway_module)
+            # The abandoned worker is replaced in the background
+            for _ in range(100):
+                if executor.runners.stats()["idle"] == executor.runners.size:
+                    break
+                await asyncio.sleep(0.05)
+            return slots, executor.runners.stats()
+        finally:
+            await executor.aclose()
+
+    slots, runners = run(scenario())
+    assert runners["requests"] == 1
+    assert slots == IDLE
+    assert runners["idle"] == runners["workers"]
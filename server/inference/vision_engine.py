@@ -0,0 +1,341 @@
+"""
+NavaFlow-VL-JEPA Vision Engine
+
+The vision-language pipeline (frozen CLIP vision encoder, frozen BERT text
+encoder, VL-JEPA predictor and heads) behind one lazily loaded object, so it
+can be hosted by main.py and in-process by the Ollama gateway alike.
+
+The frozen encoders are loaded once per process and shared by every engine;
+each checkpoint gets one engine (`get_engine`) and is loaded on first use.
+Requests are micro-batched through the same PriorityBatchScheduler the
+vision server uses (`create_scheduler`).
+"""
+
+import io
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+
+from scheduler import PriorityBatchScheduler
+
+logger = logging.getLogger(__name__)
+
+# Import model architecture (simplified for production)
+# In production, you would import from your trained model module
+try:
+    from model import NavaFlowVLJEPA
+except ImportError:
+    NavaFlowVLJEPA = None
+
+# --- DEVICE CONFIGURATION ---
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Model configuration
+VISION_DIM = 768
+TEXT_DIM = 2048
+EMBEDDING_DIM = 1536
+NUM_AGENT_ACTIONS = 5
+
+ACTION_LABELS = ['IDLE', 'KILL_PROCESS', 'ROTATE_CAMERA', 'SCALE_RESOURCES', 'LOG_EVENT']
+DEFAULT_QUERY = 'What is in this image?'
+
+
+# --- MOCK MODEL (if real model not available) ---
+class MockNavaFlowModel(nn.Module):
+    """Mock model for demo when trained model is not available"""
+    def __init__(self):
+        super().__init__()
+        self.predictor = nn.Sequential(
+            nn.Linear(768 + 768, 1536),
+            nn.GELU(),
+            nn.Linear(1536, 1536)
+        )
+        self.world_head = nn.Sequential(
+            nn.Linear(768 + 768, 1),
+            nn.Sigmoid()
+        )
+        self.agent_head = nn.Sequential(
+            nn.Linear(768 + 768, NUM_AGENT_ACTIONS)
+        )
+
+    def forward(self, vision_emb, text_emb):
+        combined = torch.cat([vision_emb, text_emb], dim=-1)
+        return {
+            'prediction': self.predictor(combined),
+            'world_state_logits': self.world_head(combined),
+            'action_logits': self.agent_head(combined)
+        }
+
+
+# --- FROZEN ENCODERS (one copy per process) ---
+
+class SharedEncoders:
+    """Frozen CLIP vision and BERT text encoders; falls back to random embeddings"""
+
+    def __init__(self):
+        self.text_tokenizer = None
+        self.text_model = None
+        self.vision_processor = None
+        self.vision_model = None
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load both encoders once; safe to call from several threads"""
+        with self._lock:
+            if self.loaded:
+                return
+            try:
+                from transformers import AutoTokenizer, AutoModel
+                self.text_tokenizer = AutoTokenizer.from_pretrained('bert-base-uncased')
+                self.text_model = AutoModel.from_pretrained('bert-base-uncased').to(device)
+                self.text_model.eval()
+                for param in self.text_model.parameters():
+                    param.requires_grad = False
+                logger.info("✅ Text encoder loaded (BERT)")
+            except Exception as e:
+                logger.warning(f"⚠️  Could not load BERT: {e}")
+                self.text_tokenizer = None
+                self.text_model = None
+
+            try:
+                from transformers import CLIPVisionModel, CLIPProcessor
+                self.vision_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+                self.vision_model = CLIPVisionModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
+                self.vision_model.eval()
+                for param in self.vision_model.parameters():
+                    param.requires_grad = False
+                logger.info("✅ Vision encoder loaded (CLIP)")
+            except Exception as e:
+                logger.warning(f"⚠️  Could not load CLIP: {e}")
+                self.vision_processor = None
+                self.vision_model = None
+            self.loaded = True
+
+    def encode_vision(self, pil_images: List[Image.Image]) -> torch.Tensor:
+        """Vision encoder (frozen CLIP) -> [N, 768]"""
+        if self.vision_model is not None and self.vision_processor is not None:
+            with torch.no_grad():
+                inputs = self.vision_processor(images=pil_images, return_tensors="pt").to(device)
+                vision_outputs = self.vision_model(**inputs)
+                return vision_outputs.pooler_output  # [N, 768]
+        # Fallback: Mock vision embedding
+        return torch.randn(len(pil_images), 768).to(device)
+
+    def encode_text(self, text_queries: List[str]) -> torch.Tensor:
+        """Text encoder (frozen BERT) -> [N, 768]"""
+        if self.text_model is not None and self.text_tokenizer is not None:
+            with torch.no_grad():
+                text_inputs = self.text_tokenizer(
+                    text_queries,
+                    padding=True,
+                    truncation=True,
+                    max_length=128,
+                    return_tensors="pt"
+                ).to(device)
+                text_outputs = self.text_model(**text_inputs)
+                # Mean over real tokens only, so padding in a batch does not shift embeddings
+                mask = text_inputs["attention_mask"].unsqueeze(-1).to(text_outputs.last_hidden_state.dtype)
+                return (text_outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1)  # [N, 768]
+        # Mock text embedding
+        return torch.randn(len(text_queries), 768).to(device)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "vision_encoder": "CLIP" if self.vision_model is not None else "Mock",
+            "text_encoder": "BERT" if self.text_model is not None else "Mock",
+        }
+
+
+encoders = SharedEncoders()
+
+
+def decode_image(image_data: bytes) -> Image.Image:
+    """Decode raw image bytes (JPEG/PNG) to an RGB PIL image"""
+    return Image.open(io.BytesIO(image_data)).convert('RGB')
+
+
+# --- ENGINE ---
+
+class VisionEngine:
+    """
+    One VL-JEPA checkpoint on top of the shared encoders.
+
+    Usage:
+        engine = get_engine("navajepa_sota.pth")
+        engine.load()                                   # blocking; idempotent
+        results = engine.run_batch([(pil_image, "Is the light on?")])
+    """
+
+    def __init__(self, checkpoint_path: str, encoders: SharedEncoders = encoders):
+        self.checkpoint_path = checkpoint_path
+        self.encoders = encoders
+        self.model: Optional[nn.Module] = None
+        self.model_loaded = False  # True when the real architecture is in use
+        self.quantization: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> bool:
+        """Load the encoders and the checkpoint (or the mock model); returns model_loaded"""
+        with self._lock:
+            if self.model is not None:
+                return self.model_loaded
+            start = time.perf_counter()
+            self.encoders.load()
+            model = self._load_model()
+            if model is None:
+                model = MockNavaFlowModel().to(device)
+                model.eval()
+                logger.info("✅ Using mock model for inference")
+            self.model = model
+            self.load_seconds = time.perf_counter() - start
+            return self.model_loaded
+
+    def _load_model(self) -> Optional[nn.Module]:
+        checkpoint = None
+        if Path(self.checkpoint_path).exists():
+            try:
+                checkpoint = torch.load(self.checkpoint_path, map_location="cpu")
+            except Exception as e:
+                logger.warning(f"⚠️  Error loading model: {e}")
+                return None
+        if isinstance(checkpoint, dict) and checkpoint.get('mode') == 'static':
+            return self._load_quantized(checkpoint)
+        if NavaFlowVLJEPA is None:
+            logger.warning("⚠️  Model module not found. Using mock model for demo purposes")
+            return None
+        try:
+            model = NavaFlowVLJEPA(device)
+            if checkpoint is not None:
+                model.load_state_dict(checkpoint.get('model_state_dict', checkpoint))
+                logger.info(f"✅ Model loaded from {self.checkpoint_path}")
+            else:
+                logger.warning(f"⚠️  Checkpoint not found: {self.checkpoint_path}. Using untrained model.")
+            model.eval()
+            self.model_loaded = True
+            return model
+        except Exception as e:
+            logger.warning(f"⚠️  Error loading model: {e}")
+            return None
+
+    def _load_quantized(self, checkpoint: Dict[str, Any]) -> Optional[nn.Module]:
+        """Static INT8 checkpoint from quantize.py; runs on CPU whatever the device"""
+        from quantize import load_quantized_model
+        try:
+            model = load_quantized_model(checkpoint)
+        except Exception as e:
+            logger.warning(f"⚠️  Error loading INT8 model: {e}")
+            return None
+        self.model_loaded = True
+        self.quantization = "int8-static"
+        logger.info(f"✅ INT8 model loaded from {self.checkpoint_path} (backend {torch.backends.quantized.engine})")
+        return model
+
+    def run_batch(self, items: List[Tuple[Image.Image, str]]) -> List[Dict]:
+        """
+        Run the full VL-JEPA pipeline for a batch of (image, query) pairs.
+
+        Returns one dict of raw outputs per item: `embedding` (float32 array,
+        dim 1536), `world_state_prob`, `action_id` and `action_probs`.
+        """
+        if self.model is None:
+            self.load()
+        vision_embedding = self.encoders.encode_vision([image for image, _ in items])
+        text_embedding = self.encoders.encode_text([text for _, text in items])
+
+        if self.quantization is not None:
+            # INT8 kernels are CPU-only
+            vision_embedding, text_embedding = vision_embedding.cpu(), text_embedding.cpu()
+        with torch.no_grad():
+            outputs = self.model(vision_embedding, text_embedding)
+            action_logits = outputs['action_logits']
+            world_state_probs = torch.sigmoid(outputs['world_state_logits']).reshape(-1).cpu().numpy()
+            action_probs = torch.softmax(action_logits, dim=1).cpu().numpy()
+            action_preds = torch.argmax(action_logits, dim=1).cpu().numpy()
+            embeddings = outputs['prediction'].cpu().numpy().astype(np.float32)
+
+        return [
+            {
+                "embedding": embeddings[i],
+                "world_state_prob": float(world_state_probs[i]),
+                "action_id": int(action_preds[i]),
+                "action_probs": action_probs[i]
+            }
+            for i in range(len(items))
+        ]
+
+    def run(self, pil_image: Image.Image, text_query: str) -> Dict:
+        """Run the full VL-JEPA pipeline for one (image, query) pair"""
+        return self.run_batch([(pil_image, text_query)])[0]
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "checkpoint": self.checkpoint_path,
+            "ready": self.ready,
+            "model_loaded": self.model_loaded,
+            "quantization": self.quantization,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "device": str(device),
+            **self.encoders.info(),
+        }
+
+
+_engines: Dict[str, VisionEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(checkpoint_path: str = "navajepa_sota.pth") -> VisionEngine:
+    """The process-wide engine for a checkpoint (not loaded until first use)"""
+    key = str(Path(checkpoint_path).resolve())
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = VisionEngine(str(checkpoint_path))
+        return engine
+
+
+def create_scheduler(engine: VisionEngine) -> PriorityBatchScheduler:
+    """Micro-batching scheduler for an engine, configured by the NAVAFLOW_* variables"""
+    return PriorityBatchScheduler(
+        engine.run_batch,
+        max_batch_size=int(os.getenv("NAVAFLOW_MAX_BATCH_SIZE", 16)),
+        batch_window_ms=float(os.getenv("NAVAFLOW_BATCH_WINDOW_MS", 2.0)),
+        starvation_ms=float(os.getenv("NAVAFLOW_BULK_STARVATION_MS", 500.0)),
+        interactive_slo_ms=float(os.getenv("NAVAFLOW_INTERACTIVE_SLO_MS", 50.0))
+    )
+
+
+def format_prediction(result: Dict) -> Dict[str, Any]:
+    """Public response shape of one prediction (without latency fields)"""
+    action_pred = result["action_id"]
+    action_probs = result["action_probs"]
+    world_state_prob = result["world_state_prob"]
+    predicted_action = ACTION_LABELS[action_pred] if action_pred < len(ACTION_LABELS) else f'ACTION_{action_pred}'
+    return {
+        "prediction": result["embedding"].tolist(),
+        "world_state": {
+            "probability": float(world_state_prob),
+            "prediction": "ON" if world_state_prob > 0.5 else "OFF"
+        },
+        "action": {
+            "predicted_action": predicted_action,
+            "action_id": action_pred,
+            "probabilities": {
+                label: float(prob) for label, prob in zip(ACTION_LABELS, action_probs[:len(ACTION_LABELS)])
+            }
+        },
+    }